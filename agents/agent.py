@@ -5,6 +5,7 @@ from agents.greeting_agent import greeting_agent
 from agents.booking_agent import booking_agent
 from agents.itinerary_agent import itinerary_planning_agent
 from agents.creative_agent import creative_and_search_agent
+from tools.intent_router import route_spoken_intent
 
 # --- Orchestrator with Corrected Routing Rules ---
 root_agent = LlmAgent(
@@ -12,6 +13,8 @@ root_agent = LlmAgent(
     model="gemini-2.0-flash-live-001",
     # model="gemini-2.5-flash-preview-native-audio-dialog",
     description="A simple, stateless router that delegates tasks to specialist agents.",
+    # Confident spoken intents are transferred locally, without a model round trip (tools/intent_router.py).
+    before_model_callback=route_spoken_intent,
     sub_agents=[
         greeting_agent,
         booking_agent,
@@ -19,7 +19,7 @@ book_hotel_tool = FunctionTool(func=mock_book_hotel)
 booking_agent = LlmAgent(
     name="ConversationalBookingAgent",
     model="gemini-2.0-flash-live-001",
-    tools=[flight_search_tool, hotel_search_tool, book_flight_tool, mock_book_hotel],
+    tools=[flight_search_tool, hotel_search_tool, book_flight_tool, book_hotel_tool],
     instruction="""
     You are a friendly and hyper-efficient Travel Booking Assistant.
 
@@ -31,7 +31,9 @@ booking_agent = LlmAgent(
         - For hotels, ask for location, check-in/out dates, number of guests, and budget in a single question.
     2.  **Execute Tool:** Once you have the details, call the correct tool (`flight_search_tool` or `hotel_search_tool`).
     3.  **Present Results:** Present the results returned by the tool using the structured Markdown templates for flights and hotels. Do not summarize or omit details.
-    4.  **Confirm and Book:** Await the user's choice, confirm their selection by name, and then call the final booking tool (`mock_book_flight` or `mock_book_hotel`).
+        Hotel results come one page at a time; if `total_pages` is greater than `page`, offer to show more and call `hotel_search_tool` again with the next `page`.
+        Every option has an `option_id`. Do not read ids aloud. If the user asks to see the results again, repeat the same search; it is answered instantly from memory.
+    4.  **Confirm and Book:** Await the user's choice, confirm their selection by name, and then call the final booking tool (`mock_book_flight` or `mock_book_hotel`) with the chosen option's `option_id`.
     5.  **Finish:** Present the final confirmation and end your task.
     """,
     description="A self-contained agent for handling flight and hotel bookings."
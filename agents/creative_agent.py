@@ -7,6 +7,8 @@ from google.adk.tools import google_search
 from tools.agent_wrappers import (
     image_gen_tool_for_root,
     fetch_place_photo_tool_for_root,
+    generate_video_tool_for_root,
+    check_video_job_tool_for_root,
 )
 
 creative_and_search_agent = LlmAgent(
@@ -23,6 +25,7 @@ creative_and_search_agent = LlmAgent(
         1. **Acknowledge with Attitude**: Kick things off with energy. ('You got it!', 'Incoming masterpiece!').
         2. **Choose Your Tool**:
            - For **'generate', 'create', 'draw', 'imagine'**: Use `generate_image_tool_func`.
+           - For **'make a video', 'animate', 'film'**: Use `generate_video_tool_func`. It returns a job id immediately; tell the user the video will appear on their screen in a few minutes and keep the conversation going. Use `check_video_job_tool_func` only if they ask about progress.
            - For **'show me photos', 'find a picture of'**: Use `fetch_place_photo_tool_func`. Remember to use the destination from the state if the user isn't specific.
            - For **general knowledge questions**: Use `Google Search`.
         3. **Present the Result**: Announce your creation or finding clearly.
@@ -32,5 +35,7 @@ creative_and_search_agent = LlmAgent(
        google_search,
        image_gen_tool_for_root,
        fetch_place_photo_tool_for_root,
+       generate_video_tool_for_root,
+       check_video_job_tool_for_root,
    ],
 )
@@ -0,0 +1,132 @@
+# benchmarks/audio_codec_bench.py
+"""
+Per-session bandwidth and server CPU of each audio transport on the browser link:
+
+    pcm-json    - base64 PCM inside JSON text frames (the original protocol)
+    pcm-binary  - raw PCM in binary frames (protocol=binary)
+    opus        - one Opus packet per binary frame (protocol=binary&codec=opus)
+
+Uplink is 16 kHz microphone audio in 40 ms frames; downlink is 24 kHz agent audio in
+the chunk size the live API streams. For Opus uplink the browser's WebCodecs encoder
+is stood in for by the server's encoder, whose cost is not counted. Server CPU is
+reported as a percentage of one core per session (time spent per second of audio).
+Needs PyAV for the Opus rows (pip install av). Run from the repo root:
+
+    python -m benchmarks.audio_codec_bench --seconds 60
+"""
+
+import json
+import time
+import base64
+import argparse
+
+import numpy as np
+
+from tools.audio_codec import OpusEncoder, OpusDecoder, opus_available, OPUS_BITRATE
+from tools.ws_protocol import (
+    DIRECTION_CLIENT_TO_AGENT,
+    DIRECTION_AGENT_TO_CLIENT,
+    DEFAULT_INPUT_SAMPLE_RATE,
+    DEFAULT_OUTPUT_SAMPLE_RATE,
+    FLAG_OPUS,
+    AudioFrameSequencer,
+)
+
+
+def speech_like(seconds: float, sample_rate: int, seed: int = 3) -> bytes:
+    """Voiced harmonics with a syllable-rate envelope over light noise, as 16-bit PCM."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0.05, 1.0)
+    signal = 6000 * voiced * envelope + rng.normal(0, 30, t.size)
+    return np.clip(signal, -32768, 32767).astype("<i2").tobytes()
+
+
+def chunks(pcm: bytes, sample_rate: int, chunk_ms: int):
+    size = sample_rate * chunk_ms // 1000 * 2
+    for offset in range(0, len(pcm) - size + 1, size):
+        yield pcm[offset:offset + size]
+
+
+def _row(wire_bytes: int, cpu_seconds: float, audio_seconds: float) -> dict:
+    return {
+        "kbps": round(wire_bytes * 8 / audio_seconds / 1000, 1),
+        "cpu_percent": round(cpu_seconds / audio_seconds * 100, 3),
+    }
+
+
+def uplink(transport: str, pcm: bytes, frame_ms: int) -> dict:
+    rate = DEFAULT_INPUT_SAMPLE_RATE
+    client = AudioFrameSequencer(DIRECTION_CLIENT_TO_AGENT)
+    server = AudioFrameSequencer(DIRECTION_CLIENT_TO_AGENT)
+    encoder = OpusEncoder(rate) if transport == "opus" else None
+    decoder = OpusDecoder(rate) if transport == "opus" else None
+    wire_bytes, cpu_seconds = 0, 0.0
+    for frame in chunks(pcm, rate, frame_ms):
+        if transport == "pcm-json":
+            messages = [json.dumps({"mime_type": "audio/pcm", "data": base64.b64encode(frame).decode("ascii")})]
+        elif transport == "pcm-binary":
+            messages = [client.pack(frame, rate)]
+        else:
+            messages = [client.pack(packet, rate, FLAG_OPUS) for packet in encoder.encode(frame)]
+        wire_bytes += sum(len(message) for message in messages)
+
+        started = time.perf_counter()
+        for message in messages:
+            if transport == "pcm-json":
+                base64.b64decode(json.loads(message)["data"])
+            else:
+                flags, _rate, payload = server.unpack_with_flags(message)
+                if flags & FLAG_OPUS:
+                    decoder.decode(payload)
+        cpu_seconds += time.perf_counter() - started
+    return _row(wire_bytes, cpu_seconds, len(pcm) / 2 / rate)
+
+
+def downlink(transport: str, pcm: bytes, chunk_ms: int) -> dict:
+    rate = DEFAULT_OUTPUT_SAMPLE_RATE
+    sequencer = AudioFrameSequencer(DIRECTION_AGENT_TO_CLIENT)
+    encoder = OpusEncoder(rate) if transport == "opus" else None
+    wire_bytes, cpu_seconds = 0, 0.0
+    for chunk in chunks(pcm, rate, chunk_ms):
+        started = time.perf_counter()
+        if transport == "pcm-json":
+            messages = [json.dumps({"mime_type": "audio/pcm", "data": base64.b64encode(chunk).decode("ascii")})]
+        elif transport == "pcm-binary":
+            messages = [sequencer.pack(chunk, rate)]
+        else:
+            messages = [sequencer.pack(packet, rate, FLAG_OPUS) for packet in encoder.encode(chunk)]
+        cpu_seconds += time.perf_counter() - started
+        wire_bytes += sum(len(message) for message in messages)
+    return _row(wire_bytes, cpu_seconds, len(pcm) / 2 / rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--frame-ms", type=int, default=40, help="Microphone frame size sent by the browser.")
+    parser.add_argument("--chunk-ms", type=int, default=40, help="Agent audio chunk size from the live API.")
+    args = parser.parse_args()
+
+    transports = ["pcm-json", "pcm-binary"] + (["opus"] if opus_available() else [])
+    microphone = speech_like(args.seconds, DEFAULT_INPUT_SAMPLE_RATE)
+    agent = speech_like(args.seconds, DEFAULT_OUTPUT_SAMPLE_RATE, seed=4)
+    report = {
+        "seconds": args.seconds,
+        "opus_bitrate": OPUS_BITRATE,
+        "transports": {
+            transport: {
+                "uplink": uplink(transport, microphone, args.frame_ms),
+                "downlink": downlink(transport, agent, args.chunk_ms),
+            }
+            for transport in transports
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/event_loop_lag_bench.py
+"""
+Checks that image generation does not stall the event loop.
+
+Swaps the GenAI client and GCS bucket in tools.creative_backend_tools for slow
+stubs (an async "Imagen" call and a deliberately *blocking* upload), runs several
+generations concurrently, and measures how late a 10 ms ticker task wakes up.
+Exits non-zero if the worst lag exceeds the threshold. Run from the repo root
+with the usual .env in place:
+
+    python -m benchmarks.event_loop_lag_bench [--generations 8] [--threshold-ms 50]
+"""
+
+import sys
+import time
+import json
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+import tools.creative_backend_tools as creative_backend_tools
+from tools.clients import LazyClient
+
+TICK_SECONDS = 0.01
+
+
+class _SlowAsyncModels:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def generate_images(self, model, prompt, config):
+        await asyncio.sleep(self.delay)
+        image = SimpleNamespace(image_bytes=b"\xff\xd8" + b"\x00" * 1024, mime_type="image/jpeg")
+        return SimpleNamespace(generated_images=[SimpleNamespace(image=image)])
+
+
+class _BlockingBlob:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def upload_from_string(self, data, content_type=None):
+        time.sleep(self.delay)
+
+
+class _BlockingBucket:
+    name = "benchmark-bucket"
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def blob(self, name):
+        return _BlockingBlob(self.delay)
+
+
+async def _measure_lag(stop: asyncio.Event) -> list[float]:
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, loop.time() - expected))
+    return lags
+
+
+async def run(generations: int, model_delay: float, upload_delay: float) -> dict:
+    creative_backend_tools.genai_client = LazyClient("genai", lambda: SimpleNamespace(aio=SimpleNamespace(models=_SlowAsyncModels(model_delay))))
+    creative_backend_tools.bucket = _BlockingBucket(upload_delay)
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_measure_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        creative_backend_tools.call_generate_image_api(f"benchmark prompt {i}") for i in range(generations)
+    ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = sorted(await ticker)
+
+    return {
+        "generations": generations,
+        "elapsed_seconds": elapsed,
+        "max_lag_ms": lags[-1] * 1000 if lags else 0.0,
+        "p99_lag_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generations", type=int, default=8)
+    parser.add_argument("--model-delay", type=float, default=0.5, help="Seconds the stubbed Imagen call takes.")
+    parser.add_argument("--upload-delay", type=float, default=0.3, help="Seconds the stubbed blocking upload takes.")
+    parser.add_argument("--threshold-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.generations, args.model_delay, args.upload_delay))
+    results["threshold_ms"] = args.threshold_ms
+    results["passed"] = results["max_lag_ms"] <= args.threshold_ms
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if results["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
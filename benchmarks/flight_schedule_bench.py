@@ -0,0 +1,192 @@
+# benchmarks/flight_schedule_bench.py
+"""
+Search throughput of the columnar flight schedule (tools/flight_schedule.py)
+against a naive engine over the same flights - a dict of row lists per
+(origin, destination, date), filtered in Python, with every outbound paired with
+every return - on synthetic schedules of growing density. A sample of queries is
+checked to return the same top-k totals from both engines. Run from the repo root:
+
+    python -m benchmarks.flight_schedule_bench --flights-per-route-day 4 16 64
+    python -m benchmarks.flight_schedule_bench --write-fixture /tmp/schedule.npz --cities 40 --days 365
+
+A written fixture can be served with FLIGHT_SCHEDULE_PATH=/tmp/schedule.npz (or .csv).
+"""
+
+import csv
+import json
+import time
+import random
+import argparse
+import datetime
+
+from tools.flight_schedule import (
+    AIRLINES,
+    SORT_PRICE,
+    SORT_DURATION,
+    FlightSchedule,
+    synthetic_columns,
+    save_schedule,
+    _hhmm,
+)
+
+START = datetime.date(2030, 1, 1)
+TOP_K = 4
+
+
+class NaiveSchedule:
+    """Row dicts per (origin, destination, day); round trips enumerate every pair."""
+
+    def __init__(self, schedule: FlightSchedule):
+        self.routes: dict[tuple, list[dict]] = {}
+        for row in range(len(schedule)):
+            flight = {
+                "row": row,
+                "depart": int(schedule.depart[row]),
+                "duration": int(schedule.duration[row]),
+                "price": int(schedule.price[row]),
+            }
+            key = (int(schedule.origin[row]), int(schedule.destination[row]), int(schedule.day[row]))
+            self.routes.setdefault(key, []).append(flight)
+
+    def _legs(self, origin, destination, date, depart_after, max_price):
+        return [
+            flight for flight in self.routes.get((origin, destination, date.toordinal()), [])
+            if (depart_after is None or flight["depart"] >= depart_after) and (not max_price or flight["price"] <= max_price)
+        ]
+
+    def one_way(self, origin, destination, date, sort_by, depart_after=None, max_price=0):
+        legs = self._legs(origin, destination, date, depart_after, max_price)
+        return sorted(legs, key=lambda flight: flight[sort_by])[:TOP_K]
+
+    def round_trip(self, origin, destination, date, return_date, sort_by, depart_after=None, max_price=0):
+        outbound = self._legs(origin, destination, date, depart_after, max_price)
+        inbound = self._legs(destination, origin, return_date, None, max_price)
+        pairs = [
+            (a[sort_by] + b[sort_by], a, b) for a in outbound for b in inbound
+            if not max_price or a["price"] + b["price"] <= max_price
+        ]
+        pairs.sort(key=lambda pair: pair[0])
+        return pairs[:TOP_K]
+
+
+def _queries(schedule: FlightSchedule, days: int, count: int, seed: int = 5) -> list[dict]:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        origin, destination = rng.sample(range(len(schedule.cities)), 2)
+        date = START + datetime.timedelta(days=rng.randrange(days - 14))
+        queries.append({
+            "origin": origin,
+            "destination": destination,
+            "date": date,
+            "return_date": date + datetime.timedelta(days=rng.randint(1, 14)) if rng.random() < 0.7 else None,
+            "sort_by": rng.choice([SORT_PRICE, SORT_DURATION]),
+            "depart_after": rng.choice([None, None, 6 * 60, 12 * 60]),
+            "max_price": rng.choice([0, 0, 0, 60000]),
+        })
+    return queries
+
+
+def _columnar(schedule: FlightSchedule, query: dict):
+    if query["return_date"] is None:
+        rows = schedule.one_way(query["origin"], query["destination"], query["date"], TOP_K, query["sort_by"],
+                                query["max_price"], query["depart_after"])
+        return [int(schedule.duration[row] if query["sort_by"] == SORT_DURATION else schedule.price[row]) for row in rows]
+    pairs = schedule.round_trip(query["origin"], query["destination"], query["date"], query["return_date"], TOP_K,
+                                query["sort_by"], query["max_price"], query["depart_after"])
+    cost = schedule.duration if query["sort_by"] == SORT_DURATION else schedule.price
+    return [int(cost[a]) + int(cost[b]) for a, b in pairs]
+
+
+def _naive(naive: NaiveSchedule, query: dict):
+    if query["return_date"] is None:
+        legs = naive.one_way(query["origin"], query["destination"], query["date"], query["sort_by"], query["depart_after"], query["max_price"])
+        return [flight[query["sort_by"]] for flight in legs]
+    pairs = naive.round_trip(query["origin"], query["destination"], query["date"], query["return_date"], query["sort_by"],
+                             query["depart_after"], query["max_price"])
+    return [total for total, _a, _b in pairs]
+
+
+def _timed(search, queries) -> tuple[dict, list]:
+    samples, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(search(query))
+        samples.append((time.perf_counter() - started) * 1e6)
+    ordered = sorted(samples)
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+    return {
+        "p50_us": percentile(0.5),
+        "p95_us": percentile(0.95),
+        "queries_per_second": round(len(samples) / (sum(samples) / 1e6)),
+    }, results
+
+
+def run_density(cities: int, days: int, flights_per_route_day: float, query_count: int) -> dict:
+    started = time.perf_counter()
+    columns = synthetic_columns(cities, days, START, flights_per_route_day)
+    schedule = FlightSchedule([f"City {i}" for i in range(cities)], AIRLINES, columns)
+    build_ms = (time.perf_counter() - started) * 1000
+    naive = NaiveSchedule(schedule)
+    queries = _queries(schedule, days, query_count)
+
+    columnar_stats, columnar_results = _timed(lambda query: _columnar(schedule, query), queries)
+    naive_stats, naive_results = _timed(lambda query: _naive(naive, query), queries)
+    return {
+        "flights_per_route_day": flights_per_route_day,
+        "flights": len(schedule),
+        "build_ms": round(build_ms, 1),
+        "column_mb": round(sum(getattr(schedule, name).nbytes for name in ("origin", "destination", "day", "depart", "duration", "price", "airline", "code")) / 2**20 + schedule._keys.nbytes / 2**20, 1),
+        "columnar": columnar_stats,
+        "naive": naive_stats,
+        "same_top_k": round(sum(a == b for a, b in zip(columnar_results, naive_results)) / len(queries), 4),
+    }
+
+
+def write_fixture(path: str, cities: int, days: int, flights_per_route_day: float):
+    columns = synthetic_columns(cities, days, datetime.date.today(), flights_per_route_day)
+    names = [f"City {i}" for i in range(cities)]
+    schedule = FlightSchedule(names, AIRLINES, columns)
+    if path.endswith(".npz"):
+        save_schedule(schedule, path)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["airline", "flight_number", "origin", "destination", "date", "depart_time", "duration_minutes", "price"])
+            for row in range(len(schedule)):
+                airline = schedule.airlines[schedule.airline[row]]
+                writer.writerow([
+                    airline, schedule.flight_code(row),
+                    names[schedule.origin[row]], names[schedule.destination[row]],
+                    datetime.date.fromordinal(int(schedule.day[row])).isoformat(),
+                    _hhmm(schedule.depart[row]), int(schedule.duration[row]), int(schedule.price[row]),
+                ])
+    print(json.dumps({"written": path, **schedule.stats()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=20)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--flights-per-route-day", type=float, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--write-fixture", help="Write a synthetic schedule (.npz or .csv) and exit.")
+    args = parser.parse_args()
+
+    if args.write_fixture:
+        write_fixture(args.write_fixture, args.cities, args.days, args.flights_per_route_day[0])
+        return
+
+    report = {
+        "cities": args.cities,
+        "days": args.days,
+        "queries": args.queries,
+        "top_k": TOP_K,
+        "densities": [run_density(args.cities, args.days, density, args.queries) for density in args.flights_per_route_day],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
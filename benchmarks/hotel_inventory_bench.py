@@ -0,0 +1,158 @@
+# benchmarks/hotel_inventory_bench.py
+"""
+Query latency of the indexed hotel inventory (tools/hotel_inventory.py) against the
+original approach - a linear substring scan over the location keys followed by a
+Python budget filter - for growing synthetic inventories. Queries mix exact names,
+"City, Country" forms, aliases, prefixes and free-form sentences, with and without
+a budget. Run from the repo root:
+
+    python -m benchmarks.hotel_inventory_bench --sizes 1000 10000 100000
+    python -m benchmarks.hotel_inventory_bench --write-fixture /tmp/hotels.csv --sizes 50000
+
+A written fixture can be served with HOTEL_INVENTORY_PATH=/tmp/hotels.csv.
+"""
+
+import csv
+import json
+import time
+import random
+import argparse
+
+from tools.hotel_inventory import HotelInventory
+
+HOTELS_PER_LOCATION = 40
+BRANDS = ["Grand", "Royal", "Harbor", "Garden", "Palace", "Boutique", "Riverside", "Summit", "Old Town", "Park"]
+KINDS = ["Hotel", "Resort", "Inn", "Suites", "Lodge", "Residences"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "to", "sen", "vel", "dor", "an", "qui", "bel", "mar", "zu", "tan", "por"]
+
+
+def synthetic_hotels(count: int, seed: int = 11) -> list[dict]:
+    rng = random.Random(seed)
+    locations = []
+    seen = set()
+    while len(locations) < max(1, count // HOTELS_PER_LOCATION):
+        city = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        if city in seen:
+            continue
+        seen.add(city)
+        country = "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize() + "ia"
+        locations.append((city, country, city[:3] + "port"))
+    hotels = []
+    for i in range(count):
+        city, country, alias = rng.choice(locations)
+        hotels.append({
+            "name": f"{rng.choice(BRANDS)} {city} {rng.choice(KINDS)} {i}",
+            "location": city,
+            "country": country,
+            "aliases": alias,
+            "price": int(rng.lognormvariate(9.6, 0.6)) // 100 * 100,
+            "description": "Synthetic property for benchmarking.",
+        })
+    return hotels
+
+
+def synthetic_queries(hotels: list[dict], count: int, seed: int = 12) -> list[tuple[str, int]]:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        hotel = rng.choice(hotels)
+        form = rng.randrange(5)
+        if form == 0:
+            text = hotel["location"]
+        elif form == 1:
+            text = f"{hotel['location']}, {hotel['country']}"
+        elif form == 2:
+            text = hotel["aliases"]
+        elif form == 3:
+            text = hotel["location"][:4]
+        else:
+            text = f"a quiet hotel in {hotel['location']} please"
+        budget = rng.choice([0, 0, rng.randrange(5000, 40000, 500)])
+        queries.append((text, budget))
+    return queries
+
+
+class NaiveInventory:
+    """The original hotel_search_tool logic: substring scan over keys, then a budget filter."""
+
+    def __init__(self, hotels: list[dict]):
+        self.database: dict[str, list[dict]] = {}
+        for hotel in hotels:
+            self.database.setdefault(hotel["location"].lower(), []).append(hotel)
+
+    def search(self, location: str, budget: int) -> list[dict]:
+        location_key = location.lower()
+        options = []
+        for key in self.database:
+            if key in location_key:
+                options = self.database[key]
+                break
+        return [hotel for hotel in options if budget == 0 or hotel["price"] <= budget]
+
+
+def _summary(samples_us: list[float]) -> dict:
+    ordered = sorted(samples_us)
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+    return {
+        "p50_us": percentile(0.5),
+        "p95_us": percentile(0.95),
+        "p99_us": percentile(0.99),
+        "queries_per_second": round(len(ordered) / (sum(ordered) / 1e6)),
+    }
+
+
+def _time_queries(search, queries) -> tuple[list[float], int]:
+    samples, found = [], 0
+    for text, budget in queries:
+        started = time.perf_counter()
+        result = search(text, budget)
+        samples.append((time.perf_counter() - started) * 1e6)
+        found += bool(result)
+    return samples, found
+
+
+def run_size(size: int, query_count: int, page_size: int) -> dict:
+    hotels = synthetic_hotels(size)
+    queries = synthetic_queries(hotels, query_count)
+
+    started = time.perf_counter()
+    inventory = HotelInventory(hotels)
+    build_ms = (time.perf_counter() - started) * 1000
+    naive = NaiveInventory(hotels)
+
+    indexed_samples, indexed_found = _time_queries(
+        lambda text, budget: inventory.search(text, max_price=budget, page_size=page_size)["total"], queries)
+    naive_samples, naive_found = _time_queries(naive.search, queries)
+    return {
+        "hotels": size,
+        "locations": len(inventory.hotels),
+        "build_ms": round(build_ms, 1),
+        "indexed": {**_summary(indexed_samples), "queries_with_results": indexed_found},
+        "linear_scan": {**_summary(naive_samples), "queries_with_results": naive_found},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=5)
+    parser.add_argument("--write-fixture", help="Write the largest synthetic inventory to this CSV and exit.")
+    args = parser.parse_args()
+
+    if args.write_fixture:
+        hotels = synthetic_hotels(max(args.sizes))
+        with open(args.write_fixture, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(hotels[0]))
+            writer.writeheader()
+            writer.writerows(hotels)
+        print(json.dumps({"written": args.write_fixture, "hotels": len(hotels)}))
+        return
+
+    report = {"queries": args.queries, "page_size": args.page_size, "sizes": [run_size(size, args.queries, args.page_size) for size in args.sizes]}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# benchmarks/intent_router_eval.py
+"""
+Routing accuracy and latency of the local intent router (tools/intent_router.py)
+on a labeled test set of utterances that are not in its training examples. For
+each utterance the router either dispatches to a specialist (by keyword rule or
+by the classifier) or falls back to the LLM router. Reports coverage (share
+dispatched locally), precision of the local dispatches, top-1 accuracy of the
+classifier, per-agent results, classification latency, and a threshold sweep.
+Run from the repo root:
+
+    python -m benchmarks.intent_router_eval
+    python -m benchmarks.intent_router_eval --traces traces.jsonl
+    python -m benchmarks.intent_router_eval --llm-route-ms 650 --output intents.json
+
+Latency saved per turn needs the LLM router's cost: the time from the finished
+input transcription to root_agent's transfer_to_agent call. --traces reads it
+from turn traces exported with TRACE_EXPORT_PATH (marks "input_transcribed" and
+"transfer_to.<agent>"), otherwise --llm-route-ms gives it. A correct local
+dispatch saves that round trip, a wrong one costs about one more (the specialist
+hands the turn back), and every turn pays for the classification.
+"""
+
+import json
+import time
+import argparse
+import statistics
+
+from tools.intent_router import (
+    AGENTS,
+    INTENT_EXAMPLES_PATH,
+    INTENT_ROUTER_THRESHOLD,
+    MARK_INPUT_TRANSCRIBED,
+    IntentClassifier,
+    IntentRouter,
+    read_intent_examples,
+)
+
+SWEEP_THRESHOLDS = [0.5, 0.6, 0.7, 0.75, 0.8, 0.9, 0.95]
+
+
+def llm_route_ms_from_traces(path: str) -> tuple[float | None, int]:
+    """Median ms from the finished transcription to an LLM transfer_to_agent, and the turns it is based on."""
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            marks = json.loads(line).get("marks", {})
+            transcribed = marks.get(MARK_INPUT_TRANSCRIBED)
+            transfers = [offset for name, offset in marks.items() if name.startswith("transfer_to.")]
+            if transcribed is not None and transfers and min(transfers) > transcribed:
+                samples.append(min(transfers) - transcribed)
+    return (statistics.median(samples) if samples else None), len(samples)
+
+
+def evaluate(router: IntentRouter, texts: list[str], labels: list[str]) -> tuple[dict, list[dict]]:
+    routes = [router.route(text) for text in texts]
+    dispatched = [(route, label) for route, label in zip(routes, labels) if route["agent"] is not None]
+    correct = sum(route["agent"] == label for route, label in dispatched)
+    per_agent = {}
+    for agent in AGENTS:
+        expected = [route for route, label in zip(routes, labels) if label == agent]
+        sent = [label for route, label in dispatched if route["agent"] == agent]
+        per_agent[agent] = {
+            "utterances": len(expected),
+            "dispatched": sum(route["agent"] is not None for route in expected),
+            "recall": round(sum(route["agent"] == agent for route in expected) / len(expected), 3) if expected else None,
+            "precision": round(sent.count(agent) / len(sent), 3) if sent else None,
+        }
+    summary = {
+        "utterances": len(texts),
+        "dispatched": len(dispatched),
+        "by_rule": sum(route["source"] == "rule" for route in routes),
+        "by_model": sum(route["source"] == "model" for route in routes),
+        "fallback_to_llm": sum(route["source"] == "fallback" for route in routes),
+        "coverage": round(len(dispatched) / len(texts), 3),
+        "precision": round(correct / len(dispatched), 3) if dispatched else None,
+        "top1_accuracy": round(sum(route["label"] == label for route, label in zip(routes, labels)) / len(texts), 3),
+        "correct_dispatches": correct,
+        "wrong_dispatches": len(dispatched) - correct,
+        "per_agent": per_agent,
+    }
+    mistakes = [
+        {"text": text, "expected": label, **route}
+        for text, label, route in zip(texts, labels, routes)
+        if route["agent"] is not None and route["agent"] != label
+    ]
+    return summary, mistakes
+
+
+def time_routes(router: IntentRouter, texts: list[str], repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        for text in texts:
+            started = time.perf_counter()
+            router.route(text)
+            samples.append((time.perf_counter() - started) * 1e6)
+    ordered = sorted(samples)
+    return {
+        "p50_us": round(ordered[len(ordered) // 2], 1),
+        "p95_us": round(ordered[int(len(ordered) * 0.95)], 1),
+        "p99_us": round(ordered[int(len(ordered) * 0.99)], 1),
+        "mean_us": round(statistics.fmean(samples), 1),
+    }
+
+
+def saved_ms_per_turn(summary: dict, llm_route_ms: float, classify_ms: float) -> float:
+    net = (summary["correct_dispatches"] - summary["wrong_dispatches"]) * llm_route_ms
+    return round(net / summary["utterances"] - classify_ms, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--test-set", default="benchmarks/intent_test_set.jsonl")
+    parser.add_argument("--examples", default=INTENT_EXAMPLES_PATH, help="Training examples (JSONL).")
+    parser.add_argument("--threshold", type=float, default=INTENT_ROUTER_THRESHOLD)
+    parser.add_argument("--traces", help="Turn traces (TRACE_EXPORT_PATH) to measure the LLM router's latency from.")
+    parser.add_argument("--llm-route-ms", type=float, help="LLM routing latency to assume when there are no traces.")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the test set for latency timing.")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    train_texts, train_labels = read_intent_examples(args.examples)
+    started = time.perf_counter()
+    classifier = IntentClassifier.fit(train_texts, train_labels)
+    train_ms = (time.perf_counter() - started) * 1000
+    texts, labels = read_intent_examples(args.test_set)
+    overlap = set(texts) & set(train_texts)
+
+    summary, mistakes = evaluate(IntentRouter(classifier, args.threshold), texts, labels)
+    latency = time_routes(IntentRouter(classifier, args.threshold), texts, args.repeat)
+    classify_ms = latency["mean_us"] / 1000
+
+    llm_route_ms, llm_route_source = args.llm_route_ms, "argument" if args.llm_route_ms is not None else None
+    if args.traces:
+        measured, turns = llm_route_ms_from_traces(args.traces)
+        if measured is not None:
+            llm_route_ms, llm_route_source = measured, f"median of {turns} traced turns"
+
+    sweep = []
+    for threshold in SWEEP_THRESHOLDS:
+        point, _ = evaluate(IntentRouter(classifier, threshold), texts, labels)
+        row = {"threshold": threshold, "coverage": point["coverage"], "precision": point["precision"],
+               # Share of the LLM round trip saved per turn, whatever that round trip costs.
+               "net_saved_fraction": round((point["correct_dispatches"] - point["wrong_dispatches"]) / point["utterances"], 3)}
+        if llm_route_ms is not None:
+            row["saved_ms_per_turn"] = saved_ms_per_turn(point, llm_route_ms, classify_ms)
+        sweep.append(row)
+
+    report = {
+        "training_examples": len(train_texts),
+        "train_ms": round(train_ms, 1),
+        "test_utterances": len(texts),
+        "test_overlaps_training": len(overlap),
+        "threshold": args.threshold,
+        **summary,
+        "classify_latency": latency,
+        "llm_route_ms": llm_route_ms,
+        "llm_route_ms_source": llm_route_source,
+        "saved_ms_per_turn": saved_ms_per_turn(summary, llm_route_ms, classify_ms) if llm_route_ms is not None else None,
+        "threshold_sweep": sweep,
+        "wrong_dispatch_examples": mistakes[:10],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# benchmarks/multiworker_load.py
+"""
+Measures how many concurrent live audio sessions the server sustains per worker
+process. For each worker count it starts `python -m tools.worker_router` serving
+benchmarks.stub_live:app, then ramps up concurrent WebSocket sessions. Each session
+streams 40 ms microphone frames in real time and sends a text ping every second;
+the stub model answers each frame with agent audio and echoes the ping. A load
+level passes when the ping p95 stays within the budget and nearly all agent audio
+arrives. Before the load levels, one keep-alive HTTP connection fetches each
+worker's local media probe (benchmarks.stub_live.PROBE_OBJECT) in turn, checking
+that the router routes every request on a reused connection, not just the first.
+Run from the repo root:
+
+    python -m benchmarks.multiworker_load --workers 1 2 4 --sessions 25 50 100 200
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import base64
+import signal
+import asyncio
+import argparse
+import subprocess
+import http.client
+import urllib.request
+from multiprocessing import Pool
+
+import websockets
+
+from benchmarks.stub_live import PROBE_OBJECT
+from tools.worker_router import MEDIA_WORKER_PARAM
+from tools.ws_protocol import DIRECTION_CLIENT_TO_AGENT, AudioFrameSequencer
+
+FRAME_SECONDS = 0.04
+INPUT_FRAME = bytes(16000 * 2 * 40 // 1000)  # 40 ms of 16 kHz mono PCM
+PING_INTERVAL_SECONDS = 1.0
+DRAIN_SECONDS = 1.0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workers: int, port: int, app: str = "benchmarks.stub_live:app", stdout=None) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WEB_WORKERS": str(workers),
+        "WEB_APP": app,
+        "WEB_HOST": "127.0.0.1",
+        "PORT": str(port),
+        "WORKER_BASE_PORT": str(_free_port() + 100),
+    }
+    return subprocess.Popen([sys.executable, "-m", "tools.worker_router"], env=env, stdout=stdout)
+
+
+def _wait_until_ready(port: int, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} did not become ready.")
+
+
+def _stop_server(process: subprocess.Popen):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=20)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def check_keep_alive_routing(port: int, workers: int, rounds: int = 3) -> dict:
+    """Fetches every worker's media probe, `rounds` times over, through one HTTP/1.1 connection."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    statuses, routed = {}, 0
+    try:
+        for request in range(rounds * workers):
+            worker = request % workers
+            # http.client reuses the connection unless the previous response closed it.
+            connection.request("GET", f"/media/{PROBE_OBJECT}?{MEDIA_WORKER_PARAM}={worker}")
+            response = connection.getresponse()
+            body = response.read()
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            routed += response.status == 200 and body == str(worker).encode("ascii")
+    finally:
+        connection.close()
+    return {"requests": rounds * workers, "routed_to_owner": routed, "statuses": statuses, "ok": routed == rounds * workers}
+
+
+async def _run_session(url: str, protocol: str, seconds: float) -> dict:
+    result = {"connected": False, "frames_sent": 0, "audio_received": 0, "pings_sent": 0, "rtts_ms": []}
+    sequencer = AudioFrameSequencer(DIRECTION_CLIENT_TO_AGENT)
+    json_frame = json.dumps({"mime_type": "audio/pcm", "data": base64.b64encode(INPUT_FRAME).decode("ascii")})
+    pings = {}
+    negotiated = {"protocol": "json"}
+
+    try:
+        async with websockets.connect(f"{url}&protocol={protocol}", max_size=None) as ws:
+            result["connected"] = True
+
+            async def read():
+                async for message in ws:
+                    if isinstance(message, bytes):
+                        result["audio_received"] += 1
+                        continue
+                    data = json.loads(message)
+                    mime_type = data.get("mime_type")
+                    if mime_type == "application/x-odyssey-protocol":
+                        negotiated["protocol"] = data["data"]
+                    elif mime_type == "audio/pcm":
+                        result["audio_received"] += 1
+                    elif mime_type == "text/plain" and data.get("data") in pings:
+                        result["rtts_ms"].append((time.perf_counter() - pings.pop(data["data"])) * 1000)
+
+            reader = asyncio.create_task(read())
+            loop = asyncio.get_running_loop()
+            started = next_frame = next_ping = loop.time()
+            while loop.time() - started < seconds:
+                now = loop.time()
+                if now >= next_ping:
+                    ping_id = f"ping-{result['pings_sent']}"
+                    pings[ping_id] = time.perf_counter()
+                    await ws.send(json.dumps({"mime_type": "text/plain", "data": ping_id}))
+                    result["pings_sent"] += 1
+                    next_ping += PING_INTERVAL_SECONDS
+                if negotiated["protocol"] == "binary":
+                    await ws.send(sequencer.pack(INPUT_FRAME, 16000))
+                else:
+                    await ws.send(json_frame)
+                result["frames_sent"] += 1
+                next_frame += FRAME_SECONDS
+                await asyncio.sleep(max(0.0, next_frame - loop.time()))
+            await asyncio.sleep(DRAIN_SECONDS)
+            reader.cancel()
+    except (OSError, websockets.WebSocketException):
+        pass
+    return result
+
+
+def _client_process(args: tuple) -> list[dict]:
+    port, first_session, session_count, protocol, seconds = args
+
+    async def run():
+        sessions = [
+            _run_session(f"ws://127.0.0.1:{port}/ws/load-{first_session + i}?is_audio=true", protocol, seconds)
+            for i in range(session_count)
+        ]
+        return await asyncio.gather(*sessions)
+
+    return asyncio.run(run())
+
+
+def _percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+
+
+def run_level(pool: Pool, port: int, sessions: int, client_procs: int, protocol: str, seconds: float, first_session: int) -> dict:
+    per_proc = [sessions // client_procs + (1 if i < sessions % client_procs else 0) for i in range(client_procs)]
+    jobs, offset = [], first_session
+    for count in per_proc:
+        if count:
+            jobs.append((port, offset, count, protocol, seconds))
+            offset += count
+    results = [session for batch in pool.map(_client_process, jobs) for session in batch]
+
+    rtts = [rtt for session in results for rtt in session["rtts_ms"]]
+    frames_sent = sum(session["frames_sent"] for session in results)
+    return {
+        "sessions": sessions,
+        "connected": sum(1 for session in results if session["connected"]),
+        "ping_p50_ms": _percentile(rtts, 0.5),
+        "ping_p95_ms": _percentile(rtts, 0.95),
+        "pings_lost": sum(session["pings_sent"] for session in results) - len(rtts),
+        "audio_delivery": round(sum(session["audio_received"] for session in results) / frames_sent, 3) if frames_sent else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--protocol", choices=["json", "binary"], default="json")
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--rtt-budget-ms", type=float, default=200.0)
+    parser.add_argument("--min-audio-delivery", type=float, default=0.95)
+    args = parser.parse_args()
+
+    report = {"cpu_count": os.cpu_count(), "protocol": args.protocol, "rtt_budget_ms": args.rtt_budget_ms, "runs": []}
+    first_session = 0
+    with Pool(args.client_procs) as pool:
+        for workers in args.workers:
+            port = _free_port()
+            server = _start_server(workers, port)
+            try:
+                _wait_until_ready(port)
+                keep_alive = check_keep_alive_routing(port, workers)
+                print(json.dumps({"workers": workers, "keep_alive_routing": keep_alive}), file=sys.stderr)
+                levels = []
+                for sessions in args.sessions:
+                    level = run_level(pool, port, sessions, args.client_procs, args.protocol, args.seconds, first_session)
+                    first_session += sessions
+                    level["ok"] = (
+                        level["connected"] == sessions
+                        and level["ping_p95_ms"] is not None
+                        and level["ping_p95_ms"] <= args.rtt_budget_ms
+                        and level["audio_delivery"] >= args.min_audio_delivery
+                    )
+                    levels.append(level)
+                    print(json.dumps({"workers": workers, **level}), file=sys.stderr)
+                    if not level["ok"]:
+                        break
+            finally:
+                _stop_server(server)
+            sustained = max((level["sessions"] for level in levels if level["ok"]), default=0)
+            report["runs"].append({
+                "workers": workers,
+                "max_sessions_within_budget": sustained,
+                "sessions_per_worker": round(sustained / workers, 1),
+                "keep_alive_routing": keep_alive,
+                "levels": levels,
+            })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# benchmarks/replay_live.py
+"""
+The real app with a scripted live model and fake Maps/GCS/Imagen backends, for
+load tests that look like real conversations (see benchmarks/ws_load.py). Serve it
+with:
+
+    WEB_APP=benchmarks.replay_live:app python -m tools.worker_router
+
+The stub model follows the microphone audio it receives: while the user speaks it
+emits input transcripts; after REPLAY_END_OF_SPEECH_MS of silence it answers with
+REPLAY_REPLY_SECONDS of 24 kHz agent audio (streamed REPLAY_AUDIO_SPEEDUP times
+faster than real time, like the live API) interleaved with output transcripts, then
+turn_complete. Speaking over the reply interrupts it. Every REPLAY_TOOL_EVERY-th
+turn first runs the image or place photo tool against the fake backends, whose
+latencies are set with REPLAY_{MAPS,GCS,IMAGEN}_LATENCY_MS. Text messages are
+echoed back as final model text, as in benchmarks/stub_live.py.
+
+Latency stamps: the load clients put time.time() in the first 8 bytes of every
+microphone frame, and the stub does the same for every agent audio chunk and
+appends "@<time>" to every output transcript, so both directions can be timed on
+one host. /bench/reset and /bench/stats expose event-loop lag, resident memory and
+inbound latency measured inside the server.
+"""
+
+import os
+
+# Offline defaults; real values from the environment or .env still win.
+os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "FALSE")
+os.environ.setdefault("GOOGLE_API_KEY", "AIza-stub-key-for-load-tests")
+os.environ.setdefault("GOOGLE_PROJECT_ID", "replay-load-test")
+os.environ.setdefault("LOCATION", "us-central1")
+os.environ.setdefault("MEDIA_STORE", "local")
+os.environ.setdefault("SESSION_STORE", "memory")
+os.environ.setdefault("CLIENT_WARMUP", "off")
+# The replay clients stamp their frames and measure the stub's echo; keep the audio intact.
+os.environ.setdefault("VOICE_GATE", "off")
+
+import time
+import struct
+import asyncio
+import resource
+from types import SimpleNamespace
+
+import numpy as np
+from google.adk.agents import LiveRequestQueue
+
+import main
+import tools.creative_backend_tools as creative_backend_tools
+import tools.place_photo_tools as place_photo_tools
+from tools.agent_wrappers import generate_image_tool_func, fetch_place_photo_tool_func
+from tools.clients import LazyClient
+from tools.media_store import GCSMediaStore
+from tools.tracing import LatencyWindow
+from tools.voice_gate import window_energies_dbfs
+from tools.ws_protocol import DEFAULT_INPUT_SAMPLE_RATE, DEFAULT_OUTPUT_SAMPLE_RATE
+
+END_OF_SPEECH_MS = int(os.getenv("REPLAY_END_OF_SPEECH_MS", "600"))
+SPEECH_THRESHOLD_DBFS = float(os.getenv("REPLAY_SPEECH_THRESHOLD_DBFS", "-40"))
+REPLY_SECONDS = float(os.getenv("REPLAY_REPLY_SECONDS", "3"))
+AUDIO_SPEEDUP = float(os.getenv("REPLAY_AUDIO_SPEEDUP", "1.5"))
+TOOL_EVERY = int(os.getenv("REPLAY_TOOL_EVERY", "3"))
+MAPS_LATENCY_SECONDS = float(os.getenv("REPLAY_MAPS_LATENCY_MS", "120")) / 1000
+GCS_LATENCY_SECONDS = float(os.getenv("REPLAY_GCS_LATENCY_MS", "80")) / 1000
+IMAGEN_LATENCY_SECONDS = float(os.getenv("REPLAY_IMAGEN_LATENCY_MS", "1500")) / 1000
+FAKE_BUCKET_NAME = "replay-load-test"
+
+STAMP = struct.Struct("<d")
+CHUNK_MS = 40
+OUTPUT_MIME_TYPE = f"audio/pcm;rate={DEFAULT_OUTPUT_SAMPLE_RATE}"
+OUTPUT_CHUNK = bytes(DEFAULT_OUTPUT_SAMPLE_RATE * 2 * CHUNK_MS // 1000)
+TRANSCRIPT_EVERY_CHUNKS = 10
+INPUT_TRANSCRIPT_EVERY_MS = 400
+PLACE_NAMES = ["Kyoto", "Lisbon", "Reykjavik", "Cusco", "Zanzibar", "Banff", "Petra", "Hoi An"]
+
+
+# --- Fake Backends ---
+class FakeMapsClient:
+    """Blocking, like googlemaps.Client; runs on the Maps executor."""
+
+    def geocode(self, place_name):
+        time.sleep(MAPS_LATENCY_SECONDS)
+        return [{"place_id": f"place-{place_name.casefold()}", "formatted_address": place_name}]
+
+    def place(self, place_id, fields=None):
+        time.sleep(MAPS_LATENCY_SECONDS)
+        return {"result": {"name": place_id, "photos": [{"photo_reference": f"{place_id}-photo-{i}"} for i in range(5)]}}
+
+    def places_photo(self, photo_reference, max_width=None):
+        time.sleep(MAPS_LATENCY_SECONDS)
+        chunk = bytes(8 * 1024)
+        return iter([chunk] * 15)
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = None
+        self.content_type = None
+
+    def upload_from_string(self, data, content_type=None):
+        time.sleep(GCS_LATENCY_SECONDS)
+        self.bucket.objects[self.name] = (len(data), content_type)
+
+    def upload_from_file(self, file_obj, content_type=None):
+        size = 0
+        while chunk := file_obj.read(self.chunk_size or 256 * 1024):
+            size += len(chunk)
+            time.sleep(GCS_LATENCY_SECONDS)
+        self.bucket.objects[self.name] = (size, content_type)
+
+    def download_as_bytes(self):
+        time.sleep(GCS_LATENCY_SECONDS)
+        size, self.content_type = self.bucket.objects.get(self.name, (0, None))
+        return bytes(size)
+
+
+class FakeBucket:
+    """Blocking, like google.cloud.storage.Bucket; remembers only object sizes."""
+
+    def __init__(self):
+        self.name = FAKE_BUCKET_NAME
+        self.objects: dict[str, tuple[int, str | None]] = {}
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+
+class FakeImagenModels:
+    async def generate_images(self, model, prompt, config):
+        await asyncio.sleep(IMAGEN_LATENCY_SECONDS)
+        image = SimpleNamespace(image_bytes=b"\xff\xd8" + bytes(200 * 1024), mime_type="image/jpeg")
+        return SimpleNamespace(generated_images=[SimpleNamespace(image=image)])
+
+
+fake_media_store = GCSMediaStore(LazyClient("gcs", FakeBucket), FAKE_BUCKET_NAME)
+creative_backend_tools.genai_client = LazyClient("genai", lambda: SimpleNamespace(aio=SimpleNamespace(models=FakeImagenModels())))
+creative_backend_tools.media_store = fake_media_store
+place_photo_tools.gmaps_client = LazyClient("gmaps", FakeMapsClient)
+place_photo_tools.media_store = fake_media_store
+
+
+# --- Server-Side Measurements ---
+def resident_memory_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, not current
+
+
+class ReplayStats:
+    """Event-loop lag, inbound frame latency and turn counters since the last reset."""
+
+    TICK_SECONDS = 0.01
+
+    def __init__(self):
+        self._monitor: asyncio.Task | None = None
+        self._clear()
+
+    def reset(self):
+        """Clears the measurements and starts the lag monitor (on the server's event loop)."""
+        self._clear()
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.get_running_loop().create_task(self._watch_loop())
+
+    def _clear(self):
+        self.loop_lag = LatencyWindow(100_000)
+        self.inbound_latency = LatencyWindow(100_000)
+        self.turns = 0
+        self.interrupted = 0
+        self.tool_calls = 0
+        self.rss_baseline = resident_memory_bytes()
+        self.rss_peak = self.rss_baseline
+
+    async def _watch_loop(self):
+        loop = asyncio.get_running_loop()
+        ticks = 0
+        while True:
+            expected = loop.time() + self.TICK_SECONDS
+            await asyncio.sleep(self.TICK_SECONDS)
+            self.loop_lag.record(round(max(0.0, loop.time() - expected) * 1000, 1))
+            ticks += 1
+            if ticks % 50 == 0:
+                self.rss_peak = max(self.rss_peak, resident_memory_bytes())
+
+    def stats(self) -> dict:
+        rss = resident_memory_bytes()
+        self.rss_peak = max(self.rss_peak, rss)
+        return {
+            "live_sessions": len(main.live_sessions.sessions),
+            "turns": self.turns,
+            "interrupted": self.interrupted,
+            "tool_calls": self.tool_calls,
+            "loop_lag": self.loop_lag.summary(),
+            "inbound_latency": self.inbound_latency.summary(),
+            "rss_bytes": rss,
+            "rss_baseline_bytes": self.rss_baseline,
+            "rss_peak_bytes": self.rss_peak,
+        }
+
+
+replay_stats = ReplayStats()
+
+
+@main.app.post("/bench/reset")
+async def bench_reset():
+    replay_stats.reset()
+    return replay_stats.stats()
+
+
+@main.app.get("/bench/stats")
+async def bench_stats():
+    return replay_stats.stats()
+
+
+# --- Scripted Live Model ---
+def _event(content=None, partial=False, turn_complete=False, interrupted=False):
+    return SimpleNamespace(content=content, partial=partial, turn_complete=turn_complete, interrupted=interrupted,
+                           actions=SimpleNamespace(transfer_to_agent=None))
+
+
+def _text_event(role: str, text: str, partial: bool = False):
+    part = SimpleNamespace(text=text, inline_data=None)
+    return _event(content=SimpleNamespace(role=role, parts=[part]), partial=partial)
+
+
+def _audio_event():
+    chunk = STAMP.pack(time.time()) + OUTPUT_CHUNK[STAMP.size:]
+    part = SimpleNamespace(text=None, inline_data=SimpleNamespace(mime_type=OUTPUT_MIME_TYPE, data=chunk))
+    return _event(content=SimpleNamespace(role="model", parts=[part]), partial=True)
+
+
+class ReplayModel:
+    """Turns the microphone stream into input transcripts, replies and interruptions."""
+
+    def __init__(self, session_id: str, live_request_queue: LiveRequestQueue):
+        self.session_id = session_id
+        self.live_request_queue = live_request_queue
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.user_speaking = False
+        self.speech_ms = 0
+        self.silence_ms = 0
+        self.turns = 0
+
+    async def listen(self):
+        """Reads the request queue; puts ("speech" | "text" | "reply" | "close", payload) on self.events."""
+        while True:
+            request = await self.live_request_queue.get()
+            if request.close:
+                await self.events.put(("close", None))
+                return
+            if request.content is not None:
+                await self.events.put(("text", "".join(part.text or "" for part in request.content.parts)))
+            elif request.blob is not None:
+                self._hear(request.blob.data)
+
+    def _hear(self, pcm: bytes):
+        now = time.time()
+        stamp = STAMP.unpack_from(pcm)[0] if len(pcm) >= STAMP.size else 0.0
+        if 0 <= now - stamp < 60:
+            replay_stats.inbound_latency.record(round((now - stamp) * 1000, 1))
+        audio = pcm[STAMP.size:]
+        frame_ms = len(audio) * 1000 // (2 * DEFAULT_INPUT_SAMPLE_RATE)
+        energies = window_energies_dbfs(audio, DEFAULT_INPUT_SAMPLE_RATE)
+        if energies.size and float(np.max(energies)) > SPEECH_THRESHOLD_DBFS:
+            if not self.user_speaking:
+                self.user_speaking = True
+                self.speech_ms = 0
+            self.speech_ms += frame_ms
+            self.silence_ms = 0
+            if self.speech_ms % INPUT_TRANSCRIPT_EVERY_MS < frame_ms:
+                self.events.put_nowait(("speech", self.speech_ms))
+        elif self.user_speaking:
+            self.silence_ms += frame_ms
+            if self.silence_ms >= END_OF_SPEECH_MS:
+                self.user_speaking = False
+                self.events.put_nowait(("reply", None))
+
+    async def run(self):
+        listener = asyncio.create_task(self.listen())
+        try:
+            while True:
+                kind, payload = await self.events.get()
+                if kind == "close":
+                    return
+                if kind == "text":
+                    yield _text_event("model", payload)
+                    yield _event(turn_complete=True)
+                elif kind == "speech":
+                    yield _text_event("user", f"user speech {payload} ms", partial=True)
+                elif kind == "reply":
+                    async for event in self.reply():
+                        yield event
+        finally:
+            listener.cancel()
+
+    async def reply(self):
+        self.turns += 1
+        replay_stats.turns += 1
+        if TOOL_EVERY and self.turns % TOOL_EVERY == 0:
+            replay_stats.tool_calls += 1
+            if self.turns // TOOL_EVERY % 2:
+                await generate_image_tool_func(f"{self.session_id} turn {self.turns}: a lighthouse at dusk")
+            else:
+                await fetch_place_photo_tool_func(PLACE_NAMES[self.turns % len(PLACE_NAMES)])
+
+        chunk_seconds = CHUNK_MS / 1000 / AUDIO_SPEEDUP
+        loop = asyncio.get_running_loop()
+        next_chunk = loop.time()
+        for index in range(int(REPLY_SECONDS * 1000 / CHUNK_MS)):
+            if self.user_speaking:
+                replay_stats.interrupted += 1
+                yield _event(interrupted=True)
+                return
+            if index % TRANSCRIPT_EVERY_CHUNKS == 0:
+                yield _text_event("model", f"reply {self.turns} part {index // TRANSCRIPT_EVERY_CHUNKS} @{time.time():.6f}", partial=True)
+            yield _audio_event()
+            next_chunk += chunk_seconds
+            await asyncio.sleep(max(0.0, next_chunk - loop.time()))
+        yield _event(turn_complete=True)
+
+
+async def start_replay_agent_session(session_id: str, is_audio: bool = False):
+    live_request_queue = LiveRequestQueue()
+    model = ReplayModel(session_id, live_request_queue)
+    return model.run(), live_request_queue, SimpleNamespace(id=session_id)
+
+
+main.start_agent_session = start_replay_agent_session
+app = main.app
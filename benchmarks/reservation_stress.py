@@ -0,0 +1,209 @@
+# benchmarks/reservation_stress.py
+"""
+Stress test of the reservation ledger (tools/reservations.py): hundreds of
+simulated sessions, spread over several processes sharing one SQLite file, race
+for a deliberately small inventory of flight seats and hotel room-nights. Some
+tool calls are retried concurrently with the same idempotency key, some holds
+are released or confirmed, and the rest lapse and are swept while the test runs.
+Afterwards the ledger is checked: no resource is held beyond its capacity,
+every resource's held count matches its live holds, and every retry returned
+the original hold. Run from the repo root:
+
+    python -m benchmarks.reservation_stress --sessions 400 --processes 4
+    python -m benchmarks.reservation_stress --sessions 800 --seats 20 --output reservations.json
+
+Exits with status 1 if anything was oversold or inconsistent.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+from tools.reservations import ReservationLedger, ReservationUnavailableError, HELD, CONFIRMED
+
+DATE = "2030-03-01"
+NIGHTS = ["2030-03-01", "2030-03-02", "2030-03-03", "2030-03-04"]
+
+
+def _inventory(args) -> list[list[tuple[str, int, int]]]:
+    """Every bookable option: one-way flights, round trips, and hotel stays of 1-4 nights."""
+    flights = [f"flight:Bench>City {i}:{DATE}T08:00:Bench Air" for i in range(args.flights)]
+    options = [[(flight, 0, args.seats)] for flight in flights]
+    options += [[(a, 0, args.seats), (b, 0, args.seats)] for a in flights for b in flights if a < b]
+    for hotel in range(args.hotels):
+        for first in range(len(NIGHTS)):
+            for last in range(first + 1, len(NIGHTS) + 1):
+                options.append([(f"hotel:bench:Hotel {hotel}:{night}", 0, args.rooms) for night in NIGHTS[first:last]])
+    return options
+
+
+async def _session(ledger, worker: int, session: int, options, args, start: asyncio.Event, result: dict):
+    rng = random.Random(worker * 100003 + session)
+    await start.wait()
+    for attempt in range(args.attempts):
+        units = rng.randint(1, 3)
+        items = [(resource, units, capacity) for resource, _, capacity in rng.choice(options)]
+        key = f"w{worker}-s{session}:{attempt}"
+        hold_seconds = args.hold_seconds * rng.uniform(0.5, 1.5)
+        retried = rng.random() < args.retry_rate
+        calls = 2 if retried else 1
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(ledger.hold(key, items, session_id=f"s{session}", hold_seconds=hold_seconds) for _ in range(calls)),
+            return_exceptions=True,
+        )
+        result["latencies_ms"].append((time.perf_counter() - started) * 1000 / calls)
+        result["calls"] += calls
+
+        holds = [outcome for outcome in outcomes if isinstance(outcome, dict)]
+        failures = [outcome for outcome in outcomes if not isinstance(outcome, (dict, ReservationUnavailableError))]
+        if failures:
+            result["errors"].append(repr(failures[0]))
+        if not holds:
+            result["sold_out"] += 1
+            continue
+        result["granted"] += 1
+        if retried:
+            result["retries"] += 1
+            # Both calls must name the same hold; a second hold would be a double booking.
+            if len({hold["hold_id"] for hold in holds}) != 1:
+                result["replay_mismatches"] += 1
+
+        choice = rng.random()
+        if choice < args.release_rate:
+            await asyncio.sleep(rng.uniform(0, 0.05))
+            released = await ledger.release(holds[0]["hold_id"])
+            result["released"] += released
+        elif choice < args.release_rate + args.confirm_rate:
+            confirmed = await ledger.confirm(holds[0]["hold_id"])
+            result["confirmed"] += confirmed
+        await asyncio.sleep(rng.uniform(0, args.think_seconds))
+
+
+async def _run_worker(worker: int, sessions: int, args) -> dict:
+    ledger = ReservationLedger(args.db, hold_seconds=args.hold_seconds)
+    options = _inventory(args)
+    result = {
+        "calls": 0, "granted": 0, "sold_out": 0, "retries": 0, "replay_mismatches": 0,
+        "released": 0, "confirmed": 0, "expired_during_run": 0, "latencies_ms": [], "errors": [],
+    }
+    sweeper = asyncio.create_task(ledger.run_sweeper())
+    start = asyncio.Event()
+    tasks = [asyncio.create_task(_session(ledger, worker, session, options, args, start, result)) for session in range(sessions)]
+    await asyncio.sleep(0.1)
+    started = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    result["seconds"] = time.perf_counter() - started
+    sweeper.cancel()
+    result["expired_during_run"] = ledger.expired
+    return result
+
+
+def run_worker(task: tuple) -> dict:
+    worker, sessions, args = task
+    return asyncio.run(_run_worker(worker, sessions, args))
+
+
+def verify(path: str) -> dict:
+    """Checks held counts against live holds and capacity, straight from the database."""
+    conn = sqlite3.connect(path)
+    inventory = {resource: (capacity, held) for resource, capacity, held in conn.execute("SELECT resource, capacity, held FROM inventory")}
+    live = dict(conn.execute(
+        "SELECT i.resource, SUM(i.units) FROM holds h JOIN hold_items i ON i.hold_id = h.hold_id WHERE h.status IN (?, ?) GROUP BY i.resource",
+        (HELD, CONFIRMED),
+    ).fetchall())
+    statuses = dict(conn.execute("SELECT status, COUNT(*) FROM holds GROUP BY status").fetchall())
+    conn.close()
+    return {
+        "resources": len(inventory),
+        "holds": statuses,
+        "oversold_resources": sum(held > capacity or live.get(resource, 0) > capacity for resource, (capacity, held) in inventory.items()),
+        "inconsistent_resources": sum(held != live.get(resource, 0) for resource, (capacity, held) in inventory.items()),
+        "negative_resources": sum(held < 0 for _capacity, held in inventory.values()),
+        "units_held": sum(held for _capacity, held in inventory.values()),
+        "units_capacity": sum(capacity for capacity, _held in inventory.values()),
+    }
+
+
+def _percentile(ordered: list[float], p: float) -> float:
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 2) if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=400)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--attempts", type=int, default=8, help="Bookings tried per session.")
+    parser.add_argument("--flights", type=int, default=4)
+    parser.add_argument("--seats", type=int, default=30)
+    parser.add_argument("--hotels", type=int, default=2)
+    parser.add_argument("--rooms", type=int, default=8)
+    parser.add_argument("--hold-seconds", type=float, default=1.0)
+    parser.add_argument("--think-seconds", type=float, default=0.5)
+    parser.add_argument("--retry-rate", type=float, default=0.2)
+    parser.add_argument("--release-rate", type=float, default=0.15)
+    parser.add_argument("--confirm-rate", type=float, default=0.25)
+    parser.add_argument("--db", help="Ledger file to use (default: a fresh temporary file).")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    if not args.db:
+        args.db = os.path.join(tempfile.mkdtemp(prefix="ledger-"), "reservations.sqlite3")
+    ReservationLedger(args.db)  # create the schema before the workers race to
+
+    shares = [args.sessions // args.processes + (i < args.sessions % args.processes) for i in range(args.processes)]
+    with multiprocessing.Pool(args.processes) as pool:
+        results = pool.map(run_worker, [(worker, sessions, args) for worker, sessions in enumerate(shares)])
+
+    during = verify(args.db)
+    # Let every remaining hold lapse; only confirmed units may stay held.
+    time.sleep(args.hold_seconds * 1.5)
+    lapsed = asyncio.run(ReservationLedger(args.db).expire_lapsed())
+    after = verify(args.db)
+
+    latencies = sorted(latency for result in results for latency in result["latencies_ms"])
+    calls = sum(result["calls"] for result in results)
+    seconds = max(result["seconds"] for result in results)
+    totals = {name: sum(result[name] for result in results) for name in
+              ("granted", "sold_out", "retries", "replay_mismatches", "released", "confirmed", "expired_during_run")}
+    errors = [error for result in results for error in result["errors"]]
+    report = {
+        "db": args.db,
+        "sessions": args.sessions,
+        "processes": args.processes,
+        "hold_calls": calls,
+        "seconds": round(seconds, 2),
+        "hold_calls_per_second": round(calls / seconds, 1),
+        "hold_latency_ms": {"p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95), "p99": _percentile(latencies, 0.99)},
+        **totals,
+        "expired_after_run": lapsed,
+        "errors": errors[:5],
+        "ledger_after_run": during,
+        "ledger_after_expiry": after,
+    }
+    failed = (
+        errors
+        or totals["replay_mismatches"]
+        or any(check[name] for check in (during, after) for name in ("oversold_resources", "inconsistent_resources", "negative_resources"))
+        or after["holds"].get(HELD, 0)
+    )
+    report["passed"] = not failed
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/startup_bench.py
+"""
+Measures cold start: how long `import main` takes (with a per-module breakdown from
+`python -X importtime`) and how long a fresh uvicorn process takes until GET /
+answers 200. Both run in new interpreters with offline credentials, so no network
+or GCP project is needed. Run from the repo root:
+
+    python -m benchmarks.startup_bench --runs 5
+    python -m benchmarks.startup_bench --warmup blocking background off
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+OFFLINE_ENV = {
+    "GOOGLE_GENAI_USE_VERTEXAI": "FALSE",
+    "GOOGLE_API_KEY": "AIza-startup-bench-key",
+    "GOOGLE_PROJECT_ID": "startup-bench",
+    "LOCATION": "us-central1",
+    "MEDIA_STORE": "local",
+    "SESSION_STORE": "memory",
+    "PLACE_CACHE_WARM_LIST": "",
+}
+
+
+def _env(**overrides) -> dict:
+    return {**os.environ, **OFFLINE_ENV, **overrides}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(top: int) -> dict:
+    """Imports main once under -X importtime and returns the total and the slowest modules."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=_env(), capture_output=True, text=True,
+    )
+    wall_seconds = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = (field.strip() for field in line[len("import time:"):].split("|"))
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+
+    main_module = next((module for module in modules if module["module"] == "main"), None)
+    slowest = sorted(modules, key=lambda module: module["cumulative_ms"], reverse=True)
+    return {
+        "wall_ms": round(wall_seconds * 1000, 1),
+        "import_main_ms": main_module["cumulative_ms"] if main_module else None,
+        "slowest_imports": [
+            {**module, "self_ms": round(module["self_ms"], 1), "cumulative_ms": round(module["cumulative_ms"], 1)}
+            for module in slowest[:top]
+        ],
+    }
+
+
+def measure_first_request(warmup: str, timeout: float = 120.0) -> dict:
+    """Starts uvicorn and polls GET / until it answers; returns the time to first 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=_env(CLIENT_WARMUP=warmup), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        first_request_seconds = None
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=2) as response:
+                    if response.status == 200:
+                        first_request_seconds = time.perf_counter() - started
+                        break
+            except OSError:
+                time.sleep(0.02)
+        if first_request_seconds is None:
+            raise RuntimeError(f"Server did not answer within {timeout} s.")
+
+        # Give a background warm-up a moment to finish so its timing can be reported.
+        time.sleep(1.0)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats/clients", timeout=5) as response:
+            client_stats = json.load(response)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {"first_request_ms": round(first_request_seconds * 1000, 1), "clients": client_stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest imports to list.")
+    parser.add_argument("--warmup", nargs="+", choices=["background", "blocking", "off"], default=["background", "blocking", "off"])
+    args = parser.parse_args()
+
+    imports = [measure_import(args.top) for _ in range(args.runs)]
+    report = {
+        "python": sys.version.split()[0],
+        "import_main_ms": {
+            "median": statistics.median(run["import_main_ms"] for run in imports),
+            "min": min(run["import_main_ms"] for run in imports),
+        },
+        "slowest_imports": imports[-1]["slowest_imports"],
+        "first_request": {},
+    }
+    for warmup in args.warmup:
+        runs = [measure_first_request(warmup) for _ in range(args.runs)]
+        report["first_request"][warmup] = {
+            "median_ms": statistics.median(run["first_request_ms"] for run in runs),
+            "min_ms": min(run["first_request_ms"] for run in runs),
+            "clients": runs[-1]["clients"],
+        }
+        print(json.dumps({"warmup": warmup, **report["first_request"][warmup]}), file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
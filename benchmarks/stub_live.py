@@ -0,0 +1,74 @@
+# benchmarks/stub_live.py
+"""
+The real app with the Gemini live model replaced by a local stub, so the server can
+be load tested without credentials or model quota. Serve it with:
+
+    WEB_APP=benchmarks.stub_live:app WEB_WORKERS=2 python -m tools.worker_router
+
+The stub answers every inbound audio frame with one 40 ms frame of 24 kHz agent
+audio, and echoes every text message back as a final model text (used as a ping).
+Each worker also stores a local media object, PROBE_OBJECT, holding its own index,
+so a client can tell which worker served a /media request.
+"""
+
+import os
+
+# Offline defaults; real values from the environment or .env still win.
+os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "FALSE")
+os.environ.setdefault("GOOGLE_API_KEY", "AIza-stub-key-for-load-tests")
+os.environ.setdefault("MEDIA_STORE", "local")
+os.environ.setdefault("SESSION_STORE", "memory")
+# The load clients stream silence; gating it would also silence the stub's echo.
+os.environ.setdefault("VOICE_GATE", "off")
+
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+
+from google.adk.agents import LiveRequestQueue
+
+import main
+from tools.worker_router import WORKER_INDEX_ENV
+
+OUTPUT_MIME_TYPE = "audio/pcm;rate=24000"
+OUTPUT_FRAME = bytes(24000 * 2 * 40 // 1000)  # 40 ms of 16-bit mono silence
+PROBE_OBJECT = "stub/worker-probe.txt"
+
+
+def _event(content=None, partial=False, turn_complete=False):
+    return SimpleNamespace(content=content, partial=partial, turn_complete=turn_complete, interrupted=False,
+                           actions=SimpleNamespace(transfer_to_agent=None))
+
+
+def _part(text=None, data=None):
+    inline_data = SimpleNamespace(mime_type=OUTPUT_MIME_TYPE, data=data) if data is not None else None
+    return SimpleNamespace(text=text, inline_data=inline_data)
+
+
+async def _stub_live_events(live_request_queue: LiveRequestQueue):
+    while True:
+        request = await live_request_queue.get()
+        if request.close:
+            return
+        if request.blob is not None:
+            yield _event(content=SimpleNamespace(role="model", parts=[_part(data=OUTPUT_FRAME)]), partial=True)
+        elif request.content is not None:
+            text = "".join(part.text or "" for part in request.content.parts)
+            yield _event(content=SimpleNamespace(role="model", parts=[_part(text=text)]))
+            yield _event(turn_complete=True)
+
+
+async def start_stub_agent_session(session_id: str, is_audio: bool = False):
+    live_request_queue = LiveRequestQueue()
+    return _stub_live_events(live_request_queue), live_request_queue, SimpleNamespace(id=session_id)
+
+
+@asynccontextmanager
+async def stub_lifespan(app):
+    await main.media_store.put_bytes(PROBE_OBJECT, os.getenv(WORKER_INDEX_ENV, "").encode("ascii"), "text/plain")
+    async with main.lifespan(app):
+        yield
+
+
+main.start_agent_session = start_stub_agent_session
+main.app.router.lifespan_context = stub_lifespan
+app = main.app
@@ -0,0 +1,115 @@
+# benchmarks/upload_memory_bench.py
+"""
+Compares peak Python memory of the old "assemble then upload" photo path with
+the streaming upload path in tools.streaming_upload, using large synthetic
+assets and a local fake bucket that writes objects to a temp directory. Run
+from the repo root:
+
+    python -m benchmarks.upload_memory_bench [--sizes-mb 1 16 64]
+"""
+
+import os
+import json
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+from tools.streaming_upload import upload_chunks, iter_memoryview_chunks, UPLOAD_CHUNK_SIZE
+
+SOURCE_CHUNK_SIZE = 8 * 1024  # roughly what requests.iter_content yields for Maps photos
+
+
+class LocalFakeBlob:
+    """Writes uploads to disk, reading file objects chunk by chunk like a resumable upload."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.chunk_size = None
+
+    def upload_from_string(self, data, content_type=None):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def upload_from_file(self, file_obj, content_type=None):
+        chunk_size = self.chunk_size or UPLOAD_CHUNK_SIZE
+        with open(self.path, "wb") as f:
+            while True:
+                chunk = file_obj.read(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                if len(chunk) < chunk_size:
+                    break
+
+
+class LocalFakeBucket:
+    def __init__(self, root: str):
+        self.root = root
+        self.name = "local-fake-bucket"
+
+    def blob(self, name: str) -> LocalFakeBlob:
+        return LocalFakeBlob(os.path.join(self.root, name.replace("/", "_")))
+
+
+def _synthetic_chunks(total_bytes: int):
+    # One shared source chunk, so the generator itself allocates nothing per chunk.
+    chunk = os.urandom(SOURCE_CHUNK_SIZE)
+    sent = 0
+    while sent < total_bytes:
+        piece = chunk[:min(SOURCE_CHUNK_SIZE, total_bytes - sent)]
+        sent += len(piece)
+        yield piece
+
+
+def _peak_bytes(func) -> int:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(sizes_mb: list[int]) -> list[dict]:
+    root = tempfile.mkdtemp(prefix="upload-bench-")
+    bucket = LocalFakeBucket(root)
+    results = []
+    try:
+        for size_mb in sizes_mb:
+            total = size_mb * 1024 * 1024
+
+            def legacy_photo():
+                image_bytes = b"".join(_synthetic_chunks(total))
+                bucket.blob("legacy.jpg").upload_from_string(image_bytes, content_type="image/jpeg")
+
+            def streaming_photo():
+                upload_chunks(bucket.blob("streaming.jpg"), _synthetic_chunks(total), "image/jpeg")
+
+            video_bytes = os.urandom(total)
+
+            def streaming_video():
+                # The downloaded video already lives in memory; only the upload overhead is measured.
+                upload_chunks(bucket.blob("streaming.mp4"), iter_memoryview_chunks(video_bytes), "video/mp4")
+
+            results.append({
+                "asset_mb": size_mb,
+                "legacy_photo_peak_mb": _peak_bytes(legacy_photo) / 1024 / 1024,
+                "streaming_photo_peak_mb": _peak_bytes(streaming_photo) / 1024 / 1024,
+                "streaming_video_overhead_mb": _peak_bytes(streaming_video) / 1024 / 1024,
+                "upload_chunk_mb": UPLOAD_CHUNK_SIZE / 1024 / 1024,
+            })
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 16, 64])
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes_mb), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/voice_gate_bench.py
+"""
+Runs recorded microphone audio through the inbound voice gate (tools/voice_gate.py)
+exactly as the WebSocket handler does, frame by frame, and reports how much audio
+would reach the live model, the measured speech ratio and the per-frame CPU cost.
+
+Fixtures are 16-bit mono WAV files (any sample rate). Without --wav a synthetic
+conversation is generated: speech-like bursts between long pauses over background
+noise. For the synthetic fixture the true speech frames are known, so the report
+also shows that none of them were dropped. Run from the repo root:
+
+    python -m benchmarks.voice_gate_bench
+    python -m benchmarks.voice_gate_bench --wav recordings/*.wav --mode drop
+    python -m benchmarks.voice_gate_bench --write-fixture /tmp/conversation.wav
+"""
+
+import sys
+import json
+import time
+import wave
+import argparse
+
+import numpy as np
+
+from tools.voice_gate import VoiceGate
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_conversation(seconds: float = 120.0, seed: int = 7) -> tuple[bytes, np.ndarray]:
+    """Returns (pcm, speech_mask): 0.5-4 s utterances separated by 2-15 s pauses, with -60 dBFS noise."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    signal = rng.normal(0.0, 32768 * 10 ** (-60 / 20), total)
+    mask = np.zeros(total, dtype=bool)
+    position = int(rng.uniform(2, 6) * SAMPLE_RATE)
+    while position < total:
+        length = min(int(rng.uniform(0.5, 4.0) * SAMPLE_RATE), total - position)
+        t = np.arange(length) / SAMPLE_RATE
+        # Voiced harmonics, modulated at a syllable rate so the level dips between syllables.
+        pitch = rng.uniform(100, 220)
+        voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        envelope = 0.55 + 0.45 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        signal[position:position + length] += 32768 * 10 ** (-22 / 20) * voiced * envelope / 2
+        mask[position:position + length] = True
+        position += length + int(rng.uniform(2, 15) * SAMPLE_RATE)
+    pcm = np.clip(signal, -32768, 32767).astype("<i2").tobytes()
+    return pcm, mask
+
+
+def read_wav(path: str) -> tuple[bytes, int]:
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"{path}: expected 16-bit mono PCM.")
+        return wav.readframes(wav.getnframes()), wav.getframerate()
+
+
+def write_wav(path: str, pcm: bytes, sample_rate: int):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+
+
+def run_fixture(pcm: bytes, sample_rate: int, frame_ms: int, mode: str, model_silence_ms: int, speech_mask: np.ndarray | None = None) -> dict:
+    gate = VoiceGate(model_silence_ms=model_silence_ms, mode=mode)
+    frame_bytes = sample_rate * frame_ms // 1000 * 2
+    missed_speech_frames = 0
+    gate_seconds = 0.0
+    for index, offset in enumerate(range(0, len(pcm) - frame_bytes + 1, frame_bytes)):
+        frame = pcm[offset:offset + frame_bytes]
+        started = time.perf_counter()
+        forwarded = gate.process(frame, sample_rate)
+        gate_seconds += time.perf_counter() - started
+        if speech_mask is not None and not forwarded:
+            samples = speech_mask[offset // 2:(offset + frame_bytes) // 2]
+            missed_speech_frames += int(samples.any())
+    report = {
+        **gate.stats(),
+        "audio_seconds": round(len(pcm) / 2 / sample_rate, 1),
+        "gate_us_per_frame": round(gate_seconds / max(gate.frames_in, 1) * 1e6, 1),
+    }
+    if speech_mask is not None:
+        report["true_speech_ratio"] = round(float(speech_mask.mean()), 3)
+        report["missed_speech_frames"] = missed_speech_frames
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", nargs="*", default=[], help="16-bit mono WAV fixtures.")
+    parser.add_argument("--mode", choices=["thin", "drop", "off"], default="thin")
+    parser.add_argument("--frame-ms", type=int, default=40, help="Microphone frame size, as sent by the client.")
+    parser.add_argument("--model-silence-ms", type=int, default=3000, help="The live model's silence_duration_ms.")
+    parser.add_argument("--seconds", type=float, default=120.0, help="Length of the synthetic fixture.")
+    parser.add_argument("--write-fixture", help="Write the synthetic fixture to this WAV path and exit.")
+    args = parser.parse_args()
+
+    if args.write_fixture:
+        pcm, _mask = synthetic_conversation(args.seconds)
+        write_wav(args.write_fixture, pcm, SAMPLE_RATE)
+        print(f"Wrote {args.seconds:.0f} s synthetic fixture to {args.write_fixture}", file=sys.stderr)
+        return
+
+    results = {}
+    if args.wav:
+        for path in args.wav:
+            pcm, sample_rate = read_wav(path)
+            results[path] = run_fixture(pcm, sample_rate, args.frame_ms, args.mode, args.model_silence_ms)
+    else:
+        pcm, mask = synthetic_conversation(args.seconds)
+        results["synthetic"] = run_fixture(pcm, SAMPLE_RATE, args.frame_ms, args.mode, args.model_silence_ms, mask)
+    print(json.dumps({"mode": args.mode, "frame_ms": args.frame_ms, "fixtures": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+# benchmarks/ws_load.py
+"""
+Replays recorded microphone audio from N concurrent WebSocket clients against
+/ws/{session_id} and reports what the server sustains. The server runs
+benchmarks.replay_live:app (a scripted live model with fake Maps/GCS/Imagen
+backends) in one worker process, restarted for every load level so memory is
+measured from a clean baseline.
+
+Each client streams a 16-bit mono WAV (or a synthetic conversation: speech bursts
+between pauses) in 40 ms frames at real-time pace, from its own offset into the
+recording, and reads everything the server sends back. Reported per load level:
+
+    throughput         messages and kbit/s in each direction
+    outbound latency   agent audio and transcripts, stub model -> client (p50/p95/p99)
+    inbound latency    microphone frames, client -> stub model (p50/p95/p99)
+    event-loop lag     lateness of a 10 ms ticker in the server (p50/p99/max)
+    memory             server RSS growth per connected session
+
+The report is JSON (stdout, or --output). With --baseline it is compared against
+an earlier report and the run fails when a latency, lag or memory figure regresses
+by more than --tolerance, so agent_to_client_messaging/client_to_agent_messaging
+changes can be tracked over time. Run from the repo root:
+
+    python -m benchmarks.ws_load --sessions 10 50 100 --seconds 30 --output load.json
+    python -m benchmarks.ws_load --sessions 50 --baseline load.json
+    python -m benchmarks.ws_load --url http://127.0.0.1:8000 --sessions 20   # already running
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import struct
+import asyncio
+import argparse
+import urllib.request
+from multiprocessing import Pool
+
+import websockets
+
+from benchmarks.multiworker_load import _free_port, _start_server, _wait_until_ready, _stop_server, _percentile
+from benchmarks.voice_gate_bench import synthetic_conversation, read_wav, SAMPLE_RATE
+from tools.ws_protocol import (
+    DIRECTION_CLIENT_TO_AGENT,
+    DIRECTION_AGENT_TO_CLIENT,
+    PROTOCOL_MIME_TYPE,
+    AudioFrameSequencer,
+)
+
+STAMP = struct.Struct("<d")
+FRAME_MS = 40
+FRAME_BYTES = SAMPLE_RATE * 2 * FRAME_MS // 1000
+DRAIN_SECONDS = 2.0
+STATS_POLL_SECONDS = 1.0
+
+# Report figures compared against --baseline: (path in a level, higher is worse, noise floor).
+TRACKED_METRICS = [
+    (("outbound_latency", "audio", "p95_ms"), True, 5.0),
+    (("outbound_latency", "transcript", "p95_ms"), True, 5.0),
+    (("inbound_latency", "p95_ms"), True, 5.0),
+    (("server", "loop_lag", "p99_ms"), True, 5.0),
+    (("server", "memory_per_session_kb"), True, 64.0),
+    (("throughput", "messages_in_per_s"), False, 1.0),
+]
+
+
+def load_recording(wav: str | None, seconds: float) -> bytes:
+    if wav is None:
+        pcm, _mask = synthetic_conversation(seconds=max(seconds * 2, 60.0))
+        return pcm
+    pcm, sample_rate = read_wav(wav)
+    if sample_rate != SAMPLE_RATE:
+        raise ValueError(f"{wav}: expected {SAMPLE_RATE} Hz audio, got {sample_rate} Hz.")
+    return pcm
+
+
+def _stamped(frame: bytes) -> bytes:
+    return STAMP.pack(time.time()) + frame[STAMP.size:]
+
+
+async def _run_session(url: str, session_id: str, recording: bytes, offset: int, protocol: str, seconds: float) -> dict:
+    result = {
+        "connected": False, "error": None,
+        "messages_out": 0, "bytes_out": 0, "messages_in": 0, "bytes_in": 0,
+        "audio_ms": [], "transcript_ms": [],
+        "input_transcripts": 0, "turns": 0, "interrupted": 0, "images": 0,
+    }
+    uplink = AudioFrameSequencer(DIRECTION_CLIENT_TO_AGENT)
+    downlink = AudioFrameSequencer(DIRECTION_AGENT_TO_CLIENT)
+    negotiated = {"protocol": "json"}
+
+    def on_agent_audio(pcm: bytes):
+        result["audio_ms"].append((time.time() - STAMP.unpack_from(pcm)[0]) * 1000)
+
+    async def read(ws):
+        async for message in ws:
+            result["messages_in"] += 1
+            result["bytes_in"] += len(message)
+            if isinstance(message, bytes):
+                on_agent_audio(downlink.unpack_with_flags(message)[2])
+                continue
+            data = json.loads(message)
+            mime_type = data.get("mime_type")
+            if mime_type == PROTOCOL_MIME_TYPE:
+                negotiated["protocol"] = data["data"]
+            elif mime_type == "audio/pcm":
+                on_agent_audio(base64.b64decode(data["data"]))
+            elif mime_type == "text/transcription" and "@" in data["data"]:
+                result["transcript_ms"].append((time.time() - float(data["data"].rsplit("@", 1)[1])) * 1000)
+            elif mime_type == "text/input_transcription":
+                result["input_transcripts"] += 1
+            elif mime_type in ("image/url", "image/url_list"):
+                result["images"] += 1
+            elif data.get("interrupted"):
+                result["interrupted"] += 1
+            elif data.get("turn_complete"):
+                result["turns"] += 1
+
+    try:
+        async with websockets.connect(f"{url}/ws/{session_id}?is_audio=true&protocol={protocol}", max_size=None) as ws:
+            result["connected"] = True
+            reader = asyncio.create_task(read(ws))
+            loop = asyncio.get_running_loop()
+            started = next_frame = loop.time()
+            position = offset
+            while loop.time() - started < seconds:
+                if position + FRAME_BYTES > len(recording):
+                    position = 0
+                frame = _stamped(recording[position:position + FRAME_BYTES])
+                position += FRAME_BYTES
+                if negotiated["protocol"] == "binary":
+                    message = uplink.pack(frame, SAMPLE_RATE)
+                else:
+                    message = json.dumps({"mime_type": "audio/pcm", "data": base64.b64encode(frame).decode("ascii")})
+                await ws.send(message)
+                result["messages_out"] += 1
+                result["bytes_out"] += len(message)
+                next_frame += FRAME_MS / 1000
+                await asyncio.sleep(max(0.0, next_frame - loop.time()))
+            await asyncio.sleep(DRAIN_SECONDS)
+            reader.cancel()
+    except (OSError, websockets.WebSocketException) as e:
+        result["error"] = type(e).__name__
+    return result
+
+
+def _client_process(args: tuple) -> list[dict]:
+    url, first_session, session_count, recording, protocol, seconds = args
+    ws_url = "ws" + url[len("http"):]  # http -> ws, https -> wss
+    # Spread the sessions over the recording so they do not all speak at once.
+    stride = len(recording) // max(1, session_count) // FRAME_BYTES * FRAME_BYTES
+
+    async def run():
+        sessions = [
+            _run_session(ws_url, f"replay-{first_session + i}", recording, (i * stride) % len(recording), protocol, seconds)
+            for i in range(session_count)
+        ]
+        return await asyncio.gather(*sessions)
+
+    return asyncio.run(run())
+
+
+def _http_json(url: str, method: str = "GET") -> dict:
+    request = urllib.request.Request(url, method=method)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)
+
+
+def _latency(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": _percentile(values, 0.5),
+        "p95_ms": _percentile(values, 0.95),
+        "p99_ms": _percentile(values, 0.99),
+    }
+
+
+def run_level(pool: Pool, url: str, sessions: int, client_procs: int, recording: bytes, protocol: str, seconds: float, first_session: int) -> dict:
+    per_proc = [sessions // client_procs + (1 if i < sessions % client_procs else 0) for i in range(client_procs)]
+    jobs, offset = [], first_session
+    for count in per_proc:
+        if count:
+            jobs.append((url, offset, count, recording, protocol, seconds))
+            offset += count
+
+    _http_json(f"{url}/bench/reset", method="POST")
+    started = time.perf_counter()
+    pending = pool.map_async(_client_process, jobs)
+    peak_sessions, peak_rss = 0, 0
+    while not pending.ready():
+        pending.wait(STATS_POLL_SECONDS)
+        server = _http_json(f"{url}/bench/stats")
+        peak_sessions = max(peak_sessions, server["live_sessions"])
+        peak_rss = max(peak_rss, server["rss_peak_bytes"])
+    elapsed = time.perf_counter() - started
+    results = [session for batch in pending.get() for session in batch]
+    server = _http_json(f"{url}/bench/stats")
+
+    def total(key: str) -> int:
+        return sum(session[key] for session in results)
+
+    connected = sum(1 for session in results if session["connected"])
+    rss_growth = max(peak_rss, server["rss_peak_bytes"]) - server["rss_baseline_bytes"]
+    return {
+        "sessions": sessions,
+        "connected": connected,
+        "errors": sorted({session["error"] for session in results if session["error"]}),
+        "seconds": round(elapsed, 1),
+        "throughput": {
+            "messages_out_per_s": round(total("messages_out") / elapsed, 1),
+            "messages_in_per_s": round(total("messages_in") / elapsed, 1),
+            "kbps_out": round(total("bytes_out") * 8 / elapsed / 1000, 1),
+            "kbps_in": round(total("bytes_in") * 8 / elapsed / 1000, 1),
+        },
+        "outbound_latency": {
+            "audio": _latency([ms for session in results for ms in session["audio_ms"]]),
+            "transcript": _latency([ms for session in results for ms in session["transcript_ms"]]),
+        },
+        "inbound_latency": server["inbound_latency"],
+        "conversation": {
+            "input_transcripts": total("input_transcripts"),
+            "turns_complete": total("turns"),
+            "interrupted": total("interrupted"),
+            "images": total("images"),
+            "server_turns": server["turns"],
+            "server_tool_calls": server["tool_calls"],
+        },
+        "server": {
+            "loop_lag": server["loop_lag"],
+            "peak_live_sessions": peak_sessions,
+            "rss_baseline_mb": round(server["rss_baseline_bytes"] / 2**20, 1),
+            "rss_peak_mb": round(max(peak_rss, server["rss_peak_bytes"]) / 2**20, 1),
+            "memory_per_session_kb": round(rss_growth / 1024 / connected, 1) if connected else None,
+        },
+    }
+
+
+def _metric(level: dict, path: tuple) -> float | None:
+    value = level
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Tracked metrics that got worse than the baseline (same session count) by more than `tolerance`."""
+    baseline_levels = {level["sessions"]: level for level in baseline.get("levels", [])}
+    regressions = []
+    for level in report["levels"]:
+        before = baseline_levels.get(level["sessions"])
+        if before is None:
+            continue
+        for path, higher_is_worse, floor in TRACKED_METRICS:
+            old, new = _metric(before, path), _metric(level, path)
+            if old is None or new is None:
+                continue
+            change = new - old if higher_is_worse else old - new
+            if change > floor and change > abs(old) * tolerance:
+                regressions.append({"sessions": level["sessions"], "metric": ".".join(path), "baseline": old, "current": new})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--protocol", choices=["json", "binary"], default="binary")
+    parser.add_argument("--wav", help="16 kHz 16-bit mono recording to replay (default: synthetic conversation).")
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--url", help="Use an already running replay_live server instead of starting one per level.")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout.")
+    parser.add_argument("--baseline", help="Earlier report to compare against; exits 1 on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against --baseline.")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    recording = load_recording(args.wav, args.seconds)
+    report = {
+        "cpu_count": os.cpu_count(),
+        "protocol": args.protocol,
+        "seconds": args.seconds,
+        "recording_seconds": round(len(recording) / 2 / SAMPLE_RATE, 1),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "levels": [],
+    }
+    first_session = 0
+    with Pool(args.client_procs) as pool:
+        for sessions in args.sessions:
+            server = None
+            url = args.url.rstrip("/") if args.url else None
+            if url is None:
+                port = _free_port()
+                # The tools' debug prints go to stderr so stdout stays a clean JSON report.
+                server = _start_server(1, port, app="benchmarks.replay_live:app", stdout=sys.stderr)
+                url = f"http://127.0.0.1:{port}"
+            try:
+                if server is not None:
+                    _wait_until_ready(port)
+                level = run_level(pool, url, sessions, args.client_procs, recording, args.protocol, args.seconds, first_session)
+            finally:
+                if server is not None:
+                    _stop_server(server)
+            first_session += sessions
+            report["levels"].append(level)
+            print(json.dumps({"sessions": sessions, "connected": level["connected"], "errors": level["errors"]}), file=sys.stderr)
+
+    if baseline is not None:
+        report["regressions"] = compare(report, baseline, args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/ws_protocol_bench.py
+"""
+Compares the JSON (base64) and binary audio protocols of /ws/{session_id}.
+
+Simulates one session-minute of audio in both directions and measures bytes on
+the wire plus server-side CPU spent encoding/decoding frames. Run from the repo
+root:
+
+    python -m benchmarks.ws_protocol_bench [--frame-ms 8] [--minutes 1]
+"""
+
+import os
+import json
+import time
+import base64
+import argparse
+
+from tools.ws_protocol import (
+    AudioFrameSequencer,
+    DIRECTION_AGENT_TO_CLIENT,
+    DIRECTION_CLIENT_TO_AGENT,
+    DEFAULT_INPUT_SAMPLE_RATE,
+    DEFAULT_OUTPUT_SAMPLE_RATE,
+    pack_audio_frame,
+)
+
+BYTES_PER_SAMPLE = 2
+
+
+def _frames(sample_rate: int, frame_ms: int, minutes: float) -> tuple[bytes, int]:
+    frame_bytes = sample_rate * frame_ms // 1000 * BYTES_PER_SAMPLE
+    count = int(minutes * 60_000 / frame_ms)
+    return os.urandom(frame_bytes), count
+
+
+def bench_json(frame_ms: int, minutes: float) -> dict:
+    inbound_pcm, inbound_count = _frames(DEFAULT_INPUT_SAMPLE_RATE, frame_ms, minutes)
+    outbound_pcm, outbound_count = _frames(DEFAULT_OUTPUT_SAMPLE_RATE, frame_ms, minutes)
+    # What the browser would send; its encoding cost is not server CPU.
+    inbound_wire = json.dumps({"mime_type": "audio/pcm", "data": base64.b64encode(inbound_pcm).decode("ascii")})
+
+    start = time.process_time()
+    for _ in range(inbound_count):
+        message = json.loads(inbound_wire)
+        base64.b64decode(message["data"])
+    outbound_bytes = 0
+    for _ in range(outbound_count):
+        outbound_bytes += len(json.dumps({
+            "mime_type": "audio/pcm",
+            "data": base64.b64encode(outbound_pcm).decode("ascii"),
+        }))
+    cpu_seconds = time.process_time() - start
+
+    return {
+        "inbound_bytes": len(inbound_wire) * inbound_count,
+        "outbound_bytes": outbound_bytes,
+        "cpu_seconds": cpu_seconds,
+    }
+
+
+def bench_binary(frame_ms: int, minutes: float) -> dict:
+    inbound_pcm, inbound_count = _frames(DEFAULT_INPUT_SAMPLE_RATE, frame_ms, minutes)
+    outbound_pcm, outbound_count = _frames(DEFAULT_OUTPUT_SAMPLE_RATE, frame_ms, minutes)
+    inbound_wire = [
+        pack_audio_frame(DIRECTION_CLIENT_TO_AGENT, seq, DEFAULT_INPUT_SAMPLE_RATE, inbound_pcm)
+        for seq in range(inbound_count)
+    ]
+    inbound_sequencer = AudioFrameSequencer(DIRECTION_CLIENT_TO_AGENT)
+    outbound_sequencer = AudioFrameSequencer(DIRECTION_AGENT_TO_CLIENT)
+
+    start = time.process_time()
+    for frame in inbound_wire:
+        inbound_sequencer.unpack(frame)
+    outbound_bytes = 0
+    for _ in range(outbound_count):
+        outbound_bytes += len(outbound_sequencer.pack(outbound_pcm, DEFAULT_OUTPUT_SAMPLE_RATE))
+    cpu_seconds = time.process_time() - start
+
+    return {
+        "inbound_bytes": sum(len(frame) for frame in inbound_wire),
+        "outbound_bytes": outbound_bytes,
+        "cpu_seconds": cpu_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frame-ms", type=int, default=8, help="Audio frame duration in milliseconds.")
+    parser.add_argument("--minutes", type=float, default=1.0, help="Simulated session length in minutes.")
+    args = parser.parse_args()
+
+    results = {"frame_ms": args.frame_ms, "minutes": args.minutes, "modes": {}}
+    for mode, bench in (("json", bench_json), ("binary", bench_binary)):
+        stats = bench(args.frame_ms, args.minutes)
+        stats["bytes_per_session_minute"] = (stats["inbound_bytes"] + stats["outbound_bytes"]) / args.minutes
+        stats["cpu_ms_per_session_minute"] = stats["cpu_seconds"] * 1000 / args.minutes
+        results["modes"][mode] = stats
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
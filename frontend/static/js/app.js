@@ -11,6 +11,35 @@ const ws_url = ws_protocol + window.location.host + "/ws/" + sessionId;
 let websocket = null;
 let is_audio = false;
 
+// --- Wire protocol ---
+// "binary" sends PCM as binary frames with a 12-byte header (see tools/ws_protocol.py);
+// "json" is the original base64-in-JSON protocol. The server confirms the protocol
+// with its first message, so we keep using JSON until that confirmation arrives.
+const PREFERRED_PROTOCOL = "binary";
+const PROTOCOL_MIME_TYPE = "application/x-odyssey-protocol";
+const PROTOCOL_ERROR_MIME_TYPE = "application/x-odyssey-protocol-error";
+const SESSION_MIME_TYPE = "application/x-odyssey-session";
+const CODEC_MIME_TYPE = "application/x-odyssey-codec";
+const AUDIO_FRAME_HEADER_SIZE = 12;
+const AUDIO_FRAME_VERSION = 1;
+const DIRECTION_CLIENT_TO_AGENT = 0;
+// Header flag: the payload is one Opus packet instead of raw PCM.
+const FLAG_OPUS = 0x0001;
+const INPUT_SAMPLE_RATE = 16000;
+// Microphone frame aggregation window; override with ?audio_frame_ms=20|40|100.
+const AUDIO_FRAME_MS = parseInt(new URLSearchParams(window.location.search).get("audio_frame_ms"), 10) || DEFAULT_AGGREGATION_MS;
+// Player jitter buffer target; override with ?player_latency_ms=40..400.
+const PLAYER_TARGET_LATENCY_MS = parseInt(new URLSearchParams(window.location.search).get("player_latency_ms"), 10) || DEFAULT_TARGET_LATENCY_MS;
+let negotiatedProtocol = "json";
+// Audio codec on the wire: "opus" when WebCodecs supports it (force PCM with ?audio_codec=pcm).
+let preferredCodec = "pcm";
+let negotiatedCodec = "pcm";
+let opusCodec = null;
+let outboundAudioSequence = 0;
+// Sequence number of the last numbered server message; sent on reconnect so the
+// server replays only what we missed while the socket was down.
+let lastServerSeq = 0;
+
 // Get DOM elements
 const messageForm = document.getElementById("messageForm");
 const messageInput = document.getElementById("message");
@@ -34,7 +63,11 @@ function updateConnectionStatus(status, isConnecting = false, isError = false) {
 // WebSocket handlers
 function connectWebsocket() {
   updateConnectionStatus("Connecting...", true);
-  websocket = new WebSocket(ws_url + "?is_audio=" + is_audio);
+  negotiatedProtocol = "json";
+  negotiatedCodec = "pcm";
+  outboundAudioSequence = 0;
+  websocket = new WebSocket(ws_url + "?is_audio=" + is_audio + "&protocol=" + PREFERRED_PROTOCOL + "&codec=" + preferredCodec + "&last_seq=" + lastServerSeq);
+  websocket.binaryType = "arraybuffer";
 
   websocket.onopen = function () {
     console.log("WebSocket connection opened.");
@@ -48,11 +81,57 @@ function connectWebsocket() {
 
   websocket.onmessage = function (event) {
     try {
+        // Binary frames only ever carry agent audio.
+        if (event.data instanceof ArrayBuffer) {
+          handleAgentAudioFrame(event.data);
+          return;
+        }
+
         const message_from_server = JSON.parse(event.data);
         // console.log("[AGENT TO CLIENT] ", message_from_server);
+
+        if (message_from_server.mime_type === PROTOCOL_MIME_TYPE) {
+          negotiatedProtocol = message_from_server.data;
+          console.log("Using wire protocol:", negotiatedProtocol);
+          return;
+        }
+
+        if (message_from_server.mime_type === PROTOCOL_ERROR_MIME_TYPE) {
+          // The server dropped one frame it could not decode; the session goes on.
+          console.warn("Server rejected a frame:", message_from_server.data);
+          return;
+        }
+
+        if (message_from_server.mime_type === CODEC_MIME_TYPE) {
+          negotiatedCodec = message_from_server.data;
+          if (negotiatedCodec === "opus" && !opusCodec) {
+            opusCodec = createOpusCodec(sendOpusPacket, playAgentAudio);
+          }
+          console.log("Using audio codec:", negotiatedCodec);
+          return;
+        }
+
+        if (message_from_server.mime_type === SESSION_MIME_TYPE) {
+          // A fresh session numbers its messages from 1 again.
+          if (!message_from_server.data.resumed) { lastServerSeq = 0; }
+          console.log("Agent session resumed:", message_from_server.data.resumed);
+          return;
+        }
+
+        if (typeof message_from_server.seq === "number") {
+          lastServerSeq = message_from_server.seq;
+        }
   
+        // The server already dropped its queued audio; flush what the player still holds.
+        if (message_from_server.interrupted && audioPlayerNode) {
+          if (opusCodec) { opusCodec.resetDecoder(); }
+          audioPlayerNode.port.postMessage({ command: "endOfAudio" });
+        }
+
         // When a turn is complete, clear the active message IDs for the next turn.
         if (message_from_server.turn_complete) {
+          // No more audio is coming for this turn; play out the tail without waiting for the jitter buffer.
+          if (audioPlayerNode) { audioPlayerNode.port.postMessage({ command: "endOfTurn" }); }
           currentUserMessageId = null;
           currentAgentMessageId = null;
           return;
@@ -85,10 +164,7 @@ function connectWebsocket() {
   
         // Handler for AGENT'S audio
         if (message_from_server.mime_type === "audio/pcm" && audioPlayerNode) {
-          if (audioPlayerContext && audioPlayerContext.state === 'suspended') {
-              audioPlayerContext.resume().catch(e => console.error("Failed to resume AudioContext:", e));
-          }
-          audioPlayerNode.port.postMessage(base64ToArray(message_from_server.data));
+          playAgentAudio(base64ToArray(message_from_server.data));
           return;
         }
 
@@ -117,6 +193,27 @@ function connectWebsocket() {
         }
   
         // --- IMAGE HANDLER (This was the missing part) ---
+        // Streamed place photos carry a gallery_id and are appended to one gallery.
+        if (message_from_server.mime_type === "image/url" && message_from_server.gallery_id) {
+            let galleryContainer = document.getElementById(message_from_server.gallery_id);
+            if (!galleryContainer) {
+                galleryContainer = document.createElement("div");
+                galleryContainer.id = message_from_server.gallery_id;
+                galleryContainer.classList.add("agent-message", "image-gallery-container");
+                messagesDiv.appendChild(galleryContainer);
+            }
+            const imageElement = document.createElement("img");
+            imageElement.src = message_from_server.data;
+            imageElement.alt = "Generated Place Image";
+            imageElement.classList.add("agent-image");
+            imageElement.onload = () => {
+                messagesDiv.scrollTo({ top: messagesDiv.scrollHeight, behavior: 'smooth' });
+            };
+            galleryContainer.appendChild(imageElement);
+            currentAgentMessageId = null;
+            return;
+        }
+
         if (message_from_server.mime_type === "image/url") {
             const imageContainer = document.createElement("p");
             imageContainer.classList.add("agent-message");
@@ -134,6 +231,29 @@ function connectWebsocket() {
             return;
         }
   
+        // --- VIDEO JOB HANDLER: background video generation finished ---
+        if (message_from_server.mime_type === "video/job") {
+            const job = message_from_server.data;
+            const videoContainer = document.createElement("p");
+            videoContainer.classList.add("agent-message");
+            if (job.status === "succeeded" && job.url) {
+                const videoElement = document.createElement("video");
+                videoElement.src = job.url;
+                videoElement.controls = true;
+                videoElement.classList.add("agent-image");
+                videoElement.onloadeddata = () => {
+                    messagesDiv.scrollTo({ top: messagesDiv.scrollHeight, behavior: 'smooth' });
+                };
+                videoContainer.appendChild(videoElement);
+            } else {
+                videoContainer.textContent = `Video job ${job.job_id} ${job.status}.`;
+                videoContainer.style.fontStyle = "italic";
+            }
+            messagesDiv.appendChild(videoContainer);
+            currentAgentMessageId = null;
+            return;
+        }
+
         // Handler for AGENT'S text (live transcript and final text)
         if (message_from_server.mime_type === 'text/transcription' || message_from_server.mime_type === 'text/plain') {
             let agentMessageElement = document.getElementById(currentAgentMessageId);
@@ -208,6 +328,50 @@ function sendMessage(message) {
   }
 }
 
+function playAgentAudio(pcmBuffer) {
+  if (!audioPlayerNode) { return; }
+  if (audioPlayerContext && audioPlayerContext.state === 'suspended') {
+      audioPlayerContext.resume().catch(e => console.error("Failed to resume AudioContext:", e));
+  }
+  audioPlayerNode.port.postMessage(pcmBuffer, [pcmBuffer]);
+}
+
+// Header layout: version (u8) | direction (u8) | flags (u16) | sequence (u32) | sample_rate (u32), big-endian.
+function encodeAudioFrame(pcmBuffer, flags = 0) {
+  const frame = new ArrayBuffer(AUDIO_FRAME_HEADER_SIZE + pcmBuffer.byteLength);
+  const header = new DataView(frame);
+  header.setUint8(0, AUDIO_FRAME_VERSION);
+  header.setUint8(1, DIRECTION_CLIENT_TO_AGENT);
+  header.setUint16(2, flags);
+  header.setUint32(4, outboundAudioSequence);
+  header.setUint32(8, INPUT_SAMPLE_RATE);
+  new Uint8Array(frame, AUDIO_FRAME_HEADER_SIZE).set(new Uint8Array(pcmBuffer));
+  outboundAudioSequence = (outboundAudioSequence + 1) >>> 0;
+  return frame;
+}
+
+function handleAgentAudioFrame(frame) {
+  if (frame.byteLength < AUDIO_FRAME_HEADER_SIZE) { return; }
+  if (new DataView(frame).getUint16(2) & FLAG_OPUS) {
+    // Decoded asynchronously; the decoder hands the PCM to playAgentAudio.
+    if (opusCodec) { opusCodec.decode(new Uint8Array(frame, AUDIO_FRAME_HEADER_SIZE)); }
+    return;
+  }
+  playAgentAudio(decodeAudioFrame(frame));
+}
+
+function sendOpusPacket(packet) {
+  if (websocket && websocket.readyState === WebSocket.OPEN && negotiatedCodec === "opus") {
+    websocket.send(encodeAudioFrame(packet, FLAG_OPUS));
+  }
+}
+
+function decodeAudioFrame(frame) {
+  if (frame.byteLength < AUDIO_FRAME_HEADER_SIZE) { return new ArrayBuffer(0); }
+  // slice() copies the PCM into its own buffer so the worklet can view it as Int16.
+  return frame.slice(AUDIO_FRAME_HEADER_SIZE);
+}
+
 function base64ToArray(base64) {
   try {
       if (typeof base64 !== 'string' || base64.length === 0) { return new ArrayBuffer(0); }
@@ -220,13 +384,16 @@ function base64ToArray(base64) {
 }
 
 let audioPlayerNode, audioPlayerContext, audioRecorderNode, audioRecorderContext, micStream;
-import { startAudioPlayerWorklet } from "./audio-player.js";
-import { startAudioRecorderWorklet } from "./audio-recorder.js";
+// Latest playback counters from the player worklet (underruns, overruns, buffered and target latency).
+let audioPlayerStats = null;
+import { startAudioPlayerWorklet, DEFAULT_TARGET_LATENCY_MS } from "./audio-player.js";
+import { startAudioRecorderWorklet, DEFAULT_AGGREGATION_MS } from "./audio-recorder.js";
+import { opusSupported, createOpusCodec } from "./audio-codec.js";
 
 async function startAudio() {
   try {
-      [audioPlayerNode, audioPlayerContext] = await startAudioPlayerWorklet();
-      [audioRecorderNode, audioRecorderContext, micStream] = await startAudioRecorderWorklet(audioRecorderHandler);
+      [audioPlayerNode, audioPlayerContext] = await startAudioPlayerWorklet(audioPlayerStatsHandler, PLAYER_TARGET_LATENCY_MS);
+      [audioRecorderNode, audioRecorderContext, micStream] = await startAudioRecorderWorklet(audioRecorderHandler, AUDIO_FRAME_MS);
       const successMsg = document.createElement("p");
       successMsg.textContent = "Audio setup complete. Ready for voice.";
       successMsg.style.fontStyle = "italic";
@@ -252,9 +419,23 @@ startAudioButton.addEventListener("click", async () => {
   }
 });
 
+function audioPlayerStatsHandler(stats) {
+  const previous = audioPlayerStats;
+  audioPlayerStats = stats;
+  if (previous && (stats.underruns > previous.underruns || stats.overruns > previous.overruns)) {
+    console.warn("Audio playback glitch:", stats);
+  }
+}
+
 function audioRecorderHandler(pcmData) {
   if (websocket && websocket.readyState === WebSocket.OPEN && is_audio) {
-      sendMessage({ mime_type: "audio/pcm", data: arrayBufferToBase64(pcmData) });
+      if (negotiatedCodec === "opus" && opusCodec) {
+          opusCodec.encode(pcmData);
+      } else if (negotiatedProtocol === "binary") {
+          websocket.send(encodeAudioFrame(pcmData));
+      } else {
+          sendMessage({ mime_type: "audio/pcm", data: arrayBufferToBase64(pcmData) });
+      }
   }
 }
 
@@ -266,4 +447,8 @@ function arrayBufferToBase64(buffer) {
 }
 
 updateConnectionStatus("Disconnected");
+// Text mode does not need a codec, so the check can finish while the first connection opens.
+if (new URLSearchParams(window.location.search).get("audio_codec") !== "pcm") {
+  opusSupported().then((supported) => { if (supported) { preferredCodec = "opus"; } });
+}
 connectWebsocket();
@@ -0,0 +1,110 @@
+// frontend/static/js/audio-codec.js
+/**
+ * Opus Codec (WebCodecs)
+ *
+ * With codec=opus the microphone PCM is encoded to Opus before it is sent and the
+ * agent's Opus packets are decoded back to 16-bit PCM for the player worklet. The
+ * server transcodes to and from the PCM the live API uses. Browsers without
+ * WebCodecs Opus support stay on PCM.
+ */
+
+const INPUT_SAMPLE_RATE = 16000;
+const OUTPUT_SAMPLE_RATE = 24000;
+
+const ENCODER_CONFIG = {
+  codec: "opus",
+  sampleRate: INPUT_SAMPLE_RATE,
+  numberOfChannels: 1,
+  bitrate: 24000,
+  opus: { frameDuration: 20000 },  // microseconds
+};
+const DECODER_CONFIG = { codec: "opus", sampleRate: OUTPUT_SAMPLE_RATE, numberOfChannels: 1 };
+
+export async function opusSupported() {
+  if (typeof AudioEncoder === "undefined" || typeof AudioDecoder === "undefined") { return false; }
+  try {
+    const [encoder, decoder] = await Promise.all([
+      AudioEncoder.isConfigSupported(ENCODER_CONFIG),
+      AudioDecoder.isConfigSupported(DECODER_CONFIG),
+    ]);
+    return encoder.supported && decoder.supported;
+  } catch (e) {
+    return false;
+  }
+}
+
+// Float32 [-1, 1] -> 16-bit PCM, resampled linearly if the decoder used another rate.
+function toPcm16(samples, sampleRate) {
+  const outputLength = Math.round(samples.length * OUTPUT_SAMPLE_RATE / sampleRate);
+  const step = sampleRate / OUTPUT_SAMPLE_RATE;
+  const pcm = new Int16Array(outputLength);
+  for (let i = 0; i < outputLength; i++) {
+    const position = i * step;
+    const index = Math.floor(position);
+    const next = Math.min(index + 1, samples.length - 1);
+    const s = Math.max(-1, Math.min(1, samples[index] + (samples[next] - samples[index]) * (position - index)));
+    pcm[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+  }
+  return pcm.buffer;
+}
+
+/**
+ * Returns {encode(pcmBuffer), decode(packet), resetDecoder(), close()}. Encoded
+ * packets go to onPacket(ArrayBuffer); decoded agent audio goes to onPcm(ArrayBuffer).
+ */
+export function createOpusCodec(onPacket, onPcm) {
+  let encoderTimestamp = 0;
+  let decoderTimestamp = 0;
+
+  const encoder = new AudioEncoder({
+    output: (chunk) => {
+      const packet = new ArrayBuffer(chunk.byteLength);
+      chunk.copyTo(packet);
+      onPacket(packet);
+    },
+    error: (e) => console.error("Opus encoder error:", e),
+  });
+  encoder.configure(ENCODER_CONFIG);
+
+  const decoder = new AudioDecoder({
+    output: (audioData) => {
+      const samples = new Float32Array(audioData.numberOfFrames);
+      audioData.copyTo(samples, { planeIndex: 0, format: "f32-planar" });
+      const sampleRate = audioData.sampleRate;
+      audioData.close();
+      onPcm(toPcm16(samples, sampleRate));
+    },
+    error: (e) => console.error("Opus decoder error:", e),
+  });
+  decoder.configure(DECODER_CONFIG);
+
+  return {
+    encode(pcmBuffer) {
+      const numberOfFrames = pcmBuffer.byteLength / 2;
+      const audioData = new AudioData({
+        format: "s16",
+        sampleRate: INPUT_SAMPLE_RATE,
+        numberOfChannels: 1,
+        numberOfFrames,
+        timestamp: encoderTimestamp,
+        data: pcmBuffer,
+      });
+      encoderTimestamp += Math.round(numberOfFrames * 1e6 / INPUT_SAMPLE_RATE);
+      encoder.encode(audioData);
+      audioData.close();
+    },
+    decode(packet) {
+      decoder.decode(new EncodedAudioChunk({ type: "key", timestamp: decoderTimestamp, data: packet }));
+      decoderTimestamp += 20000;
+    },
+    // Drops packets still queued in the decoder (the agent was interrupted).
+    resetDecoder() {
+      decoder.reset();
+      decoder.configure(DECODER_CONFIG);
+    },
+    close() {
+      if (encoder.state !== "closed") { encoder.close(); }
+      if (decoder.state !== "closed") { decoder.close(); }
+    },
+  };
+}
@@ -3,7 +3,10 @@
  * Audio Player Worklet
  */
 
-export async function startAudioPlayerWorklet() {
+// Audio the player queues before it starts a new stream; it adapts to network jitter.
+export const DEFAULT_TARGET_LATENCY_MS = 80;
+
+export async function startAudioPlayerWorklet(onStats = null, targetLatencyMs = DEFAULT_TARGET_LATENCY_MS) {
     const audioContext = new AudioContext({
         sampleRate: 24000
     });
@@ -12,7 +15,18 @@ export async function startAudioPlayerWorklet() {
     const workletURL = new URL('./pcm-player-processor.js', import.meta.url);
     await audioContext.audioWorklet.addModule(workletURL);
     
-    const audioPlayerNode = new AudioWorkletNode(audioContext, 'pcm-player-processor');
+    const audioPlayerNode = new AudioWorkletNode(
+        audioContext,
+        'pcm-player-processor',
+        { processorOptions: { targetLatencyMs } }
+    );
+
+    // The worklet reports underrun/overrun counters and its current target latency.
+    audioPlayerNode.port.onmessage = (event) => {
+        if (event.data.type === 'stats' && onStats) {
+            onStats(event.data);
+        }
+    };
 
     audioPlayerNode.connect(audioContext.destination);
 
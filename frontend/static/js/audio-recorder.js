@@ -5,7 +5,11 @@
 
 let micStream;
 
-export async function startAudioRecorderWorklet(audioRecorderHandler) {
+// Microphone audio is coalesced inside the worklet into frames of this many
+// milliseconds (e.g. 20, 40 or 100) before it is handed to audioRecorderHandler.
+export const DEFAULT_AGGREGATION_MS = 40;
+
+export async function startAudioRecorderWorklet(audioRecorderHandler, aggregationMs = DEFAULT_AGGREGATION_MS) {
   const audioRecorderContext = new AudioContext({ sampleRate: 16000 });
   console.log("AudioContext sample rate:", audioRecorderContext.sampleRate);
 
@@ -20,26 +24,23 @@ export async function startAudioRecorderWorklet(audioRecorderHandler) {
 
   const audioRecorderNode = new AudioWorkletNode(
     audioRecorderContext,
-    "pcm-recorder-processor"
+    "pcm-recorder-processor",
+    { processorOptions: { aggregationMs } }
   );
 
   source.connect(audioRecorderNode);
+  // The worklet already posts 16-bit PCM ArrayBuffers, one per aggregation window.
   audioRecorderNode.port.onmessage = (event) => {
-    const pcmData = convertFloat32ToPCM(event.data);
-    audioRecorderHandler(pcmData);
+    audioRecorderHandler(event.data);
   };
   return [audioRecorderNode, audioRecorderContext, micStream];
 }
 
+export function setAggregationMs(audioRecorderNode, aggregationMs) {
+  audioRecorderNode.port.postMessage({ command: "setAggregationMs", value: aggregationMs });
+}
+
 export function stopMicrophone(micStream) {
   micStream.getTracks().forEach((track) => track.stop());
   console.log("stopMicrophone(): Microphone stopped.");
 }
-
-function convertFloat32ToPCM(inputData) {
-  const pcm16 = new Int16Array(inputData.length);
-  for (let i = 0; i < inputData.length; i++) {
-    pcm16[i] = inputData[i] * 0x7fff;
-  }
-  return pcm16.buffer;
-}
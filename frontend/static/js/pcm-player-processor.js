@@ -1,75 +1,223 @@
 /**
- * An audio worklet processor that stores the PCM audio data sent from the main thread
- * to a buffer and plays it.
+ * An audio worklet processor that plays the 16-bit PCM audio posted by the main thread.
+ *
+ * Samples are converted Int16 -> Float32 straight into a fixed ring buffer (two
+ * contiguous runs around the wrap point, no per-sample modulo) and copied out to the
+ * output with bulk set() calls; nothing is allocated per sample or per message.
+ *
+ * Playback goes through a small adaptive jitter buffer: a new stream starts only
+ * once `targetLatencyMs` of audio is queued (or the stream goes quiet / the turn
+ * ends). If the buffer then runs dry and audio arrives again shortly after, that was
+ * an underrun: the target grows by LATENCY_STEP_MS and decays again after a while
+ * without glitches. Counters are posted to the main thread as {type: "stats"}.
+ *
+ * Commands: {command: "endOfAudio"} drops everything queued (interruption),
+ * {command: "endOfTurn"} plays out whatever is left without waiting for the target.
  */
+const DEFAULT_BUFFER_SECONDS = 30;
+const DEFAULT_TARGET_LATENCY_MS = 80;
+const MIN_LATENCY_MS = 40;
+const MAX_LATENCY_MS = 400;
+const LATENCY_STEP_MS = 20;
+const LATENCY_DECAY_MS = 10;
+// How long playback must stay glitch-free before the target latency is lowered again.
+const DECAY_AFTER_SECONDS = 10;
+// Audio that resumes within this long after the buffer ran dry counts as an underrun;
+// a longer silence is just the end of the agent's speech.
+const UNDERRUN_GAP_MS = 500;
+const STATS_INTERVAL_SECONDS = 1;
+const INT16_TO_FLOAT = 1 / 32768;
+
+const STATE_IDLE = "idle";
+const STATE_BUFFERING = "buffering";
+const STATE_PLAYING = "playing";
+const STATE_STARVED = "starved";
+
 class PCMPlayerProcessor extends AudioWorkletProcessor {
-    constructor() {
+    constructor(options) {
       super();
-  
-      // Init buffer
-      this.bufferSize = 24000 * 180;  // 24kHz x 180 seconds
-      this.buffer = new Float32Array(this.bufferSize);
-      this.writeIndex = 0;
+
+      const processorOptions = (options && options.processorOptions) || {};
+      this.capacity = Math.round(sampleRate * (processorOptions.bufferSeconds || DEFAULT_BUFFER_SECONDS));
+      this.ring = new Float32Array(this.capacity);
       this.readIndex = 0;
-  
-      // Handle incoming messages from main thread
+      this.writeIndex = 0;
+      this.buffered = 0;
+
+      this.minLatency = this._samples(MIN_LATENCY_MS);
+      this.maxLatency = this._samples(MAX_LATENCY_MS);
+      this.targetLatency = Math.min(Math.max(this._samples(processorOptions.targetLatencyMs || DEFAULT_TARGET_LATENCY_MS), this.minLatency), this.maxLatency);
+      this.underrunGap = this._samples(UNDERRUN_GAP_MS);
+      this.decayAfter = Math.round(sampleRate * DECAY_AFTER_SECONDS);
+      this.statsInterval = Math.round(sampleRate * STATS_INTERVAL_SECONDS);
+
+      this.state = STATE_IDLE;
+      this.turnEnded = false;
+      this.framesSinceEnqueue = 0;
+      this.framesSinceStarved = 0;
+      this.framesSinceUnderrun = 0;
+      this.framesSinceStats = 0;
+
+      this.underruns = 0;
+      this.overruns = 0;
+      this.droppedSamples = 0;
+      this.flushes = 0;
+      this.statsDirty = false;
+
       this.port.onmessage = (event) => {
-        // Reset the buffer when 'endOfAudio' message received
-        if (event.data.command === 'endOfAudio') {
-          this.readIndex = this.writeIndex; // Clear the buffer
-          console.log("endOfAudio received, clearing the buffer.");
-          return;
+        const data = event.data;
+        if (data instanceof ArrayBuffer) {
+          // Ignore a trailing odd byte instead of letting Int16Array throw.
+          this._enqueue(new Int16Array(data, 0, data.byteLength >> 1));
+        } else if (data.command === "endOfAudio") {
+          this._flush();
+        } else if (data.command === "endOfTurn") {
+          this.turnEnded = true;
+          if (this.state === STATE_BUFFERING) { this.state = STATE_PLAYING; }
+          if (this.state === STATE_STARVED) { this.state = STATE_IDLE; }
         }
-  
-        // Decode the base64 data to int16 array.
-        const int16Samples = new Int16Array(event.data);
-  
-        // Add the audio data to the buffer
-        this._enqueue(int16Samples);
       };
     }
-  
-    // Push incoming Int16 data into our ring buffer.
+
+    _samples(ms) {
+      return Math.round(sampleRate * ms / 1000);
+    }
+
     _enqueue(int16Samples) {
-      for (let i = 0; i < int16Samples.length; i++) {
-        // Convert 16-bit integer to float in [-1, 1]
-        const floatVal = int16Samples[i] / 32768;
-  
-        // Store in ring buffer for left channel only (mono)
-        this.buffer[this.writeIndex] = floatVal;
-        this.writeIndex = (this.writeIndex + 1) % this.bufferSize;
-  
-        // Overflow handling (overwrite oldest samples)
-        if (this.writeIndex === this.readIndex) {
-          this.readIndex = (this.readIndex + 1) % this.bufferSize;
-        }
+      let count = int16Samples.length;
+      if (count === 0) { return; }
+      // Only the newest `capacity` samples can ever be played.
+      const offset = Math.max(0, count - this.capacity);
+      count -= offset;
+      const free = this.capacity - this.buffered;
+      if (offset > 0 || count > free) {
+        this._dropOldest(Math.max(0, count - free), offset);
+      }
+
+      const ring = this.ring;
+      const writeIndex = this.writeIndex;
+      const firstPart = Math.min(count, this.capacity - writeIndex);
+      for (let i = 0; i < firstPart; i++) {
+        ring[writeIndex + i] = int16Samples[offset + i] * INT16_TO_FLOAT;
+      }
+      for (let i = firstPart; i < count; i++) {
+        ring[i - firstPart] = int16Samples[offset + i] * INT16_TO_FLOAT;
+      }
+      this.writeIndex = (writeIndex + count) % this.capacity;
+      this.buffered += count;
+      this.framesSinceEnqueue = 0;
+      this.turnEnded = false;
+
+      if (this.state === STATE_IDLE) {
+        this.state = STATE_BUFFERING;
+      } else if (this.state === STATE_STARVED) {
+        // Audio came back right after we ran dry: the network was late, not the speech over.
+        this.underruns++;
+        this.framesSinceUnderrun = 0;
+        this.targetLatency = Math.min(this.targetLatency + this._samples(LATENCY_STEP_MS), this.maxLatency);
+        this.statsDirty = true;
+        this.state = STATE_BUFFERING;
+      }
+      if (this.state === STATE_BUFFERING && this.buffered >= this.targetLatency) {
+        this.state = STATE_PLAYING;
+      }
+    }
+
+    // Overrun: the page is sending faster than we play, so the oldest audio goes
+    // (`skipped` counts incoming samples that were too old to fit at all).
+    _dropOldest(count, skipped = 0) {
+      this.readIndex = (this.readIndex + count) % this.capacity;
+      this.buffered -= count;
+      this.overruns++;
+      this.droppedSamples += count + skipped;
+      this.statsDirty = true;
+    }
+
+    _flush() {
+      this.readIndex = this.writeIndex;
+      this.buffered = 0;
+      this.state = STATE_IDLE;
+      this.turnEnded = false;
+      this.flushes++;
+      this.statsDirty = true;
+    }
+
+    // Copies up to `frames` samples into `channel` with at most two bulk copies.
+    _read(channel, frames) {
+      const count = Math.min(frames, this.buffered);
+      const readIndex = this.readIndex;
+      const firstPart = Math.min(count, this.capacity - readIndex);
+      channel.set(this.ring.subarray(readIndex, readIndex + firstPart), 0);
+      if (firstPart < count) {
+        channel.set(this.ring.subarray(0, count - firstPart), firstPart);
       }
+      if (count < frames) {
+        channel.fill(0, count);
+      }
+      this.readIndex = (readIndex + count) % this.capacity;
+      this.buffered -= count;
+      return count;
+    }
+
+    _postStats() {
+      this.port.postMessage({
+        type: "stats",
+        state: this.state,
+        bufferedMs: Math.round(this.buffered * 1000 / sampleRate),
+        targetLatencyMs: Math.round(this.targetLatency * 1000 / sampleRate),
+        underruns: this.underruns,
+        overruns: this.overruns,
+        droppedMs: Math.round(this.droppedSamples * 1000 / sampleRate),
+        flushes: this.flushes,
+      });
+      this.statsDirty = false;
     }
-  
+
     // The system calls `process()` ~128 samples at a time (depending on the browser).
-    // We fill the output buffers from our ring buffer.
     process(inputs, outputs, parameters) {
-  
-      // Write a frame to the output
       const output = outputs[0];
-      const framesPerBlock = output[0].length;
-      for (let frame = 0; frame < framesPerBlock; frame++) {
-  
-        // Write the sample(s) into the output buffer
-        output[0][frame] = this.buffer[this.readIndex]; // left channel
-        if (output.length > 1) {
-          output[1][frame] = this.buffer[this.readIndex]; // right channel
+      const left = output[0];
+      const frames = left.length;
+      this.framesSinceEnqueue += frames;
+      this.framesSinceUnderrun += frames;
+
+      // A stream shorter than the target (or one that paused) still gets played.
+      if (this.state === STATE_BUFFERING && this.framesSinceEnqueue >= this.targetLatency) {
+        this.state = STATE_PLAYING;
+      }
+
+      if (this.state === STATE_PLAYING) {
+        this._read(left, frames);
+        if (this.buffered === 0) {
+          this.state = this.turnEnded ? STATE_IDLE : STATE_STARVED;
+          this.framesSinceStarved = 0;
         }
-  
-        // Move the read index forward unless underflowing
-        if (this.readIndex != this.writeIndex) {
-          this.readIndex = (this.readIndex + 1) % this.bufferSize;
+      } else {
+        left.fill(0);
+        if (this.state === STATE_STARVED) {
+          this.framesSinceStarved += frames;
+          if (this.framesSinceStarved >= this.underrunGap) { this.state = STATE_IDLE; }
         }
       }
-  
+      for (let channel = 1; channel < output.length; channel++) {
+        output[channel].set(left);
+      }
+
+      if (this.framesSinceUnderrun >= this.decayAfter && this.targetLatency > this.minLatency) {
+        this.targetLatency = Math.max(this.targetLatency - this._samples(LATENCY_DECAY_MS), this.minLatency);
+        this.framesSinceUnderrun = 0;
+        this.statsDirty = true;
+      }
+
+      this.framesSinceStats += frames;
+      if (this.framesSinceStats >= this.statsInterval) {
+        this.framesSinceStats = 0;
+        if (this.statsDirty || this.state !== STATE_IDLE) { this._postStats(); }
+      }
+
       // Returning true tells the system to keep the processor alive
       return true;
     }
   }
-  
+
   registerProcessor('pcm-player-processor', PCMPlayerProcessor);
@@ -1,15 +1,85 @@
+/**
+ * An audio worklet processor that converts microphone input to 16-bit PCM and
+ * coalesces render quanta into larger frames before posting them to the main thread.
+ *
+ * Each render quantum is only 128 samples (8 ms at 16 kHz), so posting every one
+ * produced ~125 WebSocket messages per second. Samples are instead converted
+ * Float32 -> Int16 in place into a reusable ring buffer, and one frame is posted
+ * per aggregation window (default 40 ms).
+ */
+const DEFAULT_AGGREGATION_MS = 40;
+const MIN_AGGREGATION_MS = 10;
+const MAX_AGGREGATION_MS = 500;
+// Render quanta are 128 samples today; leave room in case the browser uses larger ones.
+const RENDER_QUANTUM_HEADROOM = 1024;
+
 class PCMProcessor extends AudioWorkletProcessor {
-    constructor() {
+    constructor(options) {
       super();
+
+      const processorOptions = (options && options.processorOptions) || {};
+      this._setAggregationWindow(processorOptions.aggregationMs || DEFAULT_AGGREGATION_MS);
+
+      this.port.onmessage = (event) => {
+        if (event.data.command === 'setAggregationMs') {
+          this._flush();
+          this._setAggregationWindow(event.data.value);
+        } else if (event.data.command === 'flush') {
+          this._flush();
+        }
+      };
     }
-  
+
+    // The ring holds one window plus headroom for a render quantum, so a window
+    // that straddles a quantum never overwrites samples that have not been posted.
+    _setAggregationWindow(aggregationMs) {
+      const clampedMs = Math.min(Math.max(aggregationMs, MIN_AGGREGATION_MS), MAX_AGGREGATION_MS);
+      this.frameSamples = Math.round(sampleRate * clampedMs / 1000);
+      this.ring = new Int16Array(this.frameSamples + RENDER_QUANTUM_HEADROOM);
+      this.writeIndex = 0;
+      this.pendingSamples = 0;
+    }
+
+    _write(inputChannel) {
+      const ring = this.ring;
+      const ringLength = ring.length;
+      let writeIndex = this.writeIndex;
+      for (let i = 0; i < inputChannel.length; i++) {
+        const s = Math.max(-1, Math.min(1, inputChannel[i]));
+        ring[writeIndex] = s < 0 ? s * 0x8000 : s * 0x7fff;
+        writeIndex++;
+        if (writeIndex === ringLength) { writeIndex = 0; }
+      }
+      this.writeIndex = writeIndex;
+      this.pendingSamples += inputChannel.length;
+    }
+
+    // Copy `count` samples ending at writeIndex into a fresh buffer and transfer it.
+    _post(count) {
+      const frame = new Int16Array(count);
+      const start = (this.writeIndex - this.pendingSamples + this.ring.length) % this.ring.length;
+      const firstPart = Math.min(count, this.ring.length - start);
+      frame.set(this.ring.subarray(start, start + firstPart), 0);
+      if (firstPart < count) {
+        frame.set(this.ring.subarray(0, count - firstPart), firstPart);
+      }
+      this.pendingSamples -= count;
+      this.port.postMessage(frame.buffer, [frame.buffer]);
+    }
+
+    _flush() {
+      if (this.pendingSamples > 0) {
+        this._post(this.pendingSamples);
+      }
+    }
+
     process(inputs, outputs, parameters) {
       if (inputs.length > 0 && inputs[0].length > 0) {
         // Use the first channel
-        const inputChannel = inputs[0][0];
-        // Copy the buffer to avoid issues with recycled memory
-        const inputCopy = new Float32Array(inputChannel);
-        this.port.postMessage(inputCopy);
+        this._write(inputs[0][0]);
+        while (this.pendingSamples >= this.frameSamples) {
+          this._post(this.frameSamples);
+        }
       }
       return true;
     }
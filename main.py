@@ -2,13 +2,16 @@
 
 import os
 import json
+import time
 import asyncio
 import base64
+import contextvars
 # No longer need functools or copy
 # import functools
 # import copy
 
 from pathlib import Path
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 from google.genai.types import (
@@ -25,38 +28,93 @@ from google.adk.agents import LiveRequestQueue
 from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.sessions.in_memory_session_service import InMemorySessionService
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from agents.agent import root_agent
 # --- NEW: Import the context variable we defined ---
 # from tools.agent_wrappers import side_channel_context
 from tools.agent_wrappers import side_channel_context, session_context
+from tools.video_jobs import video_job_manager
+from tools.creative_backend_tools import image_prompt_cache, media_store
+from tools.media_store import LocalMediaStore, parse_byte_range
+from tools.io_pool import io_stats, cache_io
+from tools.clients import clients, CLIENT_WARMUP
+from tools.session_store import LogSessionService, create_session_service
+from tools.reservations import reservation_ledger, run_reservation_sweeper
+from tools.intent_router import intent_router
+from tools.outbound import (
+    OutboundScheduler,
+    LANE_CONTROL,
+    LANE_TRANSCRIPTION,
+    LANE_IMAGES,
+)
+from tools.live_sessions import LiveSession, LiveSessionRegistry, SESSION_MIME_TYPE
+from tools.place_photo_tools import place_cache_stats, place_cache_snapshot, warm_place_photo_cache, photo_latency_stats
+from tools.ws_protocol import (
+    PROTOCOL_JSON,
+    PROTOCOL_BINARY,
+    PROTOCOL_MIME_TYPE,
+    PROTOCOL_ERROR_MIME_TYPE,
+    DIRECTION_CLIENT_TO_AGENT,
+    DEFAULT_INPUT_SAMPLE_RATE,
+    FLAG_OPUS,
+    AudioFrameSequencer,
+    negotiate_protocol,
+)
+from tools.voice_gate import VoiceGate
+from tools.audio_codec import CODEC_PCM, CODEC_OPUS, CODEC_MIME_TYPE, OpusDecoder, negotiate_codec
+from tools.tracing import (
+    tracer,
+    trace_context,
+    MARK_INBOUND_AUDIO,
+    MARK_INBOUND_TEXT,
+    MARK_MODEL_RESPONSE,
+    MARK_OUTBOUND_AUDIO,
+    MARK_TURN_COMPLETE,
+    MARK_INTERRUPTED,
+)
+from tools.trace_plugin import TracingPlugin
 
 load_dotenv()
 
 # --- Application Setup ---
 APP_NAME = "ADK Streaming"
 STATIC_DIR = Path("frontend/static")
-session_service = InMemorySessionService()
+# Popular destinations whose photos are pre-fetched at startup: a comma-separated
+# list and/or a file with one place name per line.
+PLACE_CACHE_WARM_LIST = os.getenv("PLACE_CACHE_WARM_LIST", "")
+PLACE_CACHE_WARM_FILE = os.getenv("PLACE_CACHE_WARM_FILE")
+# Tools block on put() once this many image/video messages are waiting to be sent.
+SIDE_CHANNEL_QUEUE_SIZE = int(os.getenv("SIDE_CHANNEL_QUEUE_SIZE", "64"))
+# Silence after which the live model decides the user has finished speaking.
+SILENCE_DURATION_MS = int(os.getenv("SILENCE_DURATION_MS", "3000"))
+# Persistent by default (SQLite); see SESSION_STORE in tools/session_store.py.
+session_service = create_session_service()
+# Records tool calls and agent transfers into each session's turn trace.
+tracing_plugin = TracingPlugin()
 
 # --- REVERTED: start_agent_session is simple again ---
 async def start_agent_session(session_id: str, is_audio: bool = False):
     """Starts an agent session asynchronously."""
-    session = await session_service.create_session(
-        app_name=APP_NAME,
-        user_id=session_id,
-        session_id=session_id,
-        # state={} # Newly added for banking
+    # Reuse the conversation if this session id already has one (e.g. its live stream ended).
+    session = await session_service.get_session(app_name=APP_NAME, user_id=session_id, session_id=session_id)
+    if session is None:
+        session = await session_service.create_session(
+            app_name=APP_NAME,
+            user_id=session_id,
+            session_id=session_id,
+            # state={} # Newly added for banking
 
-    )
+        )
     # We now use the global root_agent again, as it's never modified.
     runner = Runner(
         app_name=APP_NAME,
         agent=root_agent,
         session_service=session_service,
+        plugins=[tracing_plugin],
     )
 
     modality = "AUDIO"
@@ -79,9 +137,9 @@ async def start_agent_session(session_id: str, is_audio: bool = False):
         automatic_activity_detection=genai_types.AutomaticActivityDetection(
             disabled = False, # default
             start_of_speech_sensitivity= genai_types.StartSensitivity.START_SENSITIVITY_LOW,
-            end_of_speech_sensitivity=types.EndSensitivity.END_SENSITIVITY_LOW,
+            end_of_speech_sensitivity=genai_types.EndSensitivity.END_SENSITIVITY_LOW,
             prefix_padding_ms=10,
-            silence_duration_ms= 3000,
+            silence_duration_ms=SILENCE_DURATION_MS,
         )
     ),
 
@@ -100,78 +158,202 @@ async def start_agent_session(session_id: str, is_audio: bool = False):
     # return live_events, live_request_queue
     return live_events, live_request_queue, session
 
-async def agent_to_client_messaging(websocket: WebSocket, live_events):
-    async for event in live_events:
+async def agent_to_client_messaging(live: LiveSession):
+    async for event in live.live_events:
         # The temporary debugging print() line can now be removed.
 
+        # A local intent route (tools/intent_router.py) hands the turn to a specialist; it is not over.
+        actions = getattr(event, "actions", None)
+        if actions and actions.transfer_to_agent and not event.content:
+            continue
+
         # 1. Handle turn completion first
         if event.turn_complete or event.interrupted:
-            await websocket.send_text(json.dumps({
+            if event.interrupted:
+                # Audio still waiting to go out is stale once the user talks over the agent.
+                live.drop_audio()
+            else:
+                await live.flush_audio()
+            live.trace.end_turn(MARK_INTERRUPTED if event.interrupted else MARK_TURN_COMPLETE)
+            await live.send_message(LANE_CONTROL, {
                 "turn_complete": event.turn_complete, 
                 "interrupted": event.interrupted
-            }))
+            })
             continue
 
         # 2. Process events that have content
         if event.content and event.content.parts:
             # Check the role to determine the author
             author = event.content.role
+            if author == 'model':
+                live.trace.mark(MARK_MODEL_RESPONSE)
 
             for part in event.content.parts:
                 # If there's text, send it with the correct type based on the author
                 if part.text:
                     # If the author is the USER, it's an input transcription
                     if author == 'user':
-                        await websocket.send_text(json.dumps({
+                        await live.send_message(LANE_TRANSCRIPTION, {
                             "mime_type": "text/input_transcription",
                             "data": part.text
-                        }))
+                        })
                     # If the author is the MODEL, it's the agent's speech
                     elif author == 'model':
                         # Use the event.partial flag to distinguish live transcript from final text
                         if event.partial:
-                            await websocket.send_text(json.dumps({
+                            await live.send_message(LANE_TRANSCRIPTION, {
                                 "mime_type": "text/transcription",
                                 "data": part.text
-                            }))
+                            })
                         else:
-                            await websocket.send_text(json.dumps({
+                            await live.send_message(LANE_TRANSCRIPTION, {
                                 "mime_type": "text/plain",
                                 "data": part.text
-                            }))
+                            })
 
-                # Handle audio data from the agent (this remains the same)
+                # Handle audio data from the agent (framed for whichever client is attached)
                 elif part.inline_data and part.inline_data.mime_type.startswith("audio/"):
-                    await websocket.send_text(json.dumps({
-                        "mime_type": "audio/pcm", 
-                        "data": base64.b64encode(part.inline_data.data).decode("ascii")
-                    }))
-
-
-async def client_to_agent_messaging(websocket: WebSocket, live_request_queue: LiveRequestQueue):
+                    live.trace.mark(MARK_OUTBOUND_AUDIO)
+                    await live.send_audio(part.inline_data.data, part.inline_data.mime_type)
+
+
+def send_microphone_audio(live: LiveSession, pcm: bytes, sample_rate: int = DEFAULT_INPUT_SAMPLE_RATE):
+    """Forwards microphone audio through the session's voice gate; silence may be dropped."""
+    if live.voice_gate is not None:
+        pcm = live.voice_gate.process(pcm, sample_rate)
+        if not pcm:
+            return
+    # A turn starts at the first speech, not at whatever silence the microphone streams in between.
+    if live.voice_gate is not None and live.voice_gate.in_speech:
+        live.trace.mark(MARK_INBOUND_AUDIO)
+    live.live_request_queue.send_realtime(Blob(data=pcm, mime_type="audio/pcm"))
+
+async def client_to_agent_messaging(websocket: WebSocket, live: LiveSession, protocol: str = PROTOCOL_JSON, codec: str = CODEC_PCM):
+    live_request_queue = live.live_request_queue
+    audio_sequencer = AudioFrameSequencer(DIRECTION_CLIENT_TO_AGENT)
+    # The live API only takes PCM, so Opus microphone audio is decoded here.
+    decoder = OpusDecoder(DEFAULT_INPUT_SAMPLE_RATE) if codec == CODEC_OPUS else None
     while True:
-        message_json = await websocket.receive_text()
+        if protocol == PROTOCOL_BINARY:
+            # Binary mode carries both frame types, so read the raw ASGI message.
+            raw_message = await websocket.receive()
+            if raw_message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(raw_message.get("code", 1000))
+            if raw_message.get("bytes") is not None:
+                started = time.perf_counter()
+                try:
+                    flags, sample_rate, pcm = audio_sequencer.unpack_with_flags(raw_message["bytes"])
+                except ValueError as e:
+                    # One bad frame is rejected; the session goes on.
+                    print(f"Client #{live.session_id} sent a malformed audio frame: {e}")
+                    if live.outbound is not None:
+                        await live.outbound.put(LANE_CONTROL, json.dumps({"mime_type": PROTOCOL_ERROR_MIME_TYPE, "data": str(e)}))
+                    continue
+                if flags & FLAG_OPUS:
+                    if decoder is None:
+                        continue  # Opus was not negotiated for this connection.
+                    pcm, sample_rate = decoder.decode(pcm), decoder.sample_rate
+                    if not pcm:
+                        continue  # The resampler is still filling its window.
+                live.audio_link.record(codec, "in", len(raw_message["bytes"]), len(pcm) / 2 / sample_rate, time.perf_counter() - started)
+                send_microphone_audio(live, pcm, sample_rate)
+                continue
+            message_json = raw_message.get("text")
+            if message_json is None:
+                continue
+        else:
+            message_json = await websocket.receive_text()
         message = json.loads(message_json)
         if message["mime_type"] == "text/plain":
+            live.trace.mark(MARK_INBOUND_TEXT)
             live_request_queue.send_content(content=Content(role="user", parts=[Part.from_text(text=message["data"])]))
         elif message["mime_type"] == "audio/pcm":
-            live_request_queue.send_realtime(Blob(data=base64.b64decode(message["data"]), mime_type=message["mime_type"]))
+            started = time.perf_counter()
+            pcm = base64.b64decode(message["data"])
+            live.audio_link.record(CODEC_PCM, "in", len(message_json), len(pcm) / 2 / DEFAULT_INPUT_SAMPLE_RATE, time.perf_counter() - started)
+            send_microphone_audio(live, pcm)
 
-async def handle_side_channel_messages(websocket: WebSocket, queue: asyncio.Queue):
+async def handle_side_channel_messages(live: LiveSession):
+    queue = live.side_channel_queue
     while True:
         data_from_queue = await queue.get()
         if isinstance(data_from_queue, list):
             message = {"mime_type": "image/url_list", "data": data_from_queue}
         elif isinstance(data_from_queue, str):
             message = {"mime_type": "image/url", "data": data_from_queue}
+        elif isinstance(data_from_queue, dict):
+            # Already a complete message, e.g. a finished video job.
+            message = data_from_queue
         else:
             queue.task_done()
             continue
-        await websocket.send_text(json.dumps(message))
+        await live.send_message(LANE_IMAGES, message)
         queue.task_done()
 
-# --- FastAPI App Setup (No Changes) ---
-app = FastAPI()
+async def start_live_session(session_id: str, is_audio: bool = False) -> LiveSession:
+    """Starts the agent session and the tasks that outlive any single WebSocket."""
+    live_events, live_request_queue, session_object = await start_agent_session(session_id, is_audio)
+    side_channel_queue = asyncio.Queue(maxsize=SIDE_CHANNEL_QUEUE_SIZE)
+    live = LiveSession(session_id, session_object, live_events, live_request_queue, side_channel_queue)
+    live.trace = tracer.session(session_id)
+
+    # --- THE BRIDGE: tools look up the session and side channel through context variables. ---
+    # The session's tasks get their own context, so reconnects do not need to re-set them.
+    context = contextvars.copy_context()
+    context.run(side_channel_context.set, side_channel_queue)
+    context.run(session_context.set, session_object)
+    context.run(trace_context.set, live.trace)
+    context.run(live.start, agent_to_client_messaging(live), handle_side_channel_messages(live))
+    return live
+
+async def evict_live_session(live: LiveSession, forget: bool):
+    # Nobody is left to receive the result of this session's video jobs.
+    video_job_manager.cancel_owner(live.session_id)
+    # Persistent stores expire sessions by TTL; only the in-memory store must be cleaned up here.
+    if forget and isinstance(session_service, InMemorySessionService):
+        await session_service.delete_session(app_name=APP_NAME, user_id=live.session_id, session_id=live.session_id)
+
+live_sessions = LiveSessionRegistry(on_evict=evict_live_session)
+
+# --- Startup and Shutdown ---
+def _place_names_to_warm() -> list[str]:
+    names = [name.strip() for name in PLACE_CACHE_WARM_LIST.split(",")]
+    if PLACE_CACHE_WARM_FILE and os.path.exists(PLACE_CACHE_WARM_FILE):
+        with open(PLACE_CACHE_WARM_FILE) as f:
+            names.extend(line.strip() for line in f)
+    return [name for name in dict.fromkeys(names) if name]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep references so the background tasks are not garbage-collected mid-run.
+    background_tasks = []
+    if CLIENT_WARMUP == "blocking":
+        await clients.warm_all()
+    elif CLIENT_WARMUP == "background":
+        # The server accepts connections right away; a request that needs a client before
+        # the warm-up has built it simply builds it itself (LazyClient.get is single-flight).
+        background_tasks.append(asyncio.create_task(clients.warm_all()))
+
+    # Lapsed booking holds give their seats and rooms back (see tools/reservations.py).
+    background_tasks.append(asyncio.create_task(run_reservation_sweeper()))
+    # Expired sessions are purged even when no new session is created.
+    if isinstance(session_service, LogSessionService):
+        background_tasks.append(asyncio.create_task(session_service.run_gc()))
+
+    place_names = _place_names_to_warm()
+    if place_names:
+        print(f"Warming place photo cache for {len(place_names)} destinations in the background.")
+        background_tasks.append(asyncio.create_task(warm_place_photo_cache(place_names)))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    if tracer.exporter is not None:
+        await tracer.exporter.flush()
+
+# --- FastAPI App Setup ---
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -186,49 +368,136 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 @app.get("/")
 async def root(): return FileResponse(os.path.join(STATIC_DIR, "index.html"))
 
-# --- FINAL REVISED: Websocket endpoint with contextvars ---
+@app.get("/media/{object_name:path}")
+async def serve_media(object_name: str, request: Request):
+    """Serves media held by the local media store, with ETag and single-range support."""
+    if not isinstance(media_store, LocalMediaStore):
+        raise HTTPException(status_code=404)
+    item = await media_store.get(object_name)
+    if item is None:
+        raise HTTPException(status_code=404)
+
+    headers = {"ETag": item.etag, "Accept-Ranges": "bytes", "Cache-Control": "public, max-age=86400"}
+    if request.headers.get("if-none-match") == item.etag:
+        return Response(status_code=304, headers=headers)
+
+    size = len(item.data)
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return Response(content=item.data, media_type=item.content_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(content=item.data[start:end + 1], status_code=206, media_type=item.content_type, headers=headers)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the generated-media caches."""
+    # Counting the persistent tiers' rows is a SQLite query; keep it off the event loop.
+    stats = await cache_io.run(lambda: {"image_prompts": image_prompt_cache.stats(), **place_cache_stats()})
+    if isinstance(media_store, LocalMediaStore):
+        stats["local_media"] = media_store.stats()
+    return stats
+
+@app.get("/stats/photos")
+async def photo_stats():
+    """First-photo and all-photos delivery latency for place photo requests."""
+    return photo_latency_stats()
+
+@app.get("/stats/io")
+async def blocking_io_stats():
+    """Queue depth, in-flight calls and latency of the Maps and GCS executors."""
+    return io_stats()
+
+@app.get("/stats/sessions")
+async def session_stats():
+    """Live sessions, their resumption state and per-session outbound queue depth and drops."""
+    stats = live_sessions.stats()
+    if isinstance(session_service, LogSessionService):
+        stats["store"] = await session_service.stats()
+    return stats
+
+@app.get("/stats/reservations")
+async def reservation_stats():
+    """Booking holds by status, units held against capacity, and idempotent replays."""
+    if not reservation_ledger.initialized:
+        return {"initialized": False}
+    return await reservation_ledger.get().stats()
+
+@app.get("/stats/intents")
+async def intent_stats():
+    """How many spoken turns the local intent router dispatched by rule or model, or left to the LLM."""
+    if not intent_router.initialized:
+        return {"initialized": False}
+    return intent_router.get().stats()
+
+@app.get("/metrics")
+async def metrics(format: str = "json"):
+    """p50/p95/p99 of turn marks, agent transfers, tool calls and backend I/O; format=prometheus for scraping."""
+    if format == "prometheus":
+        return Response(content=tracer.prometheus(), media_type="text/plain; version=0.0.4")
+    return tracer.metrics()
+
+@app.get("/stats/clients")
+async def client_stats():
+    """Which SDK clients are built, how long each took, and the startup warm-up time."""
+    return clients.stats()
+
+@app.get("/cache/places")
+async def cache_places():
+    """In-memory contents of the place photo caches."""
+    return place_cache_snapshot()
+
+# --- FINAL REVISED: Websocket endpoint with resumable live sessions ---
 @app.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str, is_audio: bool = False):
+async def websocket_endpoint(websocket: WebSocket, session_id: str, is_audio: bool = False, protocol: str = PROTOCOL_JSON, codec: str = CODEC_PCM, last_seq: int = 0):
     """Handles the WebSocket connection for a client session."""
     await websocket.accept()
-    print(f"Client #{session_id} connected, audio mode: {is_audio}")
-
-    side_channel_queue = asyncio.Queue()
-
-    # Create a new async function to run our tasks. This makes it easy
-    # to set the context for all of them.
-    async def run_tasks_with_context():
-        # Start the agent session (now uses the global agent)
-        # live_events, live_request_queue = await start_agent_session(session_id, is_audio)
-        
-        # --- MODIFIED: Start the agent session and get the session object ---
-        live_events, live_request_queue, session_object = await start_agent_session(session_id, is_audio)
-        
-        # --- THE BRIDGE (Part 2): Set the session object in the context variable ---
-        session_context.set(session_object)
-        
-        # Create all concurrent tasks
+    protocol = negotiate_protocol(protocol)
+    codec = negotiate_codec(codec, protocol) if is_audio else CODEC_PCM
+    print(f"Client #{session_id} connected, audio mode: {is_audio}, protocol: {protocol}, codec: {codec}")
+
+    # Tell the client which protocol and audio codec were accepted; old clients simply ignore these messages.
+    await websocket.send_text(json.dumps({"mime_type": PROTOCOL_MIME_TYPE, "data": protocol}))
+    await websocket.send_text(json.dumps({"mime_type": CODEC_MIME_TYPE, "data": codec}))
+
+    # Every outbound frame goes through this scheduler so a slow client cannot grow memory without bound.
+    outbound = OutboundScheduler(websocket)
+    live = None
+    token = None
+
+    try:
+        # Re-attach to the session's live stream if it is still within its grace period.
+        live, resumed = await live_sessions.get_or_start(session_id, lambda: start_live_session(session_id, is_audio))
+        await outbound.put(LANE_CONTROL, json.dumps({"mime_type": SESSION_MIME_TYPE, "data": {"resumed": resumed}}))
+        # Each connection gets its own gate: a session started in text mode may reconnect with the microphone on.
+        # With VOICE_GATE=off the gate forwards everything but still detects speech.
+        voice_gate = VoiceGate(model_silence_ms=SILENCE_DURATION_MS) if is_audio else None
+        token, replayed = await live.attach(outbound, protocol, last_seq if resumed else 0, codec, voice_gate)
+        if resumed:
+            print(f"Client #{session_id} resumed its session, replaying {replayed} message(s) after seq {last_seq}.")
+
         tasks = [
-            agent_to_client_messaging(websocket, live_events),
-            client_to_agent_messaging(websocket, live_request_queue),
-            handle_side_channel_messages(websocket, side_channel_queue)
+            client_to_agent_messaging(websocket, live, protocol, codec),
+            outbound.run(),
+            live.wait_closed(),
         ]
         done, pending = await asyncio.wait([asyncio.create_task(t) for t in tasks], return_when=asyncio.FIRST_COMPLETED)
-        
+
         for task in pending:
             task.cancel()
-
-    try:
-        # --- THE FIX ---
-        # Set the context variable to our session-specific queue
-        side_channel_context.set(side_channel_queue)
-        # Run all our tasks within this context. Any tool called by the agent
-        # within this block can now access the queue.
-        await run_tasks_with_context()
+        for task in done:
+            task.result()
 
     except WebSocketDisconnect:
         print(f"Client #{session_id} disconnected cleanly.")
     except Exception as e:
         print(f"An error occurred in the websocket endpoint for client #{session_id}: {e}")
     finally:
+        # The live session stays up for a grace period so the client can reconnect to it.
+        if live is not None and token is not None:
+            await live_sessions.detach(live, token)
         print(f"Connection for client #{session_id} closed.")
@@ -1,5 +1,8 @@
 # tools/agent_wrappers.py
+import os
 import json
+import time
+import uuid
 import asyncio
 from google.adk.tools import FunctionTool, agent_tool
 
@@ -14,7 +17,13 @@ session_context = ContextVar('session_object', default=None)
 
 # --- Tool Imports ---
 from tools.creative_backend_tools import call_generate_image_api
-from tools.place_photo_tools import fetch_and_upload_place_photos
+from tools.place_photo_tools import (
+    fetch_and_upload_place_photos,
+    stream_place_photos,
+    first_photo_latency,
+    all_photos_latency,
+)
+from tools.video_jobs import JOB_FAILED, video_job_manager, VideoJobLimitError
 
 
 # =========================================================================
@@ -57,10 +66,15 @@ image_gen_tool_for_root = FunctionTool(
 # =========================================================================
 # === PLACE PHOTO FUNCTION TOOL (REVISED FOR CONTEXTVARS) ===
 # =========================================================================
+# Push each place photo to the client as soon as it uploads instead of waiting
+# for the whole set. Set PLACE_PHOTOS_STREAMING=false to send one list at the end.
+PLACE_PHOTOS_STREAMING = os.getenv("PLACE_PHOTOS_STREAMING", "true").lower() != "false"
+
+
 async def fetch_place_photo_tool_func(place_name: str) -> str:
     """
     Fetches photos, finds the side-channel queue via contextvar to send the
-    URL list, and returns a success message to the agent.
+    URLs, and returns a success message to the agent.
     """
     # The function signature is now simple, which the ADK can parse.
     print(f"DEBUG: fetch_place_photo_tool_func called with place_name: '{place_name}'")
@@ -70,8 +84,14 @@ async def fetch_place_photo_tool_func(place_name: str) -> str:
 
     if not place_name:
         return "Error: No place_name provided."
+    if PLACE_PHOTOS_STREAMING and side_channel_queue:
+        return await _stream_place_photos_to_client(place_name, side_channel_queue)
     try:
+        started = time.perf_counter()
         public_urls, display_name = await fetch_and_upload_place_photos(place_name)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        first_photo_latency.record(elapsed_ms)
+        all_photos_latency.record(elapsed_ms)
 
         if side_channel_queue and public_urls:
             print(f"DEBUG: Putting list of {len(public_urls)} URLs for '{display_name}' into side channel queue via contextvar.")
@@ -87,6 +107,78 @@ async def fetch_place_photo_tool_func(place_name: str) -> str:
         print(f"ERROR: {error_msg}")
         return f"Error: {error_msg}"
 
+async def _stream_place_photos_to_client(place_name: str, side_channel_queue: asyncio.Queue) -> str:
+    """Pushes each photo as its own image/url message, grouped into one gallery on the page."""
+    gallery_id = f"gallery-{uuid.uuid4().hex[:8]}"
+    display_name = place_name
+    delivered = 0
+    started = time.perf_counter()
+    try:
+        async for public_url, display_name in stream_place_photos(place_name):
+            if delivered == 0:
+                first_photo_latency.record((time.perf_counter() - started) * 1000)
+            delivered += 1
+            await side_channel_queue.put({"mime_type": "image/url", "data": public_url, "gallery_id": gallery_id})
+    except Exception as e:
+        if not delivered:
+            error_msg = f"I'm sorry, I couldn't get photos for that. The error was: {str(e)}"
+            print(f"ERROR: {error_msg}")
+            return f"Error: {error_msg}"
+        print(f"WARNING: Photo stream for '{place_name}' ended early after {delivered} photo(s): {e}")
+
+    all_photos_latency.record((time.perf_counter() - started) * 1000)
+    print(f"DEBUG: Streamed {delivered} photos for '{display_name}' into side channel queue.")
+    return f"Teleporting you there visually. Here comes {display_name}."
+
 fetch_place_photo_tool_for_root = FunctionTool(
     func=fetch_place_photo_tool_func
 )
+
+# =========================================================================
+# === VIDEO GENERATION JOB TOOLS ===
+# =========================================================================
+async def generate_video_tool_func(prompt: str) -> str:
+    """
+    Starts a background video generation job and returns its job id right away.
+    The finished video is pushed to the user's screen automatically.
+    """
+    print(f"DEBUG: generate_video_tool_func called with prompt: '{prompt}'")
+
+    if not prompt:
+        return "Error: I didn't receive a prompt."
+
+    session = session_context.get()
+    owner = session.id if session else "anonymous"
+    try:
+        job = await video_job_manager.submit(owner, {"prompt": prompt}, side_channel_context.get())
+    except VideoJobLimitError as e:
+        return f"Error: {str(e)} Let's wait for those to finish first."
+    except Exception as e:
+        error_msg = f"Sorry, I couldn't start the video. The error was: {str(e)}"
+        print(f"ERROR: {error_msg}")
+        return f"Error: {error_msg}"
+    if job.status == JOB_FAILED:
+        return f"Error: Sorry, I couldn't start the video. The error was: {job.error}"
+
+    return f"Lights, camera, action! Video job {job.job_id} is rolling. It takes a few minutes and will pop up on your screen when it's ready."
+
+generate_video_tool_for_root = FunctionTool(
+    func=generate_video_tool_func
+)
+
+
+async def check_video_job_tool_func(job_id: str) -> str:
+    """Reports the current status of one of this session's video generation jobs."""
+    session = session_context.get()
+    owner = session.id if session else "anonymous"
+    job = video_job_manager.get(job_id)
+    # Another session's job is reported exactly like a missing one.
+    if not job or job.owner != owner:
+        return f"Error: I couldn't find a video job with id {job_id}."
+    if job.error:
+        return f"Video job {job_id} is {job.status}: {job.error}"
+    return f"Video job {job_id} is {job.status}."
+
+check_video_job_tool_for_root = FunctionTool(
+    func=check_video_job_tool_func
+)
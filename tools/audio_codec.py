@@ -0,0 +1,148 @@
+# tools/audio_codec.py
+
+import os
+import logging
+
+import numpy as np
+
+from tools.ws_protocol import PROTOCOL_BINARY
+
+logger = logging.getLogger(__name__)
+
+# --- Audio Codecs on the Browser Link ---
+# "pcm"  - raw 16-bit PCM, the original transport and the fallback.
+# "opus" - one Opus packet per binary audio frame (FLAG_OPUS in the frame header).
+#          Needs the binary protocol, PyAV on the server (pip install av) and
+#          WebCodecs in the browser.
+# The live API always receives and produces PCM; the server transcodes. The client
+# asks with ?codec=opus and the server confirms with a CODEC_MIME_TYPE message.
+CODEC_PCM = "pcm"
+CODEC_OPUS = "opus"
+CODEC_MIME_TYPE = "application/x-odyssey-codec"
+# Codecs the server is willing to negotiate, e.g. "pcm" to turn Opus off.
+AUDIO_CODECS = tuple(codec.strip().lower() for codec in os.getenv("AUDIO_CODECS", "opus,pcm").split(",") if codec.strip())
+# Bit rate of the agent audio sent to the browser; the browser picks its own for the microphone.
+OPUS_BITRATE = int(os.getenv("OPUS_BITRATE", "24000"))
+OPUS_FRAME_MS = 20
+
+_opus_available: bool | None = None
+
+
+def opus_available() -> bool:
+    """True when PyAV and its libopus encoder are installed."""
+    global _opus_available
+    if _opus_available is None:
+        try:
+            import av
+            av.codec.Codec("libopus", "w")
+            _opus_available = True
+        except Exception as e:
+            logger.info(f"Opus audio unavailable ({e}); using PCM only.")
+            _opus_available = False
+    return _opus_available
+
+
+def negotiate_codec(requested: str | None, protocol: str) -> str:
+    """Returns the codec to use for a connection, falling back to PCM."""
+    if (
+        requested and requested.lower() == CODEC_OPUS
+        and CODEC_OPUS in AUDIO_CODECS
+        and protocol == PROTOCOL_BINARY
+        and opus_available()
+    ):
+        return CODEC_OPUS
+    return CODEC_PCM
+
+
+class OpusEncoder:
+    """Encodes a PCM stream of arbitrary chunk sizes into fixed OPUS_FRAME_MS packets."""
+
+    def __init__(self, sample_rate: int, bitrate: int = OPUS_BITRATE):
+        import av
+
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * OPUS_FRAME_MS // 1000
+        self._frame_bytes = self.frame_samples * 2
+        self._pending = bytearray()
+        self._pts = 0
+        self._context = av.CodecContext.create("libopus", "w")
+        self._context.sample_rate = sample_rate
+        self._context.layout = "mono"
+        self._context.format = "s16"
+        self._context.bit_rate = bitrate
+        self._context.options = {"frame_duration": str(OPUS_FRAME_MS), "application": "voip"}
+        self._context.open()
+
+    def encode(self, pcm: bytes) -> list[bytes]:
+        """Returns the packets completed by this chunk; a partial frame waits for the next one."""
+        self._pending += pcm
+        packets = []
+        while len(self._pending) >= self._frame_bytes:
+            packets.extend(self._encode_frame(bytes(self._pending[:self._frame_bytes])))
+            del self._pending[:self._frame_bytes]
+        return packets
+
+    def flush(self) -> list[bytes]:
+        """Encodes the partial frame left at the end of a turn, padded with silence."""
+        if not self._pending:
+            return []
+        frame = bytes(self._pending) + bytes(self._frame_bytes - len(self._pending))
+        self._pending.clear()
+        return self._encode_frame(frame)
+
+    def reset(self):
+        """Drops the partial frame (the agent was interrupted)."""
+        self._pending.clear()
+
+    def _encode_frame(self, pcm: bytes) -> list[bytes]:
+        import av
+
+        frame = av.AudioFrame.from_ndarray(np.frombuffer(pcm, dtype="<i2").reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = self.sample_rate
+        frame.pts = self._pts
+        self._pts += self.frame_samples
+        return [bytes(packet) for packet in self._context.encode(frame)]
+
+
+class OpusDecoder:
+    """Decodes Opus packets into 16-bit mono PCM at `sample_rate`."""
+
+    def __init__(self, sample_rate: int):
+        import av
+
+        self.sample_rate = sample_rate
+        self._av = av
+        self._context = av.CodecContext.create("libopus", "r")
+        # libopus decodes at 48 kHz; resample to what the live API expects.
+        self._resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+
+    def decode(self, packet: bytes) -> bytes:
+        chunks = []
+        for frame in self._context.decode(self._av.Packet(packet)):
+            for resampled in self._resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().tobytes())
+        return b"".join(chunks)
+
+
+class AudioLinkStats:
+    """Per-session bandwidth and transcoding CPU on the browser link, by codec and direction."""
+
+    def __init__(self):
+        self._totals: dict[tuple[str, str], list[float]] = {}
+
+    def record(self, codec: str, direction: str, wire_bytes: int, audio_seconds: float, cpu_seconds: float):
+        totals = self._totals.setdefault((codec, direction), [0, 0.0, 0.0])
+        totals[0] += wire_bytes
+        totals[1] += audio_seconds
+        totals[2] += cpu_seconds
+
+    def stats(self) -> dict:
+        stats: dict[str, dict] = {}
+        for (codec, direction), (wire_bytes, audio_seconds, cpu_seconds) in self._totals.items():
+            stats.setdefault(codec, {})[direction] = {
+                "wire_bytes": int(wire_bytes),
+                "audio_seconds": round(audio_seconds, 1),
+                "kbps": round(wire_bytes * 8 / audio_seconds / 1000, 1) if audio_seconds else None,
+                "cpu_percent": round(cpu_seconds / audio_seconds * 100, 2) if audio_seconds else None,
+            }
+        return stats
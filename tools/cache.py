@@ -0,0 +1,204 @@
+# tools/cache.py
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from tools.io_pool import cache_io
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """A size-bounded, in-process LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl_seconds: float | None = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._entries.clear()
+
+    def items(self) -> list[tuple]:
+        """Returns a snapshot of live (key, value) pairs, least recently used first."""
+        now = time.monotonic()
+        return [(key, value) for key, (expires_at, value) in self._entries.items() if expires_at >= now]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCacheTier:
+    """
+    A persistent key/value tier backed by a local SQLite file (WAL mode).
+    Values are stored as JSON; expired rows are ignored on read and purged lazily.
+    """
+
+    def __init__(self, path: str, table: str = "cache_entries"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl_seconds: float):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl_seconds),
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class TieredCache:
+    """
+    An in-process TTLCache in front of an optional persistent tier. Persistent hits
+    are promoted into memory. Counts hits per tier and misses. Async code uses
+    aget/aset, which touch the persistent tier only on the cache executor.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, persistent: SQLiteCacheTier | None = None):
+        self.name = name
+        self.memory = TTLCache(max_entries, ttl_seconds)
+        self.persistent = persistent
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default=None):
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.persistent is not None:
+            value = self._read_persistent(key)
+            if value is not None:
+                return self._promote(key, value)
+        self.misses += 1
+        return default
+
+    async def aget(self, key: str, default=None):
+        """get() for async callers: the persistent tier is read on the cache executor, off the event loop."""
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.persistent is not None:
+            value = await cache_io.run(self._read_persistent, key)
+            if value is not None:
+                return self._promote(key, value)
+        self.misses += 1
+        return default
+
+    def set(self, key: str, value, ttl_seconds: float | None = None):
+        self.memory.set(key, value, ttl_seconds)
+        if self.persistent is not None:
+            self._write_persistent(key, value, ttl_seconds)
+
+    async def aset(self, key: str, value, ttl_seconds: float | None = None):
+        """set() for async callers: the persistent tier is written on the cache executor."""
+        self.memory.set(key, value, ttl_seconds)
+        if self.persistent is not None:
+            await cache_io.run(self._write_persistent, key, value, ttl_seconds)
+
+    def _promote(self, key: str, value):
+        self.persistent_hits += 1
+        self.memory.set(key, value)
+        return value
+
+    def _read_persistent(self, key: str):
+        try:
+            return self.persistent.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent tier of cache '{self.name}' failed on read: {e}")
+            return None
+
+    def _write_persistent(self, key: str, value, ttl_seconds: float | None):
+        try:
+            self.persistent.set(key, value, self.memory.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent tier of cache '{self.name}' failed on write: {e}")
+
+    def invalidate(self, key: str):
+        self.memory.pop(key)
+        if self.persistent is not None:
+            self.persistent.delete(key)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        return {
+            "name": self.name,
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.persistent_hits) / lookups if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "persistent_entries": len(self.persistent) if self.persistent is not None else None,
+        }
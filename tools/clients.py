@@ -0,0 +1,109 @@
+# tools/clients.py
+
+import os
+import time
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# --- Client Warm-up ---
+# "background" - start building every client concurrently at startup, without delaying it.
+# "blocking"   - finish building them before the app accepts connections.
+# "off"        - build each client only on first use.
+CLIENT_WARMUP = os.getenv("CLIENT_WARMUP", "background").lower()
+
+
+class LazyClient:
+    """
+    Builds an SDK client on first use instead of at import time. Attribute access is
+    forwarded to the client, so `lazy.models.generate(...)` works like the real thing.
+    Creation is thread-safe and happens once; a failed creation is retried on next use.
+    Async code uses `await lazy.aget()` so a slow build never blocks the event loop.
+    """
+
+    def __init__(self, name: str, factory):
+        self._name = name
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+        self.init_seconds: float | None = None
+        self.error: str | None = None
+
+    @property
+    def initialized(self) -> bool:
+        return self._client is not None
+
+    def get(self):
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if self._client is None:
+                started = time.perf_counter()
+                try:
+                    client = self._factory()
+                except Exception as e:
+                    self.error = str(e)
+                    logger.error(f"Failed to initialize {self._name} client: {e}")
+                    raise
+                self.init_seconds = time.perf_counter() - started
+                self.error = None
+                self._client = client
+                logger.info(f"Initialized {self._name} client in {self.init_seconds * 1000:.0f} ms.")
+        return self._client
+
+    async def aget(self):
+        """get() for async callers: a build (or a wait for the warm-up's build) runs in a thread, off the event loop."""
+        if self._client is not None:
+            return self._client
+        return await asyncio.to_thread(self.get)
+
+    def __getattr__(self, attribute: str):
+        if attribute.startswith("__"):
+            raise AttributeError(attribute)  # keep copy/pickle/introspection from building the client
+        return getattr(self.get(), attribute)
+
+    def stats(self) -> dict:
+        return {
+            "initialized": self.initialized,
+            "init_ms": round(self.init_seconds * 1000, 1) if self.init_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+class ClientRegistry:
+    """The process's lazily created clients, warmed concurrently on startup."""
+
+    def __init__(self):
+        self.clients: dict[str, LazyClient] = {}
+        self.warmup_seconds: float | None = None
+
+    def register(self, name: str, factory) -> LazyClient:
+        client = LazyClient(name, factory)
+        self.clients[name] = client
+        return client
+
+    async def warm_all(self):
+        """Builds every registered client in parallel threads; failures are logged, not raised."""
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(asyncio.to_thread(client.get) for client in self.clients.values()),
+            return_exceptions=True,
+        )
+        self.warmup_seconds = time.perf_counter() - started
+        failed = [name for name, result in zip(self.clients, results) if isinstance(result, Exception)]
+        logger.info(
+            f"Warmed {len(self.clients) - len(failed)}/{len(self.clients)} clients in {self.warmup_seconds * 1000:.0f} ms"
+            + (f"; failed: {', '.join(failed)}." if failed else ".")
+        )
+
+    def stats(self) -> dict:
+        return {
+            "warmup": CLIENT_WARMUP,
+            "warmup_ms": round(self.warmup_seconds * 1000, 1) if self.warmup_seconds is not None else None,
+            "clients": {name: client.stats() for name, client in self.clients.items()},
+        }
+
+
+clients = ClientRegistry()
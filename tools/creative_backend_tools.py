@@ -1,11 +1,15 @@
 # tools/creative_backend_tools.py
 import os
+import re
+import json
+import hashlib
 import logging
+import unicodedata
 import uuid
 import time
 import io
 import base64
-import tempfile
+import asyncio
 import datetime
 
 # Initialize logger right after importing logging
@@ -28,12 +32,15 @@ from google.genai.types import (
 )
 from google.api_core.exceptions import GoogleAPIError
 
-# Google Cloud Storage imports
-from google.cloud import storage
-
 # For environment variables
 from dotenv import load_dotenv
 
+from tools.cache import TieredCache, SQLiteCacheTier
+from tools.clients import clients
+from tools.tracing import trace_span
+from tools.io_pool import size_http_pool, GCS_IO_MAX_WORKERS
+from tools.media_store import MEDIA_STORE_BACKEND, GCSMediaStore, LocalMediaStore
+
 # For image format detection (used in image-to-video, optional)
 try:
     from PIL import Image as PILImage
@@ -46,24 +53,37 @@ except ImportError:
 load_dotenv()
 
 # --- GCS Configuration and Client Initialization ---
-try:
-    GCP_BUCKET_NAME = os.getenv("GCP_BUCKET_NAME")
+GCP_BUCKET_NAME = os.getenv("GCP_BUCKET_NAME")
+GCS_OUTPUT_PREFIX = os.getenv("OUTPUT_GCS_URI", "gs://").split("gs://", 1)[-1].split("/", 1)[-1].strip("/")
+if GCS_OUTPUT_PREFIX:
+    GCS_OUTPUT_PREFIX += "/"
+else:
+    GCS_OUTPUT_PREFIX = "generated_videos/"
+
+# Clients are created on first use (or by the startup warm-up in main.py), not at
+# import time; see tools/clients.py. Missing configuration surfaces as an error on
+# first use instead of failing the import.
+def _create_gcs_bucket():
+    # Imported here: google.cloud.storage is slow to import and only needed for the gcs store.
+    from google.cloud import storage
+
     if not GCP_BUCKET_NAME:
         raise ValueError("GCP_BUCKET_NAME environment variable not set.")
     storage_client = storage.Client()
-    bucket = storage_client.bucket(GCP_BUCKET_NAME)
-    GCS_OUTPUT_PREFIX = os.getenv("OUTPUT_GCS_URI", "gs://").split("gs://", 1)[-1].split("/", 1)[-1].strip("/")
-    if GCS_OUTPUT_PREFIX:
-        GCS_OUTPUT_PREFIX += "/"
-    else:
-        GCS_OUTPUT_PREFIX = "generated_videos/"
+    # One pooled connection per GCS I/O worker thread.
+    size_http_pool(storage_client._http, GCS_IO_MAX_WORKERS)
     logger.info(f"Initialized GCS client for bucket: {GCP_BUCKET_NAME} with prefix: {GCS_OUTPUT_PREFIX}")
-except Exception as e:
-    logger.error(f"Failed to initialize GCS client: {e}")
-    raise
+    return storage_client.bucket(GCP_BUCKET_NAME)
+
+
+bucket = clients.register("gcs", _create_gcs_bucket) if MEDIA_STORE_BACKEND == "gcs" else None
+
+# All generated media and place photos are written through this store.
+media_store = GCSMediaStore(bucket, GCP_BUCKET_NAME) if bucket is not None else LocalMediaStore()
+logger.info(f"Using '{media_store.name}' media store.")
 
 # --- GenAI Client Initialization ---
-try:
+def _create_genai_client():
     # NOTE: With the public URL method, you no longer need the GOOGLE_APPLICATION_CREDENTIALS
     # environment variable for this specific function, as signing is not required.
     # The default credentials from the environment are sufficient.
@@ -75,35 +95,95 @@ try:
         raise ValueError("GOOGLE_PROJECT_ID or LOCATION environment variables not set.")
 
     if GOOGLE_API_KEY:
-        genai_client = genai.Client(api_key=GOOGLE_API_KEY)
-        logger.info("Initialized GenAI client with API Key.")
-    else:
-        genai_client = genai.Client(
-            vertexai=True,
-            project=GOOGLE_PROJECT_ID,
-            location=LOCATION
-        )
-        logger.info(f"Initialized GenAI client with ADC, routed to Vertex AI project: {GOOGLE_PROJECT_ID}, location: {LOCATION}.")
+        logger.info("Initializing GenAI client with API Key.")
+        return genai.Client(api_key=GOOGLE_API_KEY)
+    logger.info(f"Initializing GenAI client with ADC, routed to Vertex AI project: {GOOGLE_PROJECT_ID}, location: {LOCATION}.")
+    return genai.Client(
+        vertexai=True,
+        project=GOOGLE_PROJECT_ID,
+        location=LOCATION
+    )
+
+
+genai_client = clients.register("genai", _create_genai_client)
+
+# --- Blocking I/O Offloading ---
+# GenAI calls go through the async client (`genai_client.aio`). The storage client is
+# synchronous, so its calls run on the shared, bounded GCS executor (tools.io_pool)
+# instead of the event loop that serves every WebSocket session.
+VEO_POLL_INTERVAL_SECONDS = float(os.getenv("VEO_POLL_INTERVAL_SECONDS", "15"))
+
+# --- Generated Image Cache ---
+# Maps normalized prompt + model + config to the public URL of an image that was
+# already generated, so repeated prompts skip both Imagen and the GCS upload.
+# Set IMAGE_CACHE_SQLITE_PATH to keep the mapping across restarts.
+IMAGEN_MODEL = "imagen-3.0-generate-002"
+IMAGEN_CONFIG = {"number_of_images": 1, "aspect_ratio": "1:1"}
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "1024"))
+IMAGE_CACHE_TTL_SECONDS = float(os.getenv("IMAGE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Local media does not survive a restart, so only GCS-backed URLs are persisted.
+IMAGE_CACHE_SQLITE_PATH = os.getenv("IMAGE_CACHE_SQLITE_PATH") if media_store.name == "gcs" else None
+
+image_prompt_cache = TieredCache(
+    "image_prompts",
+    max_entries=IMAGE_CACHE_MAX_ENTRIES,
+    ttl_seconds=IMAGE_CACHE_TTL_SECONDS,
+    persistent=SQLiteCacheTier(IMAGE_CACHE_SQLITE_PATH, table="image_prompts") if IMAGE_CACHE_SQLITE_PATH else None,
+)
+# Identical prompts that arrive while a generation is running share its result.
+_inflight_image_generations: dict[str, asyncio.Future] = {}
+
 
-except Exception as e:
-    logger.error(f"Failed to initialize GenAI client: {e}")
-    raise
+def normalize_prompt(prompt: str) -> str:
+    """Case-folds, collapses whitespace and drops trailing punctuation."""
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(".!?,;: ")
+
+
+def image_cache_key(prompt: str, model: str = IMAGEN_MODEL, config: dict = IMAGEN_CONFIG) -> str:
+    payload = json.dumps([normalize_prompt(prompt), model, config], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
 # --- Core API Call Functions (These are now just regular async functions) ---
 
 async def call_generate_image_api(prompt: str) -> str:
-    """Calls Imagen model for image generation and returns a simple, public GCS URL."""
+    """
+    Returns a public GCS URL for an image of the prompt, reusing a cached image
+    for repeated prompts and calling Imagen only on a cache miss.
+    """
+    cache_key = image_cache_key(prompt)
+    cached_url = await image_prompt_cache.aget(cache_key)
+    if cached_url:
+        logger.info(f"Image cache hit for prompt '{prompt}': {cached_url}")
+        return cached_url
+
+    inflight = _inflight_image_generations.get(cache_key)
+    if inflight is None:
+        inflight = asyncio.ensure_future(_generate_and_cache_image(prompt, cache_key))
+        _inflight_image_generations[cache_key] = inflight
+        inflight.add_done_callback(lambda _: _inflight_image_generations.pop(cache_key, None))
+    # Shield so one cancelled caller does not cancel the generation for the others.
+    return await asyncio.shield(inflight)
+
+
+async def _generate_and_cache_image(prompt: str, cache_key: str) -> str:
+    public_url = await _generate_and_upload_image(prompt, f"generated_images/{cache_key}.jpg")
+    await image_prompt_cache.aset(cache_key, public_url)
+    return public_url
+
+
+async def _generate_and_upload_image(prompt: str, file_name: str) -> str:
+    """Calls Imagen model for image generation and returns a public URL from the media store."""
     try:
         logger.debug(f"Calling GenAI generate_images (Imagen 3) with prompt: '{prompt}'")
-        response = genai_client.models.generate_images(
-            model="imagen-3.0-generate-002",
-            prompt=prompt,
-            config=GenerateImagesConfig(
-                number_of_images=1,
-                aspect_ratio="1:1",
+        async with trace_span("imagen.generate_images"):
+            response = await (await genai_client.aget()).aio.models.generate_images(
+                model=IMAGEN_MODEL,
+                prompt=prompt,
+                config=GenerateImagesConfig(**IMAGEN_CONFIG)
             )
-        )
 
         if not response.generated_images:
             raise ValueError("No images generated by the API.")
@@ -111,11 +191,8 @@ async def call_generate_image_api(prompt: str) -> str:
         image_bytes = response.generated_images[0].image.image_bytes
         mime_type = response.generated_images[0].image.mime_type or "image/jpeg"
 
-        file_name = f"generated_images/{uuid.uuid4()}.jpg"
-        blob = bucket.blob(file_name)
-        blob.upload_from_string(image_bytes, content_type=mime_type)
-        gcs_uri = f"gs://{bucket.name}/{file_name}"
-        logger.info(f"Generated image saved to GCS: {gcs_uri}")
+        public_url = await media_store.put_bytes(file_name, image_bytes, mime_type)
+        logger.info(f"Generated image saved to media store: {media_store.storage_uri(file_name)}")
 
         # ### OLD CODE (for Signed URL) ###
         # # This logic required a service account key for signing.
@@ -128,9 +205,8 @@ async def call_generate_image_api(prompt: str) -> str:
         # return signed_url
         
         # ### NEW CODE (for Public URL) ###
-        # Construct the simple public URL string directly. This requires the object/bucket
-        # to be publicly accessible.
-        public_url = f"https://storage.mtls.cloud.google.com/{bucket.name}/{file_name}"
+        # The media store returns a plain public URL. For GCS this requires the
+        # object/bucket to be publicly accessible.
         logger.info(f"Generated public URL: {public_url}")
         return public_url
 
@@ -143,10 +219,8 @@ async def call_edit_image_api(reference_image_path: str, prompt: str) -> str:
     try:
         logger.debug(f"Calling GenAI edit_image (Imagen 3) for: '{reference_image_path}' with prompt: '{prompt}'")
 
-        blob_path = reference_image_path.replace(f"gs://{bucket.name}/", "")
-        blob = bucket.blob(blob_path)
-        image_bytes_from_gcs = blob.download_as_bytes()
-        image_mime_type_from_gcs = blob.content_type or "image/jpeg"
+        object_name = media_store.object_name_from_uri(reference_image_path)
+        image_bytes_from_gcs, image_mime_type_from_gcs = await media_store.get_bytes(object_name)
 
         base_genai_image = GenAIImage(
             image_bytes=image_bytes_from_gcs,
@@ -166,17 +240,18 @@ async def call_edit_image_api(reference_image_path: str, prompt: str) -> str:
         except Exception as ref_err:
             logger.warning(f"Could not create SubjectReferenceImage for editing (will try without it): {ref_err}")
 
-        response = genai_client.models.edit_image(
-            model=model_name,
-            base_image=base_genai_image,
-            prompt=prompt,
-            config=EditImageConfig(
-                number_of_images=1,
-                edit_mode=EditMode.DEFAULT,
-                reference_images=reference_images_list,
-                safety_filter_level="BLOCK_MOST",
+        async with trace_span("imagen.edit_image"):
+            response = await (await genai_client.aget()).aio.models.edit_image(
+                model=model_name,
+                base_image=base_genai_image,
+                prompt=prompt,
+                config=EditImageConfig(
+                    number_of_images=1,
+                    edit_mode=EditMode.DEFAULT,
+                    reference_images=reference_images_list,
+                    safety_filter_level="BLOCK_MOST",
+                )
             )
-        )
 
         if not response.edited_images:
             raise ValueError("No images edited by the API.")
@@ -185,69 +260,103 @@ async def call_edit_image_api(reference_image_path: str, prompt: str) -> str:
         edited_mime_type = response.edited_images[0].image.mime_type or "image/jpeg"
 
         file_name = f"edited_images/{uuid.uuid4()}.jpg"
-        blob = bucket.blob(file_name)
-        blob.upload_from_string(edited_image_bytes, content_type=edited_mime_type)
-        gcs_uri = f"gs://{bucket.name}/{file_name}"
-        logger.info(f"Edited image saved to GCS: {gcs_uri}")
-        return gcs_uri
+        await media_store.put_bytes(file_name, edited_image_bytes, edited_mime_type)
+        storage_uri = media_store.storage_uri(file_name)
+        logger.info(f"Edited image saved to media store: {storage_uri}")
+        return storage_uri
 
     except Exception as e:
         logger.error(f"Failed to edit image via GenAI API: {e}")
         raise
 
 
+def public_url_for_storage_uri(storage_uri: str) -> str:
+    """Turns a gs:// (or local media://) link into the public URL the browser can load."""
+    return media_store.public_url_for_uri(storage_uri)
+
+
+async def start_video_operation(prompt: str, image_bytes: bytes | None = None, image_mime_type: str | None = None, negative_prompt: str = "ugly, low quality", aspect_ratio: str = "16:9", duration_seconds: int = 8):
+    """Submits a Veo generation request and returns the (not yet finished) operation."""
+    image_kwargs = {}
+    if image_bytes:
+        image_kwargs["image"] = GenAIImage(image_bytes=image_bytes, mime_type=image_mime_type)
+    config = GenerateVideosConfig(
+        aspect_ratio=aspect_ratio,
+        number_of_videos=1,
+        negative_prompt=negative_prompt,
+        duration_seconds=duration_seconds,
+    )
+    client = await genai_client.aget()
+    if client.vertexai and media_store.name == "gcs":
+        # Vertex AI can write the video straight into our bucket, so no bytes pass through us.
+        config.output_gcs_uri = f"gs://{GCP_BUCKET_NAME}/{GCS_OUTPUT_PREFIX}"
+    return await client.aio.models.generate_videos(
+        model="veo-3.0-generate-preview",
+        prompt=prompt,
+        config=config,
+        **image_kwargs,
+    )
+
+
+async def refresh_video_operation(operation):
+    """Fetches the latest state of a Veo operation."""
+    return await (await genai_client.aget()).aio.operations.get(operation)
+
+
+async def _wait_for_video_operation(operation, label: str):
+    """Polls a Veo operation without blocking the event loop."""
+    while not operation.done:
+        logger.info(f"Veo {label} operation not done yet, waiting...")
+        await asyncio.sleep(VEO_POLL_INTERVAL_SECONDS)
+        operation = await refresh_video_operation(operation)
+    return operation
+
+
+async def store_generated_video(operation) -> str:
+    """Stores the finished Veo video in the media store (if Veo has not already) and returns its storage URI."""
+    if operation.response and operation.result.generated_videos:
+        generated_video_obj = operation.result.generated_videos[0]
+        video = generated_video_obj.video
+        if not isinstance(video, GenAIVideo) or not (video.uri or video.video_bytes):
+            raise ValueError("Generated video object structure unexpected or missing URI for download.")
+
+        if video.uri and video.uri.startswith("gs://"):
+            logger.info(f"Video already written to GCS by Veo: {video.uri}")
+            return video.uri
+
+        if not video.video_bytes:
+            logger.info(f"Attempting client.files.download for URI: {video.uri}")
+            await (await genai_client.aget()).aio.files.download(file=video)
+
+        video_mime_type = getattr(video, "mime_type", None) or "video/mp4"
+        suffix = f'.{video_mime_type.split("/")[-1]}' if isinstance(video_mime_type, str) and "/" in video_mime_type else ".mp4"
+
+        # GCS receives zero-copy slices of the downloaded bytes in resumable chunks; no temp file.
+        file_name = f"{GCS_OUTPUT_PREFIX}{uuid.uuid4()}{suffix}"
+        await media_store.put_bytes(file_name, video.video_bytes, video_mime_type)
+        storage_uri = media_store.storage_uri(file_name)
+        logger.info(f"Video uploaded to media store: {storage_uri}")
+        return storage_uri
+
+    elif operation.error:
+        raise GoogleAPIError(operation.error.message)
+    else:
+        raise ValueError("Video generation completed with unexpected final state.")
+
+
 async def call_generate_video_from_text_api(prompt: str, negative_prompt: str = "ugly, low quality", aspect_ratio: str = "16:9", duration_seconds: int = 8) -> str:
     """Calls Veo 2 model for video generation from text using google.generativeai."""
     logger.debug(f"Calling Veo 2 (text-to-video) for prompt: '{prompt}'")
     try:
-        operation = genai_client.models.generate_videos(
-            model="veo-3.0-generate-preview",
+        operation = await start_video_operation(
             prompt=prompt,
-            config=GenerateVideosConfig(
-                aspect_ratio=aspect_ratio,
-                number_of_videos=1,
-                negative_prompt=negative_prompt,
-                duration_seconds=duration_seconds,
-            ),
+            negative_prompt=negative_prompt,
+            aspect_ratio=aspect_ratio,
+            duration_seconds=duration_seconds,
         )
 
-        while not operation.done:
-            logger.info("Veo text-to-video operation not done yet, waiting...")
-            time.sleep(15)
-            operation = genai_client.operations.get(operation.name)
-
-        if operation.response and operation.result.generated_videos:
-            generated_video_obj = operation.result.generated_videos[0]
-            if not isinstance(generated_video_obj.video, GenAIVideo) or not generated_video_obj.video.uri:
-                raise ValueError("Generated video object structure unexpected or missing URI for download.")
-
-            logger.info(f"Attempting client.files.download for URI: {generated_video_obj.video.uri}")
-            genai_client.files.download(file=generated_video_obj.video)
-
-            video_mime_type = getattr(generated_video_obj.video, "mime_type", "video/mp4")
-            suffix = f'.{video_mime_type.split("/")[-1]}' if isinstance(video_mime_type, str) and "/" in video_mime_type else ".mp4"
-
-            temp_file_path = None
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                    temp_file_path = temp_file.name
-                generated_video_obj.video.save(temp_file_path)
-                logger.info(f"Video saved to temporary file: {temp_file_path}")
-
-                gcs_file_name = f"{GCS_OUTPUT_PREFIX}{uuid.uuid4()}{suffix}"
-                blob = bucket.blob(gcs_file_name)
-                blob.upload_from_filename(temp_file_path, content_type=video_mime_type)
-                gcs_link = f"gs://{bucket.name}/{gcs_file_name}"
-                logger.info(f"Video uploaded to GCS: {gcs_link}")
-                return gcs_link
-            finally:
-                if temp_file_path and os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
-
-        elif operation.error:
-            raise GoogleAPIError(operation.error.message)
-        else:
-            raise ValueError("Video generation completed with unexpected final state.")
+        operation = await _wait_for_video_operation(operation, "text-to-video")
+        return await store_generated_video(operation)
 
     except GoogleAPIError as api_err:
         logger.error(f"Google API Error during text video generation: {api_err.message}")
@@ -260,60 +369,17 @@ async def call_generate_video_from_image_api(image_bytes: bytes, image_mime_type
     """Calls Veo 2 model for video generation from an image using google.generativeai."""
     logger.debug(f"Calling Veo 2 (image-to-video) for image ({image_mime_type}) and prompt: '{prompt}'")
     try:
-        genai_image = GenAIImage(
-            image_bytes=image_bytes,
-            mime_type=image_mime_type,
-        )
-
-        operation = genai_client.models.generate_videos(
-            model="veo-3.0-generate-preview",
-            image=genai_image,
+        operation = await start_video_operation(
             prompt=prompt,
-            config=GenerateVideosConfig(
-                aspect_ratio=aspect_ratio,
-                number_of_videos=1,
-                negative_prompt=negative_prompt,
-                duration_seconds=duration_seconds,
-            ),
+            image_bytes=image_bytes,
+            image_mime_type=image_mime_type,
+            negative_prompt=negative_prompt,
+            aspect_ratio=aspect_ratio,
+            duration_seconds=duration_seconds,
         )
 
-        while not operation.done:
-            logger.info("Veo image-to-video operation not done yet, waiting...")
-            time.sleep(15)
-            operation = genai_client.operations.get(operation.name)
-
-        if operation.response and operation.result.generated_videos:
-            generated_video_obj = operation.result.generated_videos[0]
-            if not isinstance(generated_video_obj.video, GenAIVideo) or not generated_video_obj.video.uri:
-                raise ValueError("Generated video object structure unexpected or missing URI for download.")
-
-            logger.info(f"Attempting client.files.download for URI: {generated_video_obj.video.uri}")
-            genai_client.files.download(file=generated_video_obj.video)
-
-            video_mime_type = getattr(generated_video_obj.video, "mime_type", "video/mp4")
-            suffix = f'.{video_mime_type.split("/")[-1]}' if isinstance(video_mime_type, str) and "/" in video_mime_type else ".mp4"
-
-            temp_file_path = None
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                    temp_file_path = temp_file.name
-                generated_video_obj.video.save(temp_file_path)
-                logger.info(f"Video saved to temporary file: {temp_file_path}")
-
-                gcs_file_name = f"{GCS_OUTPUT_PREFIX}{uuid.uuid4()}{suffix}"
-                blob = bucket.blob(gcs_file_name)
-                blob.upload_from_filename(temp_file_path, content_type=video_mime_type)
-                gcs_link = f"gs://{bucket.name}/{gcs_file_name}"
-                logger.info(f"Video uploaded to GCS: {gcs_link}")
-                return gcs_link
-            finally:
-                if temp_file_path and os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
-
-        elif operation.error:
-            raise GoogleAPIError(operation.error.message)
-        else:
-            raise ValueError("Video generation completed with unexpected final state.")
+        operation = await _wait_for_video_operation(operation, "image-to-video")
+        return await store_generated_video(operation)
 
     except GoogleAPIError as api_err:
         logger.error(f"Google API Error during image video generation: {api_err.message}")
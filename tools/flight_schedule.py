@@ -0,0 +1,353 @@
+# tools/flight_schedule.py
+
+import os
+import csv
+import logging
+import datetime
+
+import numpy as np
+
+from tools.clients import clients
+from tools.place_index import PlaceIndex
+
+logger = logging.getLogger(__name__)
+
+# --- Flight Schedule ---
+# Flights are held in NumPy columns sorted by (origin, destination, date, departure),
+# so every (origin, destination, date) is one contiguous slice found with two binary
+# searches. Filters on departure window and price are vectorized over the slice, and
+# round trips pair only the cheapest/fastest few legs of each side instead of every
+# outbound with every return.
+#
+# FLIGHT_SCHEDULE_PATH loads a .npz (written by save_schedule / the benchmark's
+# --write-fixture), .csv or .parquet file with the columns
+#   airline, flight_number (the code as shown, e.g. 6E-2041), origin, destination, date (YYYY-MM-DD),
+#   depart_time (HH:MM), duration_minutes, price  and optionally  origin_code, destination_code
+# Without a file a synthetic schedule is generated for SYNTHETIC_CITIES over the next
+# FLIGHT_SCHEDULE_DAYS days (same seed, same flights).
+FLIGHT_SCHEDULE_PATH = os.getenv("FLIGHT_SCHEDULE_PATH")
+FLIGHT_SCHEDULE_DAYS = int(os.getenv("FLIGHT_SCHEDULE_DAYS", "180"))
+FLIGHT_SCHEDULE_SEED = int(os.getenv("FLIGHT_SCHEDULE_SEED", "7"))
+SORT_PRICE = "price"
+SORT_DURATION = "duration"
+MINUTES_PER_DAY = 24 * 60
+
+AIRLINES = ["Indigo", "Vistara", "Air India", "SpiceJet", "Emirates",
+            "Singapore Airlines", "Qatar Airways", "Lufthansa", "British Airways"]
+SYNTHETIC_CITIES = [
+    ("Delhi", "DEL"), ("Mumbai", "BOM"), ("Bengaluru", "BLR"), ("Chennai", "MAA"), ("Kolkata", "CCU"),
+    ("Hyderabad", "HYD"), ("Goa", "GOI"), ("Kochi", "COK"), ("Dubai", "DXB"), ("Doha", "DOH"),
+    ("Singapore", "SIN"), ("Bangkok", "BKK"), ("Tokyo", "HND"), ("Okinawa", "OKA"), ("Bali", "DPS"),
+    ("London", "LHR"), ("Paris", "CDG"), ("Frankfurt", "FRA"), ("Rome", "FCO"), ("New York", "JFK"),
+]
+# Alternative names the agent may pass for the synthetic cities.
+SYNTHETIC_CITY_ALIASES = {"Delhi": "new delhi", "Bengaluru": "bangalore", "Mumbai": "bombay", "Chennai": "madras",
+                          "Kolkata": "calcutta", "Okinawa": "naha", "Bali": "denpasar", "New York": "nyc"}
+AIRLINES_PER_ROUTE = 3
+# Synthetic flight numbers are <airline prefix>-100 .. -999.
+SYNTHETIC_FLIGHT_NUMBERS = range(100, 1000)
+_COLUMNS = ("origin", "destination", "day", "depart", "duration", "price", "airline", "code")
+
+
+def parse_date(text: str) -> datetime.date | None:
+    """Parses the date forms the agent passes (ISO first); None if empty or unparseable."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    try:
+        return datetime.date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%d %B %Y", "%B %d %Y", "%d %b %Y", "%b %d %Y"):
+        try:
+            return datetime.datetime.strptime(text.replace(",", ""), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_minutes(text: str) -> int | None:
+    """'HH:MM' -> minutes after midnight; None if empty or unparseable."""
+    try:
+        hours, minutes = (text or "").strip().split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+
+
+def _hhmm(minutes: int) -> str:
+    minutes = int(minutes) % MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class FlightSchedule:
+    """
+    A columnar flight schedule. `cities`, `airlines` and `flight_codes` are the
+    display names the integer origin/destination/airline/code columns refer to
+    (`flight_codes` defaults to the synthetic generator's); `day` is a date ordinal.
+    """
+
+    def __init__(self, cities: list[str], airlines: list[str], columns: dict[str, np.ndarray], city_codes: list[str] | None = None,
+                 flight_codes: list[str] | None = None):
+        self.cities = list(cities)
+        self.city_codes = list(city_codes) if city_codes else [""] * len(self.cities)
+        self.airlines = list(airlines)
+        self.flight_codes = list(flight_codes) if flight_codes is not None else synthetic_flight_codes(self.airlines)
+        order = np.lexsort((columns["depart"], columns["day"], columns["destination"], columns["origin"]))
+        self.origin = columns["origin"][order].astype(np.int32)
+        self.destination = columns["destination"][order].astype(np.int32)
+        self.day = columns["day"][order].astype(np.int32)
+        self.depart = columns["depart"][order].astype(np.int16)
+        self.duration = columns["duration"][order].astype(np.int16)
+        self.price = columns["price"][order].astype(np.int32)
+        self.airline = columns["airline"][order].astype(np.int16)
+        self.code = columns["code"][order].astype(np.int32)
+        self.first_day = int(self.day.min()) if len(self.day) else 0
+        self.day_span = int(self.day.max()) - self.first_day + 1 if len(self.day) else 1
+        # One sorted int64 key per row: a route-day is the run of equal keys.
+        self._keys = self._key(self.origin.astype(np.int64), self.destination.astype(np.int64), self.day.astype(np.int64))
+
+        self.index = PlaceIndex()
+        for city_id, city in enumerate(self.cities):
+            self.index.add(city, city_id, primary=True)
+            if self.city_codes[city_id]:
+                self.index.add(self.city_codes[city_id], city_id)
+            if city in SYNTHETIC_CITY_ALIASES:
+                self.index.add(SYNTHETIC_CITY_ALIASES[city], city_id)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _key(self, origin, destination, day):
+        return (origin * len(self.cities) + destination) * self.day_span + (day - self.first_day)
+
+    def resolve_city(self, name: str) -> int | None:
+        return self.index.resolve(name)
+
+    def legs(self, origin: int, destination: int, date: datetime.date) -> np.ndarray:
+        """Row indices of every flight on the route that day, by departure time."""
+        day = date.toordinal()
+        if not self.first_day <= day < self.first_day + self.day_span:
+            return np.empty(0, dtype=np.int64)
+        key = self._key(origin, destination, day)
+        start, end = np.searchsorted(self._keys, [key, key + 1])
+        return np.arange(start, end)
+
+    def filter(self, rows: np.ndarray, depart_after: int | None = None, depart_before: int | None = None, max_price: int = 0) -> np.ndarray:
+        if depart_after is None and depart_before is None and max_price <= 0:
+            return rows
+        mask = np.ones(len(rows), dtype=bool)
+        if depart_after is not None:
+            mask &= self.depart[rows] >= depart_after
+        if depart_before is not None:
+            mask &= self.depart[rows] <= depart_before
+        if max_price > 0:
+            mask &= self.price[rows] <= max_price
+        return rows[mask]
+
+    def _cost(self, rows: np.ndarray, sort_by: str) -> np.ndarray:
+        return (self.duration[rows] if sort_by == SORT_DURATION else self.price[rows]).astype(np.int64)
+
+    def _best(self, rows: np.ndarray, cost: np.ndarray, k: int) -> np.ndarray:
+        """The k rows of lowest cost, in order (ties by price, then departure)."""
+        k = max(1, k)
+        if len(rows) > k:
+            keep = np.argpartition(cost, k - 1)[:k]
+            rows, cost = rows[keep], cost[keep]
+        order = np.lexsort((self.depart[rows], self.price[rows], cost))
+        return rows[order]
+
+    def one_way(self, origin: int, destination: int, date: datetime.date, top_k: int = 4, sort_by: str = SORT_PRICE,
+                max_price: int = 0, depart_after: int | None = None, depart_before: int | None = None) -> list[int]:
+        rows = self.filter(self.legs(origin, destination, date), depart_after, depart_before, max_price)
+        return self._best(rows, self._cost(rows, sort_by), top_k).tolist()
+
+    def round_trip(self, origin: int, destination: int, date: datetime.date, return_date: datetime.date, top_k: int = 4,
+                   sort_by: str = SORT_PRICE, max_price: int = 0, depart_after: int | None = None,
+                   depart_before: int | None = None, same_airline: bool = False) -> list[tuple[int, int]]:
+        """
+        The top_k (outbound, return) pairs by total price or total flying time. The
+        total is a sum of leg costs, so the best k pairs only use each side's best k
+        legs (per airline with same_airline): pairing is k x k, not every outbound
+        with every return. Constraints that couple the two legs - a same-day return
+        must leave after the outbound lands, a price cap while sorting by duration -
+        break that shortcut, so those pair every leg.
+        """
+        outbound = self.filter(self.legs(origin, destination, date), depart_after, depart_before, max_price)
+        inbound = self.filter(self.legs(destination, origin, return_date), max_price=max_price)
+        same_day = return_date == date
+        prune = not same_day and not (max_price > 0 and sort_by == SORT_DURATION)
+        if same_airline:
+            groups = [(outbound[self.airline[outbound] == airline], inbound[self.airline[inbound] == airline])
+                      for airline in np.intersect1d(self.airline[outbound], self.airline[inbound])]
+        else:
+            groups = [(outbound, inbound)]
+
+        candidates_out, candidates_in, totals = [], [], []
+        for legs_out, legs_in in groups:
+            if prune:
+                legs_out = self._best(legs_out, self._cost(legs_out, sort_by), top_k)
+                legs_in = self._best(legs_in, self._cost(legs_in, sort_by), top_k)
+            total = self._cost(legs_out, sort_by)[:, None] + self._cost(legs_in, sort_by)[None, :]
+            out_index, in_index = np.indices(total.shape).reshape(2, -1)
+            if max_price > 0 or same_day:
+                valid = np.ones(total.shape, dtype=bool)
+                if max_price > 0:
+                    valid &= (self.price[legs_out][:, None] + self.price[legs_in][None, :]) <= max_price
+                if same_day:
+                    lands = self.depart[legs_out].astype(np.int32) + self.duration[legs_out]
+                    valid &= self.depart[legs_in][None, :] > lands[:, None]
+                out_index, in_index = np.nonzero(valid)
+            candidates_out.append(legs_out[out_index])
+            candidates_in.append(legs_in[in_index])
+            totals.append(total[out_index, in_index])
+        if not totals:
+            return []
+        if len(totals) == 1:
+            legs_out, legs_in, total = candidates_out[0], candidates_in[0], totals[0]
+        else:
+            legs_out, legs_in, total = np.concatenate(candidates_out), np.concatenate(candidates_in), np.concatenate(totals)
+        top_k = max(1, top_k)
+        if len(total) > top_k:
+            keep = np.argpartition(total, top_k - 1)[:top_k]
+            legs_out, legs_in, total = legs_out[keep], legs_in[keep], total[keep]
+        order = np.lexsort((self.depart[legs_out], total))
+        return list(zip(legs_out[order].tolist(), legs_in[order].tolist()))
+
+    def flight_code(self, row: int) -> str:
+        return self.flight_codes[self.code[row]]
+
+    def leg_dict(self, row: int) -> dict:
+        return {
+            "flight_number": self.flight_code(row),
+            "from": self.cities[self.origin[row]],
+            "to": self.cities[self.destination[row]],
+            "depart_time": _hhmm(self.depart[row]),
+            "arrive_time": _hhmm(int(self.depart[row]) + int(self.duration[row])),
+        }
+
+    def leg_key(self, row: int) -> str:
+        """
+        A stable identity of one flight: route, date, departure, airline and code.
+        Flight codes alone are not unique - the same code can fly several routes.
+        """
+        date = datetime.date.fromordinal(int(self.day[row])).isoformat()
+        return (f"{self.cities[self.origin[row]]}>{self.cities[self.destination[row]]}:"
+                f"{date}T{_hhmm(self.depart[row])}:{self.airlines[self.airline[row]]}:{self.flight_code(row)}")
+
+    def stats(self) -> dict:
+        return {
+            "flights": len(self),
+            "cities": len(self.cities),
+            "first_date": datetime.date.fromordinal(self.first_day).isoformat() if len(self) else None,
+            "days": self.day_span,
+        }
+
+
+def synthetic_columns(cities: int, days: int, start: datetime.date, flights_per_route_day: float = 6.0, airlines: int = len(AIRLINES),
+                      seed: int = FLIGHT_SCHEDULE_SEED) -> dict[str, np.ndarray]:
+    """
+    A reproducible synthetic schedule: every ordered city pair flies on every day,
+    with a Poisson number of flights whose duration and price grow with a random
+    route distance. Each route is served by the same few airlines both ways.
+    """
+    rng = np.random.default_rng(seed)
+    origin, destination = np.nonzero(~np.eye(cities, dtype=bool))
+    distance = rng.uniform(1.0, 9.0, (cities, cities))
+    distance = (distance + distance.T) / 2  # same distance both ways
+    route_airlines = rng.integers(0, airlines, (cities, cities, AIRLINES_PER_ROUTE))
+    route_airlines = np.where(np.arange(cities)[:, None, None] < np.arange(cities)[None, :, None],
+                              route_airlines, route_airlines.transpose(1, 0, 2))
+    route_day_flights = rng.poisson(flights_per_route_day, (len(origin), days))
+    route, day = np.nonzero(route_day_flights)
+    repeats = route_day_flights[route, day]
+    route, day = np.repeat(route, repeats), np.repeat(day, repeats)
+    count = len(route)
+    hours = distance[origin[route], destination[route]]
+    depart = rng.integers(5 * 4, 22 * 4, count) * 15
+    duration = (hours * 60 * rng.uniform(0.9, 1.3, count)).astype(np.int16) // 5 * 5
+    price = ((hours * 5500 + rng.uniform(0, 12000, count)) // 100 * 100).astype(np.int32)
+    flight_airline = route_airlines[origin[route], destination[route], rng.integers(0, AIRLINES_PER_ROUTE, count)]
+    return {
+        "origin": origin[route],
+        "destination": destination[route],
+        "day": day + start.toordinal(),
+        "depart": depart,
+        "duration": duration,
+        "price": price,
+        "airline": flight_airline,
+        "code": flight_airline * len(SYNTHETIC_FLIGHT_NUMBERS) + rng.integers(0, len(SYNTHETIC_FLIGHT_NUMBERS), count),
+    }
+
+
+def synthetic_flight_codes(airlines: list[str]) -> list[str]:
+    """The codes synthetic_columns' code column indexes: every number of every airline, airline-major."""
+    return [f"{airline[:2].upper()}-{number}" for airline in airlines for number in SYNTHETIC_FLIGHT_NUMBERS]
+
+
+def synthetic_schedule(days: int = FLIGHT_SCHEDULE_DAYS, start: datetime.date | None = None, seed: int = FLIGHT_SCHEDULE_SEED) -> FlightSchedule:
+    columns = synthetic_columns(len(SYNTHETIC_CITIES), days, start or datetime.date.today(), seed=seed)
+    return FlightSchedule([name for name, _ in SYNTHETIC_CITIES], AIRLINES, columns, [code for _, code in SYNTHETIC_CITIES])
+
+
+def save_schedule(schedule: FlightSchedule, path: str):
+    """Writes the schedule's columns to a .npz file that loads without parsing."""
+    np.savez_compressed(
+        path,
+        cities=np.array(schedule.cities),
+        city_codes=np.array(schedule.city_codes),
+        airlines=np.array(schedule.airlines),
+        flight_codes=np.array(schedule.flight_codes),
+        **{name: getattr(schedule, name) for name in _COLUMNS},
+    )
+
+
+def _schedule_from_rows(rows) -> FlightSchedule:
+    cities: dict[str, int] = {}
+    codes: dict[int, str] = {}
+    airlines: dict[str, int] = {}
+    flight_codes: dict[str, int] = {}
+    columns = {name: [] for name in _COLUMNS}
+    for row in rows:
+        for side in ("origin", "destination"):
+            city_id = cities.setdefault(str(row[side]), len(cities))
+            columns[side].append(city_id)
+            if row.get(f"{side}_code"):
+                codes[city_id] = str(row[f"{side}_code"])
+        airline = str(row["airline"])
+        columns["airline"].append(airlines.setdefault(airline, len(airlines)))
+        columns["day"].append(datetime.date.fromisoformat(str(row["date"])[:10]).toordinal())
+        columns["depart"].append(parse_minutes(str(row["depart_time"])))
+        columns["duration"].append(int(row["duration_minutes"]))
+        columns["price"].append(int(float(row["price"])))
+        # Kept as written: carrier codes like "6E" are not derived from the airline name.
+        columns["code"].append(flight_codes.setdefault(str(row["flight_number"]).strip(), len(flight_codes)))
+    return FlightSchedule(list(cities), list(airlines), {name: np.array(values) for name, values in columns.items()},
+                          [codes.get(city_id, "") for city_id in range(len(cities))], list(flight_codes))
+
+
+def load_flight_schedule(path: str | None = FLIGHT_SCHEDULE_PATH) -> FlightSchedule:
+    if not path:
+        schedule = synthetic_schedule()
+    elif path.endswith(".npz"):
+        with np.load(path) as data:
+            if "flight_codes" not in data:
+                raise ValueError(f"Flight schedule '{path}' predates flight code columns; write it again with save_schedule.")
+            schedule = FlightSchedule(data["cities"].tolist(), data["airlines"].tolist(), {name: data[name] for name in _COLUMNS},
+                                      data["city_codes"].tolist() if "city_codes" in data else None, data["flight_codes"].tolist())
+    elif path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            schedule = _schedule_from_rows(csv.DictReader(f))
+    elif path.endswith(".parquet"):
+        # Optional dependency, only needed for Parquet schedules.
+        import pyarrow.parquet as pq
+
+        schedule = _schedule_from_rows(pq.read_table(path).to_pylist())
+    else:
+        raise ValueError(f"Unsupported flight schedule format '{path}' (use .npz, .csv or .parquet).")
+    logger.info(f"Loaded flight schedule from {path or 'synthetic generator'}: {schedule.stats()}")
+    return schedule
+
+
+# Built by the startup warm-up, or on the first search if warm-up is off.
+flight_schedule = clients.register("flight_schedule", load_flight_schedule)
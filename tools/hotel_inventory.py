@@ -0,0 +1,141 @@
+# tools/hotel_inventory.py
+
+import os
+import csv
+import json
+import logging
+from bisect import bisect_left, bisect_right
+
+from tools.clients import clients
+from tools.place_index import PlaceIndex, normalize_place_name
+
+logger = logging.getLogger(__name__)
+
+# --- Hotel Inventory ---
+# Properties are loaded once (by the startup warm-up, see tools/clients.py) from
+# HOTEL_INVENTORY_PATH: a .csv, .jsonl or .parquet file with the columns
+#   name, location, price, description  and optionally  country, aliases ("a|b|c")
+# Without a file the built-in sample inventory is used. Each location keeps its
+# hotels sorted by price, so a budget filter is a bisect range query, and a
+# normalized index maps names, aliases and "City, Country" forms to the location.
+HOTEL_INVENTORY_PATH = os.getenv("HOTEL_INVENTORY_PATH")
+HOTEL_PAGE_SIZE = int(os.getenv("HOTEL_PAGE_SIZE", "5"))
+
+SAMPLE_HOTELS = [
+    {"name": "Halekulani Okinawa", "location": "Okinawa", "country": "Japan", "price": 35000,
+     "description": "Luxury 5-star hotel with stunning ocean views.", "aliases": "naha"},
+    {"name": "Hyatt Regency Seragaki Island", "location": "Okinawa", "country": "Japan", "price": 25000,
+     "description": "Resort on its own private island.", "aliases": "naha"},
+    {"name": "Ritz Paris", "location": "Paris", "country": "France", "price": 80000,
+     "description": "Iconic luxury hotel near the Louvre."},
+    {"name": "The Savoy", "location": "London", "country": "United Kingdom", "price": 65000,
+     "description": "Legendary hotel on the River Thames.", "aliases": "uk|england"},
+]
+
+
+class HotelInventory:
+    """Hotels grouped by location, price-sorted, behind a normalized location index."""
+
+    def __init__(self, records):
+        grouped: dict[str, list[dict]] = {}
+        self.index = PlaceIndex()
+        # Location, country and alias strings repeat across records; index each once.
+        indexed: set[tuple] = set()
+        normalized: dict[str, str] = {}
+
+        def normalize(text) -> str:
+            text = str(text or "")
+            if text not in normalized:
+                normalized[text] = normalize_place_name(text)
+            return normalized[text]
+
+        for record in records:
+            key = normalize(record["location"])
+            if not key:
+                continue
+            hotel = {
+                "name": str(record["name"]),
+                "location": str(record["location"]),
+                "price": int(float(record["price"])),
+                "description": str(record.get("description") or ""),
+            }
+            grouped.setdefault(key, []).append(hotel)
+            signature = (key, record.get("country"), record.get("aliases"))
+            if signature in indexed:
+                continue
+            indexed.add(signature)
+            self.index.add(key, key, primary=True)
+            country = normalize(record.get("country"))
+            if country:
+                self.index.add(f"{key} {country}", key)
+            for alias in str(record.get("aliases") or "").split("|"):
+                self.index.add(normalize(alias), key)
+
+        self.hotels: dict[str, list[dict]] = {}
+        self.prices: dict[str, list[int]] = {}
+        for key, hotels in grouped.items():
+            hotels.sort(key=lambda hotel: (hotel["price"], hotel["name"]))
+            self.hotels[key] = hotels
+            self.prices[key] = [hotel["price"] for hotel in hotels]
+
+    def __len__(self) -> int:
+        return sum(len(hotels) for hotels in self.hotels.values())
+
+    def resolve(self, location: str) -> str | None:
+        """The location key for free-form text ("hotels in Okinawa, Japan" -> okinawa)."""
+        return self.index.resolve(location)
+
+    def search(self, location: str, max_price: int = 0, min_price: int = 0, page: int = 1, page_size: int = HOTEL_PAGE_SIZE) -> dict:
+        """
+        Hotels at `location` priced within [min_price, max_price] (0 = no limit),
+        cheapest first, one page at a time.
+        """
+        key = self.resolve(location)
+        page = max(1, page)
+        if key is None:
+            return {"location": None, "hotels": [], "total": 0, "page": page, "pages": 0}
+        prices = self.prices[key]
+        low = bisect_left(prices, min_price) if min_price > 0 else 0
+        high = bisect_right(prices, max_price) if max_price > 0 else len(prices)
+        total = max(0, high - low)
+        start = low + (page - 1) * page_size
+        return {
+            "location": key,
+            "hotels": self.hotels[key][start:min(start + page_size, high)],
+            "total": total,
+            "page": page,
+            "pages": -(-total // page_size),
+        }
+
+    def stats(self) -> dict:
+        return {"hotels": len(self), "locations": len(self.hotels), "names": len(self.index)}
+
+
+def read_hotel_records(path: str):
+    """Yields hotel records (dicts) from a .csv, .jsonl or .parquet file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif extension == ".parquet":
+        # Optional dependency, only needed for Parquet inventories.
+        import pyarrow.parquet as pq
+
+        yield from pq.read_table(path).to_pylist()
+    else:
+        raise ValueError(f"Unsupported hotel inventory format '{extension}' (use .csv, .jsonl or .parquet).")
+
+
+def load_hotel_inventory(path: str | None = HOTEL_INVENTORY_PATH) -> HotelInventory:
+    inventory = HotelInventory(read_hotel_records(path) if path else SAMPLE_HOTELS)
+    logger.info(f"Loaded hotel inventory from {path or 'built-in sample'}: {inventory.stats()}")
+    return inventory
+
+
+# Built by the startup warm-up, or on the first search if warm-up is off.
+hotel_inventory = clients.register("hotel_inventory", load_hotel_inventory)
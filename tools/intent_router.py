@@ -0,0 +1,240 @@
+# tools/intent_router.py
+
+import os
+import re
+import json
+import time
+import logging
+import unicodedata
+
+import numpy as np
+from google.adk.models import LlmResponse
+
+from tools.clients import clients
+from tools.tracing import tracer, trace_context, MARK_INBOUND_TEXT
+
+logger = logging.getLogger(__name__)
+
+# --- Local Intent Router ---
+# root_agent only ever calls transfer_to_agent, so every routing decision costs a
+# model round trip before the specialist starts talking. This router classifies the
+# user's finished input transcription on the CPU - keyword rules first, then a
+# TF-IDF softmax model trained at startup on INTENT_EXAMPLES_PATH - and when it is
+# confident it transfers to the specialist itself, from root_agent's
+# before_model_callback. Otherwise root_agent routes as before.
+# "on" - dispatch confident routes. "shadow" - classify and trace only. "off" - disabled.
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "on").lower()
+INTENT_ROUTER_THRESHOLD = float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.75"))
+INTENT_EXAMPLES_PATH = os.getenv("INTENT_EXAMPLES_PATH", os.path.join(os.path.dirname(__file__), "intent_examples.jsonl"))
+
+GREETING = "GreetingAgent"
+BOOKING = "ConversationalBookingAgent"
+ITINERARY = "ItineraryPlanningAgent"
+CREATIVE = "CreativeAndSearchSpecialist"
+AGENTS = [GREETING, BOOKING, ITINERARY, CREATIVE]
+
+# Turn marks: when root_agent saw the finished transcription, and a local dispatch.
+MARK_INPUT_TRANSCRIBED = "input_transcribed"
+MARK_LOCAL_ROUTE = "local_route"
+
+# High-precision phrases. A route is taken from the rules only when exactly one agent matches.
+KEYWORD_RULES = [
+    (BOOKING, re.compile(r"\b(book|reserve|flights?|plane tickets?|airfare)\b")),
+    (ITINERARY, re.compile(
+        r"\b(itinerary|itineraries|sightseeing|day by day|things to do|what (should|can) (i|we) (do|see))\b"
+        r"|\bplan (a|my|the|our) (\w+ )?(trip|day|days|vacation|holiday|week|weekend|honeymoon|getaway)\b"
+    )),
+    (CREATIVE, re.compile(r"\b(generate|draw|render|paint|teleport|images?|pictures?|photos?|videos?|illustration|poster)\b")),
+]
+GREETING_RULE = re.compile(r"^(hi|hello|hey|hiya|howdy|greetings|good (morning|afternoon|evening|day))\b")
+MAX_GREETING_WORDS = 6
+
+
+def normalize_utterance(text: str) -> str:
+    """Case-folds, strips accents and punctuation (keeping apostrophes), collapses whitespace."""
+    text = unicodedata.normalize("NFKD", text or "").casefold()
+    text = "".join(c if c.isalnum() or c == "'" else " " for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+def utterance_features(text: str) -> list[str]:
+    """Word unigrams and bigrams, plus character trigrams that tolerate transcription slips."""
+    words = normalize_utterance(text).split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        features += [f"#{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return features
+
+
+class IntentClassifier:
+    """TF-IDF features and a multinomial logistic regression, in NumPy."""
+
+    def __init__(self, labels: list[str], vocabulary: dict[str, int], idf: np.ndarray, weights: np.ndarray, bias: np.ndarray):
+        self.labels = labels
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def fit(cls, texts: list[str], labels: list[str], epochs: int = 400, learning_rate: float = 2.0, l2: float = 1e-4) -> "IntentClassifier":
+        label_names = sorted(set(labels))
+        documents = [utterance_features(text) for text in texts]
+        vocabulary: dict[str, int] = {}
+        for features in documents:
+            for feature in features:
+                vocabulary.setdefault(feature, len(vocabulary))
+        document_frequency = np.zeros(len(vocabulary))
+        for features in documents:
+            document_frequency[[vocabulary[feature] for feature in set(features)]] += 1
+        idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+
+        classifier = cls(label_names, vocabulary, idf, np.zeros((len(vocabulary), len(label_names))), np.zeros(len(label_names)))
+        x = np.zeros((len(documents), len(vocabulary)))
+        for row, features in enumerate(documents):
+            columns, values = classifier._vector(features)
+            x[row, columns] = values
+        y = np.zeros((len(documents), len(label_names)))
+        y[np.arange(len(documents)), [label_names.index(label) for label in labels]] = 1
+
+        # Full-batch gradient descent; a few hundred utterances train in well under a second.
+        for _ in range(epochs):
+            probabilities = _softmax(x @ classifier.weights + classifier.bias)
+            error = (probabilities - y) / len(documents)
+            classifier.weights -= learning_rate * (x.T @ error + l2 * classifier.weights)
+            classifier.bias -= learning_rate * error.sum(axis=0)
+        return classifier
+
+    def _vector(self, features: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Column indices and L2-normalized TF-IDF values of known features."""
+        counts: dict[int, int] = {}
+        for feature in features:
+            column = self.vocabulary.get(feature)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        columns = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.idf[columns]
+        norm = np.linalg.norm(values)
+        return columns, values / norm if norm else values
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        columns, values = self._vector(utterance_features(text))
+        return _softmax(values @ self.weights[columns] + self.bias)
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=-1, keepdims=True)
+    exponentials = np.exp(scores)
+    return exponentials / exponentials.sum(axis=-1, keepdims=True)
+
+
+class IntentRouter:
+    """Keyword rules, then the classifier; a route below the threshold is left to the LLM."""
+
+    def __init__(self, classifier: IntentClassifier, threshold: float = INTENT_ROUTER_THRESHOLD):
+        self.classifier = classifier
+        self.threshold = threshold
+        self.routes = {"rule": 0, "model": 0, "fallback": 0}
+
+    def rule(self, text: str) -> str | None:
+        normalized = normalize_utterance(text)
+        matches = {agent for agent, pattern in KEYWORD_RULES if pattern.search(normalized)}
+        if not matches and GREETING_RULE.search(normalized) and len(normalized.split()) <= MAX_GREETING_WORDS:
+            matches.add(GREETING)
+        return matches.pop() if len(matches) == 1 else None
+
+    def route(self, text: str) -> dict:
+        """{"agent": agent or None (fall back to the LLM), "label": best guess, "confidence", "source"}."""
+        started = time.perf_counter()
+        agent = self.rule(text)
+        if agent is not None:
+            result = {"agent": agent, "label": agent, "confidence": 1.0, "source": "rule"}
+        else:
+            probabilities = self.classifier.predict_proba(text)
+            best = int(probabilities.argmax())
+            label, confidence = self.classifier.labels[best], float(probabilities[best])
+            confident = confidence >= self.threshold
+            result = {"agent": label if confident else None, "label": label, "confidence": round(confidence, 3),
+                      "source": "model" if confident else "fallback"}
+        self.routes[result["source"]] += 1
+        tracer.record("intent_router.classify", (time.perf_counter() - started) * 1000)
+        return result
+
+    def stats(self) -> dict:
+        return {"mode": INTENT_ROUTER, "threshold": self.threshold, "vocabulary": len(self.classifier.vocabulary), "routes": self.routes}
+
+
+def read_intent_examples(path: str) -> tuple[list[str], list[str]]:
+    """(texts, agent names) from a JSONL file of {"text": ..., "agent": ...} lines."""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                example = json.loads(line)
+                texts.append(example["text"])
+                labels.append(example["agent"])
+    return texts, labels
+
+
+def load_intent_router(path: str = INTENT_EXAMPLES_PATH) -> IntentRouter:
+    started = time.perf_counter()
+    texts, labels = read_intent_examples(path)
+    unknown = set(labels) - set(AGENTS)
+    if unknown:
+        raise ValueError(f"Intent examples name unknown agents: {sorted(unknown)}")
+    router = IntentRouter(IntentClassifier.fit(texts, labels))
+    logger.info(f"Trained intent router on {len(texts)} examples in {(time.perf_counter() - started) * 1000:.0f} ms: {router.stats()}")
+    return router
+
+
+# Trained by the startup warm-up, or on the first routed turn if warm-up is off.
+intent_router = clients.register("intent_router", load_intent_router)
+
+
+def _is_first_turn(callback_context) -> bool:
+    """No specialist has spoken in this conversation yet."""
+    return not any(event.author in AGENTS for event in callback_context.session.events)
+
+
+def _user_text(llm_request) -> str:
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user" and content.parts:
+            return " ".join(part.text for part in content.parts if part.text)
+    return ""
+
+
+async def route_spoken_intent(callback_context, llm_request):
+    """
+    root_agent's before_model_callback. ADK runs it on every finished input
+    transcription while root_agent is live; setting transfer_to_agent on the
+    callback's actions and short-circuiting the model makes ADK transfer right away.
+    Typed text is left to the LLM: ADK screens it on another path that ignores transfers.
+    """
+    if INTENT_ROUTER == "off":
+        return None
+    run_config = callback_context.run_config
+    if run_config is None or run_config.input_audio_transcription is None:
+        return None
+    trace = trace_context.get()
+    if trace is not None and trace.turn is not None and MARK_INBOUND_TEXT in trace.turn.marks:
+        return None
+    text = _user_text(llm_request)
+    if not text:
+        return None
+
+    if trace is not None:
+        trace.mark(MARK_INPUT_TRANSCRIBED)
+    # The orchestrator always greets on the first turn.
+    if _is_first_turn(callback_context):
+        route = {"agent": GREETING, "label": GREETING, "confidence": 1.0, "source": "first_turn"}
+    else:
+        route = (await intent_router.aget()).route(text)
+    logger.info(f"Intent route for '{text}': {route}")
+    if route["agent"] is None or INTENT_ROUTER == "shadow":
+        return None
+
+    if trace is not None:
+        trace.mark(f"{MARK_LOCAL_ROUTE}.{route['agent']}")
+    callback_context.actions.transfer_to_agent = route["agent"]
+    return LlmResponse()
@@ -0,0 +1,113 @@
+# tools/io_pool.py
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+from tools.tracing import LatencyWindow, trace_span
+
+logger = logging.getLogger(__name__)
+
+# --- Executor and Connection Pool Sizing ---
+# Each blocking backend gets its own named, size-limited thread pool, so a burst of
+# photo fetches cannot starve GCS uploads (or anything else using the default pool).
+# HTTP connection pools are sized to match, one connection per worker thread.
+MAPS_IO_MAX_WORKERS = int(os.getenv("MAPS_IO_MAX_WORKERS", "8"))
+GCS_IO_MAX_WORKERS = int(os.getenv("GCS_IO_MAX_WORKERS", "8"))
+MEDIA_IO_MAX_WORKERS = int(os.getenv("MEDIA_IO_MAX_WORKERS", "4"))
+SESSION_IO_MAX_WORKERS = int(os.getenv("SESSION_IO_MAX_WORKERS", "2"))
+LEDGER_IO_MAX_WORKERS = int(os.getenv("LEDGER_IO_MAX_WORKERS", "2"))
+CACHE_IO_MAX_WORKERS = int(os.getenv("CACHE_IO_MAX_WORKERS", "2"))
+# Calls beyond workers + queue wait on the event loop instead of piling into the pool.
+IO_MAX_QUEUE_DEPTH = int(os.getenv("IO_MAX_QUEUE_DEPTH", "64"))
+
+
+class BoundedExecutor:
+    """A named thread pool for one blocking backend, with queue-depth and latency metrics."""
+
+    def __init__(self, name: str, max_workers: int, max_queue_depth: int = IO_MAX_QUEUE_DEPTH):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-io")
+        self._admission = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.errors = 0
+        self.queue_wait = LatencyWindow()
+        self.run_time = LatencyWindow()
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking call on this backend's pool without blocking the event loop."""
+        if self._admission is None:
+            self._admission = asyncio.Semaphore(self.max_workers + self.max_queue_depth)
+        async with self._admission, trace_span(f"io.{self.name}"):
+            submitted = time.perf_counter()
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued - self.in_flight)
+
+            def call():
+                started = time.perf_counter()
+                with self._lock:
+                    self.in_flight += 1
+                    self.queue_wait.record((started - submitted) * 1000)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    with self._lock:
+                        self.in_flight -= 1
+                        self.run_time.record((time.perf_counter() - started) * 1000)
+
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._executor, call)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.queued -= 1
+            self.completed += 1
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.queued - self.in_flight),
+            "peak_queue_depth": self.peak_queued,
+            "completed": self.completed,
+            "errors": self.errors,
+            "queue_wait": self.queue_wait.summary(),
+            "run_time": self.run_time.summary(),
+        }
+
+
+def size_http_pool(session, pool_size: int):
+    """Mounts an HTTPS adapter with an explicit connection pool size on a requests session."""
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+
+maps_io = BoundedExecutor("maps", MAPS_IO_MAX_WORKERS)
+gcs_io = BoundedExecutor("gcs", GCS_IO_MAX_WORKERS)
+# Hashing and disk spill for the local media store (tools.media_store).
+media_io = BoundedExecutor("media", MEDIA_IO_MAX_WORKERS)
+# SQLite reads and writes of the session store (tools.session_store).
+session_io = BoundedExecutor("sessions", SESSION_IO_MAX_WORKERS)
+# SQLite transactions of the reservation ledger (tools.reservations).
+ledger_io = BoundedExecutor("ledger", LEDGER_IO_MAX_WORKERS)
+# SQLite tiers of the persistent caches (tools.cache).
+cache_io = BoundedExecutor("cache", CACHE_IO_MAX_WORKERS)
+
+
+def io_stats() -> dict:
+    return {executor.name: executor.stats() for executor in (maps_io, gcs_io, media_io, session_io, ledger_io, cache_io)}
@@ -0,0 +1,268 @@
+# tools/live_sessions.py
+
+import os
+import json
+import time
+import base64
+import asyncio
+import logging
+from collections import deque
+
+from tools.outbound import OutboundScheduler, LANE_AUDIO
+from tools.ws_protocol import PROTOCOL_BINARY, DIRECTION_AGENT_TO_CLIENT, FLAG_OPUS, AudioFrameSequencer, sample_rate_from_mime_type
+from tools.audio_codec import CODEC_PCM, CODEC_OPUS, OpusEncoder, AudioLinkStats
+
+logger = logging.getLogger(__name__)
+
+# --- Resumption Configuration ---
+# How long a live session survives without a connected client before it is evicted.
+LIVE_SESSION_GRACE_SECONDS = float(os.getenv("LIVE_SESSION_GRACE_SECONDS", "120"))
+# Control, transcript and side-channel messages kept for replay to a reconnecting client.
+LIVE_SESSION_REPLAY_SIZE = int(os.getenv("LIVE_SESSION_REPLAY_SIZE", "256"))
+
+# Sent after the protocol message so the client knows whether its conversation survived.
+SESSION_MIME_TYPE = "application/x-odyssey-session"
+
+
+class LiveSession:
+    """
+    One agent conversation: the ADK session, its run_live stream and the tasks that
+    pump it. A client connection attaches to it and may later detach and re-attach;
+    messages produced meanwhile are kept (audio excepted) and replayed by sequence number.
+    """
+
+    def __init__(self, session_id: str, session, live_events, live_request_queue, side_channel_queue: asyncio.Queue, replay_size: int = LIVE_SESSION_REPLAY_SIZE):
+        self.session_id = session_id
+        self.session = session
+        self.live_events = live_events
+        self.live_request_queue = live_request_queue
+        self.side_channel_queue = side_channel_queue
+        self.tasks: list[asyncio.Task] = []
+        self.outbound: OutboundScheduler | None = None
+        self.protocol = None
+        self.codec = CODEC_PCM
+        self.audio_sequencer = None
+        self.audio_encoder: OpusEncoder | None = None
+        self.audio_link = AudioLinkStats()
+        self.last_seq = 0
+        self._replay: deque[tuple[int, str, str]] = deque(maxlen=replay_size)
+        self._connection_token = 0
+        self.detached_at: float | None = time.monotonic()
+        self.attach_count = 0
+        self.audio_dropped_detached = 0
+        # The attached connection's microphone gate (tools/voice_gate.py); None for text connections.
+        self.voice_gate = None
+        # The session's per-turn latency trace (tools/tracing.py).
+        self.trace = None
+
+    @property
+    def attached(self) -> bool:
+        return self.outbound is not None
+
+    @property
+    def alive(self) -> bool:
+        return bool(self.tasks) and not any(task.done() for task in self.tasks)
+
+    def start(self, *coros):
+        """Starts the session-scoped tasks in the caller's context (and its context variables)."""
+        self.tasks = [asyncio.create_task(coro) for coro in coros]
+
+    async def wait_closed(self):
+        """Returns when the live stream ends; cancelling the waiter leaves the session running."""
+        await asyncio.wait(self.tasks, return_when=asyncio.FIRST_COMPLETED)
+
+    async def attach(self, outbound: OutboundScheduler, protocol: str, last_seq: int = 0, codec: str = CODEC_PCM, voice_gate=None) -> tuple[int, int]:
+        """
+        Routes the session's output to a new connection, replacing any previous one,
+        and gates its microphone audio with `voice_gate` if given.
+        Returns a token for detach() and the number of replayed messages.
+        """
+        if self.outbound is not None:
+            await self.outbound.close()
+        self._connection_token += 1
+        self.outbound = outbound
+        self.protocol = protocol
+        self.codec = codec
+        self.audio_sequencer = AudioFrameSequencer(DIRECTION_AGENT_TO_CLIENT)
+        self.audio_encoder = None
+        self.voice_gate = voice_gate
+        self.detached_at = None
+        self.attach_count += 1
+
+        replayed = 0
+        for seq, lane, text in list(self._replay):
+            if seq > last_seq:
+                await outbound.put(lane, text)
+                replayed += 1
+        return self._connection_token, replayed
+
+    async def detach(self, token: int) -> bool:
+        """Disconnects the given connection; a connection that was already replaced is ignored."""
+        if token != self._connection_token or self.outbound is None:
+            return False
+        await self.outbound.close()
+        self.outbound = None
+        self.detached_at = time.monotonic()
+        return True
+
+    async def send_message(self, lane: str, message: dict):
+        """Numbers, records and (if a client is attached) sends a JSON message."""
+        self.last_seq += 1
+        text = json.dumps({**message, "seq": self.last_seq})
+        self._replay.append((self.last_seq, lane, text))
+        if self.outbound is not None:
+            await self.outbound.put(lane, text)
+
+    async def send_audio(self, pcm: bytes, mime_type: str):
+        """Sends agent audio to the attached client; audio is never replayed."""
+        if self.outbound is None:
+            self.audio_dropped_detached += 1
+            return
+        sample_rate = sample_rate_from_mime_type(mime_type)
+        started = time.perf_counter()
+        if self.codec == CODEC_OPUS:
+            if self.audio_encoder is None or self.audio_encoder.sample_rate != sample_rate:
+                self.audio_encoder = OpusEncoder(sample_rate)
+            frames = [self.audio_sequencer.pack(packet, sample_rate, FLAG_OPUS) for packet in self.audio_encoder.encode(pcm)]
+        elif self.protocol == PROTOCOL_BINARY:
+            frames = [self.audio_sequencer.pack(pcm, sample_rate)]
+        else:
+            frames = [json.dumps({
+                "mime_type": "audio/pcm",
+                "data": base64.b64encode(pcm).decode("ascii"),
+            })]
+        self.audio_link.record(self.codec, "out", sum(len(frame) for frame in frames), len(pcm) / 2 / sample_rate, time.perf_counter() - started)
+        for frame in frames:
+            await self.outbound.put(LANE_AUDIO, frame)
+
+    async def flush_audio(self):
+        """Sends the encoder's partial frame at the end of the agent's turn."""
+        if self.outbound is None or self.audio_encoder is None:
+            return
+        for packet in self.audio_encoder.flush():
+            await self.outbound.put(LANE_AUDIO, self.audio_sequencer.pack(packet, self.audio_encoder.sample_rate, FLAG_OPUS))
+
+    def drop_audio(self):
+        if self.audio_encoder is not None:
+            self.audio_encoder.reset()
+        if self.outbound is not None:
+            self.outbound.drop_audio()
+
+    def close(self):
+        self.live_request_queue.close()
+        for task in self.tasks:
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "attached": self.attached,
+            "alive": self.alive,
+            "attach_count": self.attach_count,
+            "last_seq": self.last_seq,
+            "replay_buffered": len(self._replay),
+            "audio_dropped_detached": self.audio_dropped_detached,
+            "detached_seconds": None if self.detached_at is None else round(time.monotonic() - self.detached_at, 1),
+            "outbound": self.outbound.stats() if self.outbound is not None else None,
+            "voice_gate": self.voice_gate.stats() if self.voice_gate is not None else None,
+            "codec": self.codec,
+            "audio_link": self.audio_link.stats(),
+        }
+
+
+class LiveSessionRegistry:
+    """
+    Live sessions by session_id. Sessions outlive their WebSocket for a grace period
+    so a reconnecting client re-attaches to the same conversation; one shared reaper
+    evicts sessions that stay detached past the grace period or whose stream ended.
+    """
+
+    def __init__(self, grace_seconds: float = LIVE_SESSION_GRACE_SECONDS, on_evict=None):
+        self.grace_seconds = grace_seconds
+        self.on_evict = on_evict
+        self.sessions: dict[str, LiveSession] = {}
+        self._starting: dict[str, asyncio.Future] = {}
+        self._reaper: asyncio.Task | None = None
+        self.resumed = 0
+        self.started = 0
+        self.evicted = 0
+
+    async def get_or_start(self, session_id: str, start) -> tuple[LiveSession, bool]:
+        """
+        Returns (session, resumed). `start` is an async callable building a new
+        LiveSession; concurrent connections for one id share a single start.
+        """
+        live = self.sessions.get(session_id)
+        if live is not None and not live.alive:
+            # The live stream ended; start a new one but keep the stored conversation.
+            await self.evict(session_id, forget=False)
+            live = None
+        if live is not None:
+            self.resumed += 1
+            return live, True
+
+        pending = self._starting.get(session_id)
+        if pending is not None:
+            return await asyncio.shield(pending), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._starting[session_id] = future
+        try:
+            live = await start()
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved.
+            future.exception()
+            raise
+        finally:
+            self._starting.pop(session_id, None)
+        future.set_result(live)
+        self.sessions[session_id] = live
+        self.started += 1
+        self._ensure_reaper()
+        return live, False
+
+    async def detach(self, live: LiveSession, token: int):
+        if await live.detach(token):
+            logger.info(f"Live session {live.session_id} detached; kept for {self.grace_seconds:.0f}s.")
+        self._ensure_reaper()
+
+    async def evict(self, session_id: str, forget: bool = True):
+        """Stops a live session. `forget` tells the eviction hook to drop its stored state too."""
+        live = self.sessions.pop(session_id, None)
+        if live is None:
+            return
+        if live.outbound is not None:
+            await live.outbound.close()
+        live.close()
+        self.evicted += 1
+        logger.info(f"Live session {session_id} evicted.")
+        if self.on_evict is not None:
+            try:
+                await self.on_evict(live, forget)
+            except Exception as e:
+                logger.error(f"Eviction hook failed for live session {session_id}: {e}")
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def _reap_loop(self):
+        interval = max(1.0, min(self.grace_seconds / 4, 15.0))
+        while self.sessions:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for session_id, live in list(self.sessions.items()):
+                expired = live.detached_at is not None and now - live.detached_at >= self.grace_seconds
+                if expired or (not live.alive and not live.attached):
+                    await self.evict(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.sessions),
+            "attached": sum(1 for live in self.sessions.values() if live.attached),
+            "started": self.started,
+            "resumed": self.resumed,
+            "evicted": self.evicted,
+            "grace_seconds": self.grace_seconds,
+            "sessions": {session_id: live.stats() for session_id, live in self.sessions.items()},
+        }
@@ -0,0 +1,265 @@
+# tools/media_store.py
+
+import os
+import re
+import hashlib
+import logging
+from collections import OrderedDict
+
+from tools.io_pool import gcs_io, media_io
+from tools.streaming_upload import upload_chunks, iter_memoryview_chunks
+from tools.worker_router import WORKER_INDEX_ENV, MEDIA_WORKER_PARAM
+
+logger = logging.getLogger(__name__)
+
+# --- Media Store Selection ---
+# "gcs"   - objects are uploaded to the bucket and the browser loads them from GCS.
+# "local" - objects are kept in this process (memory LRU with disk spill) and served
+#           by the app's own /media route, skipping the GCS round trip entirely. Also
+#           lets the whole pipeline run offline.
+MEDIA_STORE_BACKEND = os.getenv("MEDIA_STORE", "gcs").lower()
+LOCAL_MEDIA_MAX_MEMORY_BYTES = int(os.getenv("LOCAL_MEDIA_MAX_MEMORY_MB", "256")) * 1024 * 1024
+# Spilled items beyond this many bytes on disk are deleted, oldest spill first.
+LOCAL_MEDIA_MAX_SPILL_BYTES = int(os.getenv("LOCAL_MEDIA_MAX_SPILL_MB", "2048")) * 1024 * 1024
+LOCAL_MEDIA_URL_PREFIX = "/media"
+LOCAL_MEDIA_URI_SCHEME = "media://"
+# Set by tools.worker_router: local media URLs name the worker that holds the object.
+LOCAL_MEDIA_WORKER = os.getenv(WORKER_INDEX_ENV)
+# Each worker spills into its own directory, which it clears on startup.
+LOCAL_MEDIA_SPILL_DIR = os.getenv("LOCAL_MEDIA_SPILL_DIR", "/tmp/odyssey-media")
+if LOCAL_MEDIA_WORKER is not None:
+    LOCAL_MEDIA_SPILL_DIR = os.path.join(LOCAL_MEDIA_SPILL_DIR, f"worker-{LOCAL_MEDIA_WORKER}")
+# Files the store writes into the spill directory (see LocalMediaStore._spill_paths).
+_SPILL_FILE_PATTERN = re.compile(r"[0-9a-f]{64}\.(bin|type|bin\.tmp)")
+
+
+class GCSMediaStore:
+    """Stores media as objects in a GCS bucket, served publicly by GCS."""
+
+    name = "gcs"
+
+    def __init__(self, bucket, bucket_name: str):
+        # `bucket` is a LazyClient: the async methods resolve it with aget(), off the
+        # event loop. The name comes from configuration, so the URI helpers never build it.
+        self.bucket = bucket
+        self.bucket_name = bucket_name
+
+    def storage_uri(self, object_name: str) -> str:
+        return f"gs://{self.bucket_name}/{object_name}"
+
+    def public_url(self, object_name: str) -> str:
+        return f"https://storage.mtls.cloud.google.com/{self.bucket_name}/{object_name}"
+
+    def object_name_from_uri(self, uri: str) -> str:
+        return uri.replace(f"gs://{self.bucket_name}/", "")
+
+    def public_url_for_uri(self, uri: str) -> str:
+        return "https://storage.mtls.cloud.google.com/" + uri.split("gs://", 1)[-1]
+
+    async def put_bytes(self, object_name: str, data: bytes, content_type: str) -> str:
+        """Uploads in-memory bytes; large objects go up as zero-copy resumable chunks."""
+        blob = (await self.bucket.aget()).blob(object_name)
+        await gcs_io.run(upload_chunks, blob, iter_memoryview_chunks(data), content_type)
+        return self.public_url(object_name)
+
+    async def put_chunks(self, object_name: str, chunks, content_type: str) -> str:
+        """Streams a (blocking) chunk iterator into the bucket."""
+        blob = (await self.bucket.aget()).blob(object_name)
+        await gcs_io.run(upload_chunks, blob, chunks, content_type)
+        return self.public_url(object_name)
+
+    async def get_bytes(self, object_name: str) -> tuple[bytes, str]:
+        blob = (await self.bucket.aget()).blob(object_name)
+        data = await gcs_io.run(blob.download_as_bytes)
+        return data, blob.content_type or "application/octet-stream"
+
+
+class LocalMediaItem:
+    def __init__(self, data: bytes, content_type: str):
+        self.data = data
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+class LocalMediaStore:
+    """
+    Keeps media in a size-bounded in-memory LRU. Least recently used items spill to
+    disk instead of being dropped, and are promoted back into memory when requested.
+    The spill directory is bounded too: past max_spill_bytes the oldest spills are
+    deleted. Spill files do not outlive the process: they are cleared on startup.
+    """
+
+    name = "local"
+
+    def __init__(self, max_memory_bytes: int = LOCAL_MEDIA_MAX_MEMORY_BYTES, spill_dir: str = LOCAL_MEDIA_SPILL_DIR,
+                 max_spill_bytes: int = LOCAL_MEDIA_MAX_SPILL_BYTES):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.spill_dir = spill_dir
+        self._items: OrderedDict[str, LocalMediaItem] = OrderedDict()
+        self._memory_bytes = 0
+        # Evicted items still being written to disk; they are served from here meanwhile.
+        self._spilling: dict[str, LocalMediaItem] = {}
+        # Spilled object name -> bytes on disk, oldest spill first.
+        self._spilled: OrderedDict[str, int] = OrderedDict()
+        self._spill_bytes = 0
+        self.spilled = 0
+        self.spill_evictions = 0
+        os.makedirs(spill_dir, exist_ok=True)
+        self._clear_spill_dir()
+
+    def storage_uri(self, object_name: str) -> str:
+        return f"{LOCAL_MEDIA_URI_SCHEME}{object_name}"
+
+    def public_url(self, object_name: str) -> str:
+        url = f"{LOCAL_MEDIA_URL_PREFIX}/{object_name}"
+        return f"{url}?{MEDIA_WORKER_PARAM}={LOCAL_MEDIA_WORKER}" if LOCAL_MEDIA_WORKER is not None else url
+
+    def object_name_from_uri(self, uri: str) -> str:
+        return uri.split(LOCAL_MEDIA_URI_SCHEME, 1)[-1]
+
+    def public_url_for_uri(self, uri: str) -> str:
+        return self.public_url(self.object_name_from_uri(uri))
+
+    async def put_bytes(self, object_name: str, data: bytes, content_type: str) -> str:
+        item = await media_io.run(LocalMediaItem, bytes(data), content_type)
+        await self._remember(object_name, item)
+        return self.public_url(object_name)
+
+    async def put_chunks(self, object_name: str, chunks, content_type: str) -> str:
+        """Drains a (blocking) chunk iterator off the event loop and stores the result."""
+        item = await media_io.run(lambda: LocalMediaItem(b"".join(chunks), content_type))
+        await self._remember(object_name, item)
+        return self.public_url(object_name)
+
+    async def get(self, object_name: str) -> LocalMediaItem | None:
+        item = self._items.get(object_name)
+        if item is not None:
+            self._items.move_to_end(object_name)
+            return item
+        item = self._spilling.get(object_name)
+        if item is not None:
+            return item
+        if object_name not in self._spilled:
+            return None
+        item = await media_io.run(self._read_spilled, object_name)
+        if item is not None:
+            await self._remember(object_name, item)
+        return item
+
+    async def get_bytes(self, object_name: str) -> tuple[bytes, str]:
+        item = await self.get(object_name)
+        if item is None:
+            raise FileNotFoundError(f"Media object '{object_name}' not found.")
+        return item.data, item.content_type
+
+    def stats(self) -> dict:
+        return {
+            "items_in_memory": len(self._items),
+            "memory_bytes": self._memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "spilled": self.spilled,
+            "items_on_disk": len(self._spilled),
+            "spill_bytes": self._spill_bytes,
+            "max_spill_bytes": self.max_spill_bytes,
+            "spill_evictions": self.spill_evictions,
+        }
+
+    async def _remember(self, object_name: str, item: LocalMediaItem):
+        previous = self._items.pop(object_name, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous.data)
+        self._items[object_name] = item
+        self._memory_bytes += len(item.data)
+        while self._memory_bytes > self.max_memory_bytes and len(self._items) > 1:
+            evicted_name, evicted = self._items.popitem(last=False)
+            self._memory_bytes -= len(evicted.data)
+            self._spilling[evicted_name] = evicted
+            try:
+                await media_io.run(self._spill, evicted_name, evicted)
+            finally:
+                if self._spilling.get(evicted_name) is evicted:
+                    del self._spilling[evicted_name]
+            self._spill_bytes += len(evicted.data) - self._spilled.pop(evicted_name, 0)
+            self._spilled[evicted_name] = len(evicted.data)
+            await self._trim_spill()
+
+    async def _trim_spill(self):
+        expired = []
+        while self._spill_bytes > self.max_spill_bytes and self._spilled:
+            name, size = self._spilled.popitem(last=False)
+            self._spill_bytes -= size
+            expired.append(name)
+        if expired:
+            self.spill_evictions += len(expired)
+            await media_io.run(self._delete_spilled, expired)
+
+    def _spill_paths(self, object_name: str) -> tuple[str, str]:
+        digest = hashlib.sha256(object_name.encode("utf-8")).hexdigest()
+        base = os.path.join(self.spill_dir, digest)
+        return base + ".bin", base + ".type"
+
+    def _spill(self, object_name: str, item: LocalMediaItem):
+        data_path, type_path = self._spill_paths(object_name)
+        with open(data_path + ".tmp", "wb") as f:
+            f.write(item.data)
+        with open(type_path, "w") as f:
+            f.write(item.content_type)
+        os.replace(data_path + ".tmp", data_path)
+        self.spilled += 1
+
+    def _delete_spilled(self, object_names: list[str]):
+        for object_name in object_names:
+            for path in self._spill_paths(object_name):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _clear_spill_dir(self):
+        removed = 0
+        for entry in os.scandir(self.spill_dir):
+            if entry.is_file() and _SPILL_FILE_PATTERN.fullmatch(entry.name):
+                os.remove(entry.path)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} spill file(s) left in {self.spill_dir} by a previous run.")
+
+    def _read_spilled(self, object_name: str) -> LocalMediaItem | None:
+        data_path, type_path = self._spill_paths(object_name)
+        try:
+            with open(data_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:  # Deleted by _trim_spill meanwhile.
+            return None
+        content_type = "application/octet-stream"
+        if os.path.exists(type_path):
+            with open(type_path) as f:
+                content_type = f.read().strip() or content_type
+        return LocalMediaItem(data, content_type)
+
+
+def parse_byte_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parses a single-range 'bytes=start-end' header into an inclusive (start, end).
+    Returns None for headers we do not handle (serve the full body); raises
+    ValueError when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text == "":
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("Empty suffix range.")
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError(f"Malformed range header: {range_header}")
+    end = min(end, size - 1)
+    if start >= size or start > end:
+        raise ValueError(f"Range {range_header} not satisfiable for {size} bytes.")
+    return start, end
@@ -0,0 +1,151 @@
+# tools/outbound.py
+
+import os
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# --- Outbound Lanes, Highest Priority First ---
+LANE_CONTROL = "control"              # turn_complete / interrupted / protocol
+LANE_TRANSCRIPTION = "transcription"  # input/output transcripts and final text
+LANE_AUDIO = "audio"                  # agent speech
+LANE_IMAGES = "images"                # image URLs, galleries, video jobs
+LANE_PRIORITY = (LANE_CONTROL, LANE_TRANSCRIPTION, LANE_AUDIO, LANE_IMAGES)
+
+# --- Overflow Policies ---
+OVERFLOW_BLOCK = "block"              # producer waits for space (backpressure)
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # make room by discarding the oldest queued message
+OVERFLOW_DROP_NEWEST = "drop_newest"  # discard the message being queued
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+# Defaults per lane: (capacity, policy). Override with e.g. OUTBOUND_AUDIO_CAPACITY=100
+# and OUTBOUND_AUDIO_POLICY=drop_newest. Audio is ~25 frames/s, so 250 is ~10 s.
+_DEFAULT_LANES = {
+    LANE_CONTROL: (256, OVERFLOW_BLOCK),
+    LANE_TRANSCRIPTION: (256, OVERFLOW_DROP_OLDEST),
+    LANE_AUDIO: (250, OVERFLOW_DROP_OLDEST),
+    LANE_IMAGES: (64, OVERFLOW_BLOCK),
+}
+
+
+def lane_config_from_env() -> dict[str, tuple[int, str]]:
+    config = {}
+    for lane, (capacity, policy) in _DEFAULT_LANES.items():
+        capacity = int(os.getenv(f"OUTBOUND_{lane.upper()}_CAPACITY", str(capacity)))
+        policy = os.getenv(f"OUTBOUND_{lane.upper()}_POLICY", policy).lower()
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}' for outbound lane '{lane}'.")
+        config[lane] = (capacity, policy)
+    return config
+
+
+class OutboundLane:
+    def __init__(self, name: str, capacity: int, policy: str):
+        self.name = name
+        self.capacity = capacity
+        self.policy = policy
+        self.queue = deque()
+        self.sent = 0
+        self.dropped = 0
+        self.peak_depth = 0
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self.queue),
+            "peak_depth": self.peak_depth,
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+
+class OutboundScheduler:
+    """
+    Per-connection outbound buffer with bounded priority lanes. Producers call
+    put(); a single run() task drains the highest-priority non-empty lane into
+    the WebSocket, so a slow client never makes memory grow without limit.
+    Payloads are pre-serialized: str goes out as a text frame, bytes as binary.
+    """
+
+    def __init__(self, websocket, lane_config: dict[str, tuple[int, str]] | None = None):
+        self.websocket = websocket
+        lane_config = lane_config or lane_config_from_env()
+        self.lanes = {lane: OutboundLane(lane, *lane_config[lane]) for lane in LANE_PRIORITY}
+        self._ready = asyncio.Event()
+        self._space = asyncio.Condition()
+        self.interrupt_drops = 0
+        self.closed = False
+
+    async def put(self, lane_name: str, payload: str | bytes) -> bool:
+        """Queues a frame. Returns False if the lane's policy dropped it or the scheduler is closed."""
+        lane = self.lanes[lane_name]
+        if self.closed:
+            return False
+        if len(lane.queue) >= lane.capacity:
+            if lane.policy == OVERFLOW_DROP_NEWEST:
+                lane.dropped += 1
+                return False
+            if lane.policy == OVERFLOW_DROP_OLDEST:
+                lane.queue.popleft()
+                lane.dropped += 1
+            else:
+                async with self._space:
+                    await self._space.wait_for(lambda: self.closed or len(lane.queue) < lane.capacity)
+                if self.closed:
+                    return False
+        lane.queue.append(payload)
+        lane.peak_depth = max(lane.peak_depth, len(lane.queue))
+        self._ready.set()
+        return True
+
+    def drop_audio(self) -> int:
+        """Discards queued agent audio, e.g. after the user interrupts."""
+        lane = self.lanes[LANE_AUDIO]
+        dropped = len(lane.queue)
+        lane.queue.clear()
+        lane.dropped += dropped
+        self.interrupt_drops += dropped
+        if dropped:
+            logger.debug(f"Dropped {dropped} queued audio frame(s) after an interruption.")
+        return dropped
+
+    async def close(self):
+        """Releases producers blocked on a full lane once the connection is gone."""
+        self.closed = True
+        async with self._space:
+            self._space.notify_all()
+
+    def _next(self) -> tuple[OutboundLane, str | bytes] | None:
+        for lane_name in LANE_PRIORITY:
+            lane = self.lanes[lane_name]
+            if lane.queue:
+                return lane, lane.queue.popleft()
+        return None
+
+    async def run(self):
+        """Sends queued frames in priority order until the connection fails."""
+        while True:
+            await self._ready.wait()
+            item = self._next()
+            if item is None:
+                self._ready.clear()
+                continue
+            lane, payload = item
+            if isinstance(payload, bytes):
+                await self.websocket.send_bytes(payload)
+            else:
+                await self.websocket.send_text(payload)
+            lane.sent += 1
+            if lane.policy == OVERFLOW_BLOCK:
+                async with self._space:
+                    self._space.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(lane.queue) for lane in self.lanes.values()),
+            "interrupt_drops": self.interrupt_drops,
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
@@ -0,0 +1,67 @@
+# tools/place_index.py
+
+import unicodedata
+from bisect import bisect_left
+
+# Shortest query that may match a name by prefix ("okin" -> okinawa).
+MIN_PREFIX_LENGTH = 3
+MAX_NAME_WORDS = 4
+
+
+def normalize_place_name(text: str) -> str:
+    """Case-folds, strips accents and punctuation, and collapses whitespace."""
+    text = unicodedata.normalize("NFKD", text or "").casefold()
+    text = "".join(c if c.isalnum() else " " for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+class PlaceIndex:
+    """Maps normalized place names and aliases to keys, and resolves free-form text to a key."""
+
+    def __init__(self):
+        self.names: dict[str, object] = {}
+        self._primary: set[str] = set()
+        self._sorted_names: list[str] | None = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, key, primary: bool = False):
+        """Indexes `name` (normalized) for `key`; a place's own (primary) name wins over aliases."""
+        name = normalize_place_name(name)
+        if not name or (name in self._primary and not primary):
+            return
+        if primary or name not in self.names:
+            self.names[name] = key
+        if primary:
+            self._primary.add(name)
+        self._sorted_names = None
+
+    def resolve(self, text: str):
+        """
+        Returns the key for free-form text: an exact name or alias, then each
+        comma-separated part, then the longest run of words naming a place
+        ("hotels in Okinawa, Japan" -> okinawa), then the first name it is a prefix of.
+        """
+        query = normalize_place_name(text)
+        if not query:
+            return None
+        if query in self.names:
+            return self.names[query]
+        for part in text.split(","):
+            key = self.names.get(normalize_place_name(part))
+            if key is not None:
+                return key
+        words = query.split()
+        for length in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - length + 1):
+                key = self.names.get(" ".join(words[start:start + length]))
+                if key is not None:
+                    return key
+        if len(query) >= MIN_PREFIX_LENGTH:
+            if self._sorted_names is None:
+                self._sorted_names = sorted(self.names)
+            index = bisect_left(self._sorted_names, query)
+            if index < len(self._sorted_names) and self._sorted_names[index].startswith(query):
+                return self.names[self._sorted_names[index]]
+        return None
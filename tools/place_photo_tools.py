@@ -2,6 +2,7 @@
 
 import os
 import uuid
+import hashlib
 import logging
 import asyncio
 
@@ -9,92 +10,212 @@ from dotenv import load_dotenv
 import googlemaps
 from googlemaps.exceptions import ApiError as GoogleMapsApiError
 
-from tools.creative_backend_tools import bucket
+from tools.cache import TieredCache, SQLiteCacheTier
+from tools.clients import clients
+from tools.creative_backend_tools import media_store
+from tools.io_pool import maps_io, size_http_pool, LatencyWindow, MAPS_IO_MAX_WORKERS
 
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 
 # --- Google Maps Client Initialization ---
-try:
+def _create_gmaps_client():
     MAPS_API_KEY = os.getenv("GOOGLE_API_KEY")
     if not MAPS_API_KEY:
         raise ValueError("GOOGLE_API_KEY environment variable for Google Maps not set.")
-    gmaps_client = googlemaps.Client(key=MAPS_API_KEY)
-    logger.info("Initialized Google Maps client.")
-except Exception as e:
-    logger.error(f"Failed to initialize Google Maps client: {e}")
-    raise
+    client = googlemaps.Client(key=MAPS_API_KEY)
+    # One pooled connection per Maps I/O worker thread.
+    size_http_pool(client.session, MAPS_IO_MAX_WORKERS)
+    return client
 
-PLACE_PHOTOS_GCS_PREFIX = os.getenv("PLACE_PHOTOS_GCS_PREFIX", "place_photos/")
 
+# Created on first use or by the startup warm-up (tools/clients.py).
+gmaps_client = clients.register("gmaps", _create_gmaps_client)
 
-async def fetch_and_upload_place_photos(place_name: str, max_photos: int = 3) -> tuple[list[str], str]:
-    """
-    Finds a place, downloads multiple photos, uploads them to GCS, and returns a
-    list of public HTTPS URLs and the place's display name.
-    """
-    logger.info(f"Tool processing request for place: '{place_name}'")
-    loop = asyncio.get_event_loop()
+PLACE_PHOTOS_GCS_PREFIX = os.getenv("PLACE_PHOTOS_GCS_PREFIX", "place_photos/")
 
-    # --- 1. Geocode to find Place ID (Now non-blocking) ---
-    geocode_result = await loop.run_in_executor(
-        None, lambda: gmaps_client.geocode(place_name)
+# --- Place Photo Caches ---
+# Three levels, each with its own TTL and size bound:
+#   place name      -> place_id + formatted address  (geocode call)
+#   place_id        -> display name + photo references  (place details call)
+#   photo reference -> public GCS URL  (photo download + upload)
+# Photos are stored under a deterministic object name, so a warm lookup costs zero
+# Maps calls and zero uploads. Set PLACE_CACHE_SQLITE_PATH to persist across restarts.
+# Local media does not survive a restart, so only GCS-backed URLs are persisted.
+PLACE_CACHE_SQLITE_PATH = os.getenv("PLACE_CACHE_SQLITE_PATH") if media_store.name == "gcs" else None
+
+
+def _place_cache(name: str, max_entries_env: str, default_max_entries: int, ttl_env: str, default_ttl_seconds: int) -> TieredCache:
+    return TieredCache(
+        name,
+        max_entries=int(os.getenv(max_entries_env, str(default_max_entries))),
+        ttl_seconds=float(os.getenv(ttl_env, str(default_ttl_seconds))),
+        persistent=SQLiteCacheTier(PLACE_CACHE_SQLITE_PATH, table=name) if PLACE_CACHE_SQLITE_PATH else None,
     )
+
+
+place_id_cache = _place_cache("place_ids", "PLACE_ID_CACHE_MAX_ENTRIES", 4096, "PLACE_ID_CACHE_TTL_SECONDS", 30 * 24 * 3600)
+place_photo_refs_cache = _place_cache("place_photo_refs", "PLACE_PHOTO_REFS_CACHE_MAX_ENTRIES", 4096, "PLACE_PHOTO_REFS_CACHE_TTL_SECONDS", 24 * 3600)
+photo_url_cache = _place_cache("photo_urls", "PHOTO_URL_CACHE_MAX_ENTRIES", 16384, "PHOTO_URL_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+
+
+def _normalize_place_name(place_name: str) -> str:
+    return " ".join(place_name.casefold().split())
+
+
+def photo_object_name(place_id: str, photo_reference: str) -> str:
+    """Deterministic GCS object name for a place photo."""
+    digest = hashlib.sha256(photo_reference.encode("utf-8")).hexdigest()[:32]
+    return f"{PLACE_PHOTOS_GCS_PREFIX.strip('/')}/{place_id}/{digest}.jpg"
+
+
+async def _resolve_place(place_name: str) -> dict:
+    """Returns {'place_id', 'formatted_address'} for a place name, geocoding on a miss."""
+    cache_key = _normalize_place_name(place_name)
+    place = await place_id_cache.aget(cache_key)
+    if place:
+        return place
+
+    geocode_result = await maps_io.run((await gmaps_client.aget()).geocode, place_name)
     if not geocode_result or not geocode_result[0].get('place_id'):
         raise FileNotFoundError(f"Could not find a valid place or place_id for '{place_name}'.")
 
-    place_id = geocode_result[0]['place_id']
-    actual_place_name = geocode_result[0].get('formatted_address', place_name)
-    logger.info(f"Found place_id '{place_id}' for '{actual_place_name}'.")
+    place = {
+        "place_id": geocode_result[0]['place_id'],
+        "formatted_address": geocode_result[0].get('formatted_address', place_name),
+    }
+    await place_id_cache.aset(cache_key, place)
+    return place
 
-    # --- 2. Get Place Photo References (Now non-blocking) ---
-    place_details = await loop.run_in_executor(
-        None, lambda: gmaps_client.place(place_id=place_id, fields=['name', 'photo'])
-    )
+
+async def _place_photo_references(place_id: str, actual_place_name: str) -> dict:
+    """Returns {'name', 'photo_references'} for a place_id, calling place details on a miss."""
+    details = await place_photo_refs_cache.aget(place_id)
+    if details:
+        return details
+
+    place_details = await maps_io.run((await gmaps_client.aget()).place, place_id=place_id, fields=['name', 'photo'])
     if not (place_details and 'result' in place_details and 'photos' in place_details['result'] and place_details['result']['photos']):
         raise FileNotFoundError(f"No photos found for '{actual_place_name}' (place_id: {place_id}).")
 
-    photo_references = place_details['result']['photos']
-
-    async def upload_photo(photo_ref):
-        try:
-            current_loop = asyncio.get_event_loop()
-            logger.info(f"Fetching photo data for ref: {photo_ref['photo_reference'][:20]}...")
-            
-            # --- Fetch photo data (Now non-blocking) ---
-            photo_data_chunks = await current_loop.run_in_executor(
-                None,
-                lambda: gmaps_client.places_photo(
-                    photo_reference=photo_ref['photo_reference'], max_width=800
-                )
-            )
-            image_bytes = b"".join(photo_data_chunks)
-
-            gcs_file_name = f"{PLACE_PHOTOS_GCS_PREFIX.strip('/')}/{uuid.uuid4()}.jpg"
-            blob = bucket.blob(gcs_file_name)
-            
-            # --- Upload to GCS (Already correctly handled) ---
-            await current_loop.run_in_executor(
-                None, 
-                lambda: blob.upload_from_string(image_bytes, content_type="image/jpeg")
-            )
-
-            public_url = f"https://storage.mtls.cloud.google.com/{bucket.name}/{gcs_file_name}"
-            logger.info(f"Photo uploaded, public URL: {public_url}")
-            return public_url
-        except Exception as e:
-            logger.error(f"Failed to process photo ref {photo_ref['photo_reference'][:20]}: {e}")
-            return None
-
-    # --- Create and run all upload tasks concurrently ---
-    tasks = [upload_photo(photo) for photo in photo_references[:max_photos]]
-    results = await asyncio.gather(*tasks)
-    
-    public_urls = [url for url in results if url is not None]
-
-    if not public_urls:
+    details = {
+        "name": place_details['result'].get('name', actual_place_name),
+        "photo_references": [photo['photo_reference'] for photo in place_details['result']['photos']],
+    }
+    await place_photo_refs_cache.aset(place_id, details)
+    return details
+
+
+async def _photo_public_url(place_id: str, photo_reference: str) -> str | None:
+    """Returns the public URL of a place photo, downloading and uploading it on a miss."""
+    public_url = await photo_url_cache.aget(photo_reference)
+    if public_url:
+        return public_url
+
+    try:
+        logger.info(f"Fetching photo data for ref: {photo_reference[:20]}...")
+
+        # --- Open the photo response on the Maps executor ---
+        # places_photo returns a lazy chunk iterator over the HTTP response body.
+        photo_chunks = await maps_io.run(
+            (await gmaps_client.aget()).places_photo, photo_reference=photo_reference, max_width=800
+        )
+
+        # --- Stream the chunks straight into the media store ---
+        public_url = await media_store.put_chunks(photo_object_name(place_id, photo_reference), photo_chunks, "image/jpeg")
+        logger.info(f"Photo uploaded, public URL: {public_url}")
+        await photo_url_cache.aset(photo_reference, public_url)
+        return public_url
+    except Exception as e:
+        logger.error(f"Failed to process photo ref {photo_reference[:20]}: {e}")
+        return None
+
+
+async def stream_place_photos(place_name: str, max_photos: int = 3):
+    """
+    Async generator that finds a place and yields (public_url, display_name) for
+    each photo as soon as its upload finishes, fastest first. Every step is cached.
+    """
+    logger.info(f"Tool processing request for place: '{place_name}'")
+
+    # --- 1. Geocode to find Place ID ---
+    place = await _resolve_place(place_name)
+    place_id = place['place_id']
+    actual_place_name = place['formatted_address']
+    logger.info(f"Found place_id '{place_id}' for '{actual_place_name}'.")
+
+    # --- 2. Get Place Photo References ---
+    details = await _place_photo_references(place_id, actual_place_name)
+
+    # --- 3. Run all upload tasks concurrently, yielding each as it completes ---
+    tasks = [asyncio.ensure_future(_photo_public_url(place_id, ref)) for ref in details['photo_references'][:max_photos]]
+    delivered = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            public_url = await next_done
+            if public_url is not None:
+                delivered += 1
+                yield public_url, details['name']
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not delivered:
         raise ConnectionError(f"Failed to upload any photos for '{actual_place_name}'.")
 
+
+async def fetch_and_upload_place_photos(place_name: str, max_photos: int = 3) -> tuple[list[str], str]:
+    """
+    Finds a place, downloads multiple photos, uploads them to GCS, and returns a
+    list of public HTTPS URLs and the place's display name.
+    """
+    public_urls = []
+    display_name = place_name
+    async for public_url, display_name in stream_place_photos(place_name, max_photos):
+        public_urls.append(public_url)
+
     logger.info(f"Returning {len(public_urls)} public URLs for the frontend.")
-    return public_urls, place_details['result'].get('name', actual_place_name)
+    return public_urls, display_name
+
+
+# Time from tool call to the first / last photo being pushed to the client.
+first_photo_latency = LatencyWindow()
+all_photos_latency = LatencyWindow()
+
+
+def photo_latency_stats() -> dict:
+    return {"first_photo": first_photo_latency.summary(), "all_photos": all_photos_latency.summary()}
+
+
+# --- Cache Inspection and Warming ---
+def place_cache_stats() -> dict:
+    return {cache.name: cache.stats() for cache in (place_id_cache, place_photo_refs_cache, photo_url_cache)}
+
+
+def place_cache_snapshot() -> dict:
+    """Lists the in-memory entries of each place cache level."""
+    return {
+        "place_ids": dict(place_id_cache.memory.items()),
+        "place_photo_refs": dict(place_photo_refs_cache.memory.items()),
+        "photo_urls": dict(photo_url_cache.memory.items()),
+    }
+
+
+async def warm_place_photo_cache(place_names: list[str], max_photos: int = 3, concurrency: int = 4) -> dict:
+    """Pre-fetches photos for popular destinations. Returns {place_name: error or None}."""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def warm(place_name):
+        async with semaphore:
+            try:
+                await fetch_and_upload_place_photos(place_name, max_photos)
+                results[place_name] = None
+            except Exception as e:
+                logger.warning(f"Could not warm photo cache for '{place_name}': {e}")
+                results[place_name] = str(e)
+
+    await asyncio.gather(*(warm(name) for name in place_names))
+    logger.info(f"Warmed place photo cache for {sum(1 for error in results.values() if error is None)}/{len(place_names)} places.")
+    return results
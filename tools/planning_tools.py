@@ -1,158 +1,236 @@
 # tools/planning_tools.py
 
+import time
 import datetime
-import random
 from typing import List, Optional, Dict, Any
 
+from google.adk.tools import ToolContext
+
+from tools.flight_schedule import flight_schedule, parse_date, parse_minutes, SORT_PRICE, SORT_DURATION
+from tools.hotel_inventory import hotel_inventory
+from tools.search_results import SearchResults, query_key, make_option_id
+from tools.reservations import reservation_ledger, flight_hold_items, hotel_hold_items, ReservationUnavailableError
+
 FlightDetails = str
 HotelDetails = str
 
-def flight_search_tool(
+# Options returned per flight search.
+FLIGHT_RESULTS = 4
+
+async def flight_search_tool(
     origin_city: str,
     destination_city: str,
     start_date: str,
     end_date: str,
     adults: int,
+    sort_by: str = "price",
+    max_total_price: int = 0,
+    depart_after: str = "",
+    depart_before: str = "",
+    tool_context: Optional[ToolContext] = None
 ) -> List[Dict[str, Any]]:
     """
-    Searches for flights and returns a list of dictionaries,
-    each representing a flight option.
+    Searches the flight schedule and returns a list of dictionaries, each
+    representing a flight option: one-way when end_date is empty, otherwise a
+    round trip (possibly combining two airlines). Dates are YYYY-MM-DD. sort_by is "price" (cheapest
+    first) or "duration" (fastest first); max_total_price of 0 means no limit;
+    depart_after/depart_before ("HH:MM") restrict the outbound departure time.
+    Prices are totals for all adults. Book an option with its `option_id`.
     """
     is_round_trip = True
     if not end_date or end_date.strip() == "":
         is_round_trip = False
 
-    airlines = ["Indigo", "Vistara", "Air India", "SpiceJet", "Emirates",
-                "Singapore Airlines", "Qatar Airways", "Lufthansa", "British Airways"]
-    mock_flight_options = []
-
-    for _ in range(random.randint(2, 4)):
-        airline = random.choice(airlines)
-        price = random.randint(150, 650) * 100
-        dep_flight_num = f"{airline[:2].upper()}-{random.randint(100, 999)}"
-        dep_hour = random.randint(5, 20)
-        dep_minute = random.choice([0, 15, 30, 45])
-        arr_hour = dep_hour + random.randint(2, 8)
-        arr_minute = random.choice([0, 15, 30, 45])
+    schedule = await flight_schedule.aget()
+    origin = schedule.resolve_city(origin_city)
+    destination = schedule.resolve_city(destination_city)
+    depart_date = parse_date(start_date)
+    return_date = parse_date(end_date) if is_round_trip else None
+    if origin is None or destination is None or origin == destination or depart_date is None or (is_round_trip and return_date is None):
+        return []
 
+    adults = max(1, adults or 1)
+    sort_by = SORT_DURATION if sort_by == SORT_DURATION else SORT_PRICE
+    # Filters are per adult in the schedule.
+    max_fare = max_total_price // adults if max_total_price else 0
+    window = {"depart_after": parse_minutes(depart_after), "depart_before": parse_minutes(depart_before)}
+
+    # "Show those again" is answered from the session's search results.
+    search_results = SearchResults(tool_context.state if tool_context else None)
+    key = query_key("flight", origin, destination, depart_date, return_date,
+                    adults, sort_by, max_total_price, window["depart_after"], window["depart_before"])
+    cached = search_results.get(key)
+    if cached is not None:
+        return cached[0]
+
+    if is_round_trip:
+        trips = schedule.round_trip(origin, destination, depart_date, return_date, top_k=FLIGHT_RESULTS, sort_by=sort_by, max_price=max_fare, **window)
+    else:
+        trips = [(row, None) for row in schedule.one_way(origin, destination, depart_date, top_k=FLIGHT_RESULTS, sort_by=sort_by, max_price=max_fare, **window)]
+
+    flight_options = []
+    results = []
+    for outbound_row, return_row in trips:
+        airline = outbound_airline = schedule.airlines[schedule.airline[outbound_row]]
+        outbound = schedule.leg_dict(outbound_row)
+        price = int(schedule.price[outbound_row]) * adults
         departure_str = (
-            f"DEPART: {airline} {dep_flight_num} from {origin_city} at {dep_hour:02d}:{dep_minute:02d}, "
-            f"arriving {destination_city} at {arr_hour % 24:02d}:{arr_minute:02d}."
+            f"DEPART: {outbound_airline} {outbound['flight_number']} from {outbound['from']} at {outbound['depart_time']}, "
+            f"arriving {outbound['to']} at {outbound['arrive_time']}."
         )
 
         option_dict = {
+            "option_id": "",
             "airline": airline,
             "total_price": 0,
-            "outbound": {
-                "flight_number": dep_flight_num,
-                "from": origin_city,
-                "to": destination_city,
-                "depart_time": f"{dep_hour:02d}:{dep_minute:02d}",
-                "arrive_time": f"{arr_hour % 24:02d}:{arr_minute:02d}"
-            },
+            "outbound": outbound,
             "return": None,
             "description": ""
         }
 
-        if is_round_trip:
-            price += random.randint(140, 600) * 100
-            ret_flight_num = f"{airline[:2].upper()}-{random.randint(100, 999)}"
-            ret_dep_hour = random.randint(5, 20)
-            ret_dep_minute = random.choice([0, 15, 30, 45])
-            ret_arr_hour = ret_dep_hour + random.randint(2, 8)
-            ret_arr_minute = random.choice([0, 15, 30, 45])
-
+        if return_row is not None:
+            price += int(schedule.price[return_row]) * adults
+            inbound = schedule.leg_dict(return_row)
+            return_airline = schedule.airlines[schedule.airline[return_row]]
+            if return_airline != outbound_airline:
+                airline = f"{outbound_airline} + {return_airline}"
             return_str = (
-                f"RETURN: {airline} {ret_flight_num} from {destination_city} at {ret_dep_hour:02d}:{ret_dep_minute:02d}, "
-                f"arriving {origin_city} at {ret_arr_hour % 24:02d}:{ret_arr_minute:02d}."
+                f"RETURN: {return_airline} {inbound['flight_number']} from {inbound['from']} at {inbound['depart_time']}, "
+                f"arriving {inbound['to']} at {inbound['arrive_time']}."
             )
-
-            option_dict["return"] = {
-                "flight_number": ret_flight_num,
-                "from": destination_city,
-                "to": origin_city,
-                "depart_time": f"{ret_dep_hour:02d}:{ret_dep_minute:02d}",
-                "arrive_time": f"{ret_arr_hour % 24:02d}:{ret_arr_minute:02d}"
-            }
+            option_dict["return"] = inbound
             option_dict["description"] = f"Round-Trip with {airline}: {departure_str} {return_str} Total Price: ₹{price}"
         else:
             option_dict["description"] = f"One-Way with {airline}: {departure_str} Price: ₹{price}"
 
+        option_dict["airline"] = airline
         option_dict["total_price"] = price
-        mock_flight_options.append(option_dict)
+        flight_numbers = [outbound["flight_number"]] + ([option_dict["return"]["flight_number"]] if return_row is not None else [])
+        legs = [schedule.leg_key(row) for row in (outbound_row, return_row) if row is not None]
+        option_dict["option_id"] = make_option_id("F", *legs, adults)
+        booking = {
+            "kind": "flight",
+            "trip_type": "round-trip" if return_row is not None else "one-way",
+            "airline": airline,
+            "flight_numbers": flight_numbers,
+            # What a hold reserves seats on; flight numbers are not unique across routes.
+            "legs": legs,
+            "depart_date": depart_date.isoformat(),
+            "return_date": return_date.isoformat() if return_date else None,
+            "adults": adults,
+            "total_price": price,
+        }
+        flight_options.append(option_dict)
+        results.append((option_dict, booking))
 
-    return mock_flight_options
+    search_results.put(key, results)
+    return flight_options
 
 
-def hotel_search_tool(
+async def hotel_search_tool(
     location: str,
     check_in_date: str,
     check_out_date: str,
     number_of_adults: int,
-    budget_per_night: int
-) -> List[Dict[str, Any]]:
+    budget_per_night: int,
+    page: int = 1,
+    tool_context: Optional[ToolContext] = None
+) -> Dict[str, Any]:
     """
-    Searches for hotels and returns a list of structured dictionaries.
+    Searches the hotel inventory and returns one page of structured hotel options,
+    cheapest first. A budget_per_night of 0 means no budget limit. When
+    `total_pages` is greater than `page`, call again with the next page to see more.
+    Book an option with its `option_id`.
     """
-    hotel_database = {
-        "okinawa": [
-            {"name": "Halekulani Okinawa", "price": 35000, "desc": "Luxury 5-star hotel with stunning ocean views."},
-            {"name": "Hyatt Regency Seragaki Island", "price": 25000, "desc": "Resort on its own private island."}
-        ],
-        "paris": [{"name": "Ritz Paris", "price": 80000, "desc": "Iconic luxury hotel near the Louvre."}],
-        "london": [{"name": "The Savoy", "price": 65000, "desc": "Legendary hotel on the River Thames."}],
-    }
+    inventory = await hotel_inventory.aget()
+    adults = max(1, number_of_adults or 1)
+    page = max(1, page or 1)
+    search_results = SearchResults(tool_context.state if tool_context else None)
+    key = query_key("hotel", inventory.resolve(location), check_in_date.strip(), check_out_date.strip(), adults, budget_per_night, page)
+    cached = search_results.get(key)
+    if cached is not None:
+        final_options, meta = cached
+        return {"hotels": final_options, **meta}
+
+    results = inventory.search(location, max_price=budget_per_night, page=page)
 
-    location_key = location.lower()
-    options_in_location = []
-    for key in hotel_database:
-        if key in location_key:
-            options_in_location = hotel_database[key]
-            break
+    final_options = []
+    stored = []
+    for hotel in results["hotels"]:
+        hotel_dict = {
+            "option_id": make_option_id("H", results["location"], hotel["name"], check_in_date, check_out_date, adults),
+            "name": hotel["name"],
+            "price_per_night": hotel["price"],
+            "description": hotel["description"],
+        }
+        booking = {
+            "kind": "hotel",
+            "name": hotel["name"],
+            "location": hotel["location"],
+            "check_in_date": check_in_date,
+            "check_out_date": check_out_date,
+            "adults": adults,
+            "price_per_night": hotel["price"],
+        }
+        final_options.append(hotel_dict)
+        stored.append((hotel_dict, booking))
 
-    if not options_in_location:
-        return []
+    meta = {
+        "total_results": results["total"],
+        "page": results["page"],
+        "total_pages": results["pages"],
+    }
+    search_results.put(key, stored, meta)
+    return {"hotels": final_options, **meta}
 
-    final_options = []
-    for hotel in options_in_location:
-        if budget_per_night == 0 or hotel["price"] <= budget_per_night:
-            hotel_dict = {
-                "name": hotel["name"],
-                "price_per_night": hotel["price"],
-                "description": hotel["desc"],
-                "full_details_string": f"{hotel['name']}: {hotel['desc']} Price: ₹{hotel['price']}/night."
-            }
-            final_options.append(hotel_dict)
-
-    if not final_options:
-        return []
 
-    return final_options
+def _hold_minutes(hold: dict) -> int:
+    return max(1, round((hold["expires_at"] - time.time()) / 60))
 
 
-def mock_book_flight(flight_details: str, number_of_adults: int, trip_type: str) -> str:
+async def mock_book_flight(option_id: str, tool_context: Optional[ToolContext] = None) -> str:
     """
-    Simulates booking a selected flight for a number of adults.
+    Places a temporary hold on the seats of a flight option from the session's search results, given its `option_id`.
     """
-    flight_number = flight_details.split(':')[0]
-    confirmation_id = f"HLD{random.randint(100000, 999999)}"
+    booking = SearchResults(tool_context.state if tool_context else None).lookup(option_id, "flight")
+    if booking is None:
+        return f"Error: flight option {option_id} is not in the current search results. Search again and use one of the returned option ids."
+    flight_numbers = " and ".join(booking["flight_numbers"])
+    # Asking twice for the same option in a session returns the same hold.
+    idempotency_key = f"{tool_context.session.id}:{option_id.strip().upper()}"
+    try:
+        hold = await (await reservation_ledger.aget()).hold(idempotency_key, flight_hold_items(booking), prefix="HLD",
+                                                   session_id=tool_context.session.id, details=booking)
+    except ReservationUnavailableError:
+        return f"Sorry, {flight_numbers} no longer has {booking['adults']} seat(s) available. Please pick another option."
 
     return (
-        f"Alright, I've placed a temporary hold on the {trip_type} reservation for {number_of_adults} adult(s) on {flight_number}. "
-        f"Your reservation ID is {confirmation_id}. "
+        f"Alright, I've placed a temporary hold on the {booking['trip_type']} reservation for {booking['adults']} adult(s) on {flight_numbers}. "
+        f"Your reservation ID is {hold['hold_id']}, held for {_hold_minutes(hold)} minutes. "
         "To complete the booking, you'll need to follow the payment link I've sent to your email. What's next?"
     )
 
 
-def mock_book_hotel(hotel_details: str, number_of_adults: int) -> str:
+async def mock_book_hotel(option_id: str, tool_context: Optional[ToolContext] = None) -> str:
     """
-    Simulates placing a hold on a selected hotel room.
+    Places a temporary hold on rooms for every night of a hotel option from the session's search results, given its `option_id`.
     """
-    hotel_name = hotel_details.split(':')[0]
-    confirmation_id = f"STAY{random.randint(100000, 999999)}"
+    booking = SearchResults(tool_context.state if tool_context else None).lookup(option_id, "hotel")
+    if booking is None:
+        return f"Error: hotel option {option_id} is not in the current search results. Search again and use one of the returned option ids."
+    try:
+        items = hotel_hold_items(booking)
+    except ValueError:
+        return f"Error: the stay from {booking['check_in_date']} to {booking['check_out_date']} is not a valid date range (YYYY-MM-DD). Search again with valid dates."
+    idempotency_key = f"{tool_context.session.id}:{option_id.strip().upper()}"
+    try:
+        hold = await (await reservation_ledger.aget()).hold(idempotency_key, items, prefix="STAY",
+                                                   session_id=tool_context.session.id, details=booking)
+    except ReservationUnavailableError:
+        return f"Sorry, {booking['name']} is fully booked for some of those nights. Please pick another option."
 
     return (
-        f"Okay, I've successfully placed a hold on your stay for {number_of_adults} adult(s) at {hotel_name}. "
-        f"Your reservation ID is {confirmation_id}. "
+        f"Okay, I've successfully placed a hold on your stay for {booking['adults']} adult(s) at {booking['name']}. "
+        f"Your reservation ID is {hold['hold_id']}, held for {_hold_minutes(hold)} minutes. "
         "Please follow the secure payment link I've sent to your email to confirm your booking. Can I help with anything else?"
     )
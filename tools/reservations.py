@@ -0,0 +1,335 @@
+# tools/reservations.py
+
+import os
+import json
+import math
+import time
+import heapq
+import asyncio
+import datetime
+import logging
+import secrets
+import sqlite3
+import threading
+
+from tools.clients import clients
+from tools.io_pool import ledger_io
+from tools.flight_schedule import parse_date
+
+logger = logging.getLogger(__name__)
+
+# --- Reservation Ledger ---
+# The booking tools place holds in a SQLite file (WAL mode) shared by every worker
+# process. A hold takes units of one or more resources - seats on a flight on a
+# date, or rooms at a hotel for one night - in a single BEGIN IMMEDIATE
+# transaction that checks each resource's remaining capacity, so concurrent
+# sessions in any worker can never oversell. Each hold has an idempotency key:
+# placing it again returns the original hold instead of taking more capacity.
+# Holds lapse after RESERVATION_HOLD_SECONDS. Every hold transaction first
+# releases lapsed holds, and a sweeper task keeps a heap of expiry times and
+# releases each lapsed hold when it is due.
+RESERVATION_DB_PATH = os.getenv("RESERVATION_DB_PATH", "reservations.sqlite3")
+RESERVATION_HOLD_SECONDS = float(os.getenv("RESERVATION_HOLD_SECONDS", "900"))
+# Longest the sweeper sleeps, so holds placed by other workers are released on time too.
+RESERVATION_SWEEP_SECONDS = float(os.getenv("RESERVATION_SWEEP_SECONDS", "30"))
+# Capacity of a resource the first time it is held.
+FLIGHT_SEATS = int(os.getenv("FLIGHT_SEATS", "180"))
+HOTEL_ROOMS = int(os.getenv("HOTEL_ROOMS", "10"))
+GUESTS_PER_ROOM = 2
+
+HELD, CONFIRMED, RELEASED, EXPIRED = "held", "confirmed", "released", "expired"
+
+
+class ReservationUnavailableError(Exception):
+    """Raised when a resource has fewer units left than a hold asks for."""
+
+    def __init__(self, resource: str, requested: int, available: int):
+        super().__init__(f"Only {available} of {requested} requested units left for {resource}.")
+        self.resource = resource
+        self.requested = requested
+        self.available = available
+
+
+def flight_hold_items(booking: dict, seats: int = FLIGHT_SEATS) -> list[tuple[str, int, int]]:
+    """(resource, units, capacity) of a flight option from tools.search_results: seats on each leg."""
+    return [(f"flight:{leg}", booking["adults"], seats) for leg in booking["legs"]]
+
+
+def hotel_hold_items(booking: dict, rooms: int = HOTEL_ROOMS) -> list[tuple[str, int, int]]:
+    """(resource, units, capacity) of a hotel option: the rooms it needs on each night of the stay."""
+    check_in, check_out = parse_date(booking["check_in_date"]), parse_date(booking["check_out_date"])
+    if check_in is None or check_out is None or check_out <= check_in:
+        raise ValueError("A hotel hold needs a check-out date after the check-in date.")
+    needed = math.ceil(booking["adults"] / GUESTS_PER_ROOM)
+    nights = (check_out - check_in).days
+    return [
+        (f"hotel:{booking['location'].casefold()}:{booking['name']}:{(check_in + datetime.timedelta(days=night)).isoformat()}", needed, rooms)
+        for night in range(nights)
+    ]
+
+
+class ReservationLedger:
+    """Capacity per resource and the holds against it, in a SQLite file shared across processes."""
+
+    def __init__(self, path: str = RESERVATION_DB_PATH, hold_seconds: float = RESERVATION_HOLD_SECONDS):
+        self.path = path
+        self.hold_seconds = hold_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS inventory (
+                resource TEXT PRIMARY KEY, capacity INTEGER NOT NULL, held INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS holds (
+                hold_id TEXT PRIMARY KEY, idempotency_key TEXT UNIQUE, session_id TEXT,
+                status TEXT NOT NULL, details TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS holds_by_expiry ON holds (status, expires_at);
+            CREATE TABLE IF NOT EXISTS hold_items (
+                hold_id TEXT NOT NULL, resource TEXT NOT NULL, units INTEGER NOT NULL,
+                PRIMARY KEY (hold_id, resource)
+            );
+        """)
+        # (expires_at, hold_id) of holds placed by this process; the sweeper sleeps until the first.
+        self._expiries: list[tuple[float, str]] = []
+        self._wakeup: asyncio.Event | None = None
+        self.placed = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.released = 0
+        self.confirmed = 0
+        self.expired = 0
+
+    # --- Public API (async; SQLite runs on the ledger executor) ---
+    async def hold(self, idempotency_key: str, items: list[tuple[str, int, int]], prefix: str = "HLD",
+                   session_id: str | None = None, details: dict | None = None, hold_seconds: float | None = None) -> dict:
+        """
+        Holds `units` of every (resource, units, capacity) item, all or nothing, and
+        returns the hold. Raises ReservationUnavailableError if any resource is short.
+        A live hold with the same idempotency key is returned as is ("replayed": True).
+        """
+        hold = await ledger_io.run(self._hold, idempotency_key, items, prefix, session_id, details or {},
+                                   self.hold_seconds if hold_seconds is None else hold_seconds)
+        if hold["replayed"]:
+            self.replayed += 1
+        else:
+            self.placed += 1
+            self._schedule_expiry(hold["expires_at"], hold["hold_id"])
+        return hold
+
+    async def release(self, hold_id: str) -> bool:
+        """Gives a live hold's capacity back. Returns False if it is not held (any more)."""
+        released = await ledger_io.run(self._finish, hold_id, RELEASED)
+        self.released += released
+        return released
+
+    async def confirm(self, hold_id: str) -> bool:
+        """Turns a live hold into a booking that keeps its capacity and never lapses."""
+        confirmed = await ledger_io.run(self._finish, hold_id, CONFIRMED)
+        self.confirmed += confirmed
+        return confirmed
+
+    async def get(self, hold_id: str) -> dict | None:
+        return await ledger_io.run(self._get, hold_id)
+
+    async def expire_lapsed(self) -> int:
+        """Releases every lapsed hold, whichever process placed it."""
+        expired = await ledger_io.run(self._expire_lapsed_now)
+        self.expired += expired
+        return expired
+
+    async def run_sweeper(self):
+        """Releases lapsed holds as they come due, and all of them periodically, until cancelled."""
+        self._wakeup = asyncio.Event()
+        for expires_at, hold_id in await ledger_io.run(self._live_holds):
+            heapq.heappush(self._expiries, (expires_at, hold_id))
+        last_sweep = 0.0
+        while True:
+            now = time.time()
+            due = now - last_sweep >= RESERVATION_SWEEP_SECONDS
+            while self._expiries and self._expiries[0][0] <= now:
+                heapq.heappop(self._expiries)
+                due = True
+            if due:
+                last_sweep = now
+                try:
+                    expired = await self.expire_lapsed()
+                except sqlite3.Error as e:
+                    logger.warning(f"Reservation sweep failed: {e}")
+                    continue
+                if expired:
+                    logger.info(f"Released {expired} lapsed reservation hold(s).")
+                continue
+            # Cleared before reading the heap, so a hold scheduled meanwhile still wakes us.
+            self._wakeup.clear()
+            next_due = last_sweep + RESERVATION_SWEEP_SECONDS
+            if self._expiries:
+                next_due = min(next_due, self._expiries[0][0])
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_due - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def stats(self) -> dict:
+        by_status, resources, held, capacity = await ledger_io.run(self._inventory_stats)
+        return {
+            "path": self.path,
+            "hold_seconds": self.hold_seconds,
+            "holds": by_status,
+            "resources": resources,
+            "units_held": held or 0,
+            "units_capacity": capacity or 0,
+            "placed": self.placed,
+            "replayed": self.replayed,
+            "rejected": self.rejected,
+            "released": self.released,
+            "confirmed": self.confirmed,
+            "expired": self.expired,
+            "pending_expiries": len(self._expiries),
+        }
+
+    def _inventory_stats(self):
+        with self._lock:
+            by_status = dict(self._conn.execute("SELECT status, COUNT(*) FROM holds GROUP BY status").fetchall())
+            resources, held, capacity = self._conn.execute("SELECT COUNT(*), SUM(held), SUM(capacity) FROM inventory").fetchone()
+        return by_status, resources, held, capacity
+
+    def _schedule_expiry(self, expires_at: float, hold_id: str):
+        earliest = self._expiries[0][0] if self._expiries else None
+        heapq.heappush(self._expiries, (expires_at, hold_id))
+        if self._wakeup is not None and (earliest is None or expires_at < earliest):
+            self._wakeup.set()
+
+    # --- Transactions (run on the ledger executor) ---
+    def _hold(self, idempotency_key, items, prefix, session_id, details, hold_seconds):
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so the capacity checks below
+            # cannot interleave with another process's hold.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT hold_id, status, expires_at FROM holds WHERE idempotency_key = ?", (idempotency_key,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] == CONFIRMED or (row[1] == HELD and row[2] > now):
+                        self._conn.execute("COMMIT")
+                        return {**self._get_locked(row[0]), "replayed": True}
+                    # The earlier hold is gone; the key may be used again.
+                    self._conn.execute("UPDATE holds SET idempotency_key = NULL WHERE hold_id = ?", (row[0],))
+                expired = self._expire_lapsed(now)
+                for resource, units, capacity in items:
+                    self._conn.execute("INSERT OR IGNORE INTO inventory (resource, capacity, held) VALUES (?, ?, 0)", (resource, capacity))
+                    cursor = self._conn.execute(
+                        "UPDATE inventory SET held = held + ? WHERE resource = ? AND held + ? <= capacity", (units, resource, units)
+                    )
+                    if cursor.rowcount == 0:
+                        available = self._conn.execute("SELECT capacity - held FROM inventory WHERE resource = ?", (resource,)).fetchone()[0]
+                        self._conn.execute("ROLLBACK")
+                        self.rejected += 1
+                        raise ReservationUnavailableError(resource, units, available)
+                hold_id = f"{prefix}{secrets.token_hex(4).upper()}"
+                expires_at = now + hold_seconds
+                self._conn.execute(
+                    "INSERT INTO holds (hold_id, idempotency_key, session_id, status, details, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (hold_id, idempotency_key, session_id, HELD, json.dumps(details), now, expires_at),
+                )
+                self._conn.executemany(
+                    "INSERT INTO hold_items (hold_id, resource, units) VALUES (?, ?, ?)",
+                    [(hold_id, resource, units) for resource, units, _capacity in items],
+                )
+                self._conn.execute("COMMIT")
+                self.expired += expired
+            except sqlite3.Error:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return {
+            "hold_id": hold_id,
+            "status": HELD,
+            "session_id": session_id,
+            "details": details,
+            "items": {resource: units for resource, units, _capacity in items},
+            "expires_at": expires_at,
+            "replayed": False,
+        }
+
+    def _finish(self, hold_id, status) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT status, expires_at FROM holds WHERE hold_id = ?", (hold_id,)).fetchone()
+                if row is None or row[0] != HELD or row[1] <= now:
+                    self._conn.execute("COMMIT")
+                    return False
+                if status == RELEASED:
+                    self._release_items(self._conn.execute("SELECT resource, units FROM hold_items WHERE hold_id = ?", (hold_id,)).fetchall())
+                self._conn.execute("UPDATE holds SET status = ? WHERE hold_id = ?", (status, hold_id))
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _expire_lapsed_now(self) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = self._expire_lapsed(time.time())
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return expired
+
+    def _expire_lapsed(self, now: float) -> int:
+        """Inside a transaction: marks lapsed holds expired and gives their units back."""
+        self._release_items(self._conn.execute(
+            "SELECT i.resource, SUM(i.units) FROM holds h JOIN hold_items i ON i.hold_id = h.hold_id "
+            "WHERE h.status = ? AND h.expires_at <= ? GROUP BY i.resource", (HELD, now)
+        ).fetchall())
+        return self._conn.execute("UPDATE holds SET status = ? WHERE status = ? AND expires_at <= ?", (EXPIRED, HELD, now)).rowcount
+
+    def _release_items(self, items):
+        self._conn.executemany("UPDATE inventory SET held = held - ? WHERE resource = ?", [(units, resource) for resource, units in items])
+
+    def _live_holds(self) -> list[tuple[float, str]]:
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute("SELECT expires_at, hold_id FROM holds WHERE status = ?", (HELD,))]
+
+    def _get(self, hold_id):
+        with self._lock:
+            return self._get_locked(hold_id)
+
+    def _get_locked(self, hold_id) -> dict | None:
+        row = self._conn.execute(
+            "SELECT hold_id, status, session_id, details, expires_at FROM holds WHERE hold_id = ?", (hold_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        items = self._conn.execute("SELECT resource, units FROM hold_items WHERE hold_id = ?", (hold_id,)).fetchall()
+        status = EXPIRED if row[1] == HELD and row[4] <= time.time() else row[1]
+        return {
+            "hold_id": row[0],
+            "status": status,
+            "session_id": row[2],
+            "details": json.loads(row[3]),
+            "items": dict(items),
+            "expires_at": row[4],
+            "replayed": False,
+        }
+
+
+# Opened by the startup warm-up, or on the first booking if warm-up is off.
+reservation_ledger = clients.register("reservation_ledger", ReservationLedger)
+
+
+async def run_reservation_sweeper():
+    """The lifespan task: opens the ledger off the event loop, then sweeps lapsed holds."""
+    ledger = await reservation_ledger.aget()
+    await ledger.run_sweeper()
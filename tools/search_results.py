@@ -0,0 +1,100 @@
+# tools/search_results.py
+
+import os
+import time
+import base64
+import hashlib
+
+# --- Per-session Search Results ---
+# Flight and hotel searches are memoized in the ADK session state (so they are
+# persisted by the session store and survive reconnects), keyed by the
+# normalized query, and expire after SEARCH_RESULTS_TTL_SECONDS. Every option
+# gets a short id derived from what it would book ("F3KQ9V2MA", "HV2M7C4XD"), so
+# the same flight or room keeps its id across searches, and the booking tools look
+# the option up by id instead of parsing text the model echoes back. The id is a
+# hash, so on the rare collision with a different live option it gets a suffix.
+SEARCH_RESULTS_STATE_KEY = "search_results"
+SEARCH_RESULTS_TTL_SECONDS = float(os.getenv("SEARCH_RESULTS_TTL_SECONDS", "1800"))
+SEARCH_RESULTS_MAX_QUERIES = int(os.getenv("SEARCH_RESULTS_MAX_QUERIES", "16"))
+OPTION_ID_LENGTH = 8
+
+
+def query_key(kind: str, *params) -> str:
+    """A state-safe key for a search from its already-resolved parameters."""
+    return "|".join([kind, *("" if param is None else str(param).casefold() for param in params)])
+
+
+def make_option_id(prefix: str, *identity) -> str:
+    """A short id that only depends on what the option books, e.g. F + 8 base32 chars."""
+    digest = hashlib.blake2b("|".join(map(str, identity)).encode(), digest_size=5).digest()
+    return prefix + base64.b32encode(digest).decode()[:OPTION_ID_LENGTH]
+
+
+class SearchResults:
+    """
+    One session's memoized searches. `state` is the ADK session state (for
+    example ToolContext.state) or None, in which case nothing is remembered.
+    ADK records a state change only when a key is assigned, so every update
+    writes the whole entry back.
+    """
+
+    def __init__(self, state=None):
+        self.state = state
+        stored = state.get(SEARCH_RESULTS_STATE_KEY) if state is not None else None
+        # query key -> {"expires_at", "ids", "meta"}; option id -> {"expires_at", "option", "booking"}
+        self.queries: dict[str, dict] = dict(stored["queries"]) if stored else {}
+        self.options: dict[str, dict] = dict(stored["options"]) if stored else {}
+
+    def get(self, key: str) -> tuple[list[dict], dict] | None:
+        """The options (as returned to the model) and extra fields of a live search, or None."""
+        entry = self.queries.get(key)
+        if entry is None or entry["expires_at"] < time.time():
+            return None
+        if any(option_key not in self.options for option_key in entry["ids"]):
+            return None
+        return [self.options[option_key]["option"] for option_key in entry["ids"]], entry["meta"]
+
+    def put(self, key: str, results: list[tuple[dict, dict]], meta: dict | None = None):
+        """
+        Remembers a search. `results` are (option, booking) pairs; each option
+        must carry its "option_id", and `booking` is what the booking tool needs.
+        An id already taken by a different live option is made unique in place.
+        """
+        now = time.time()
+        expires_at = now + SEARCH_RESULTS_TTL_SECONDS
+        for option, booking in results:
+            option_id = base_id = option["option_id"]
+            suffix = 1
+            while (taken := self.options.get(option_id)) is not None and taken["expires_at"] >= now and taken["booking"] != booking:
+                suffix += 1
+                option_id = f"{base_id}{suffix}"
+            option["option_id"] = option_id
+            self.options[option_id] = {"expires_at": expires_at, "option": option, "booking": booking}
+        # Re-inserting keeps the dict in least recently searched order.
+        self.queries.pop(key, None)
+        self.queries[key] = {"expires_at": expires_at, "ids": [option["option_id"] for option, _ in results], "meta": meta or {}}
+        self._prune()
+        self._save()
+
+    def lookup(self, option_key: str, kind: str | None = None) -> dict | None:
+        """The booking details of a live option, by id (case-insensitive)."""
+        entry = self.options.get((option_key or "").strip().upper())
+        if entry is None or entry["expires_at"] < time.time():
+            return None
+        if kind and entry["booking"].get("kind") != kind:
+            return None
+        return entry["booking"]
+
+    def _prune(self):
+        now = time.time()
+        for key in [key for key, entry in self.queries.items() if entry["expires_at"] < now]:
+            del self.queries[key]
+        while len(self.queries) > SEARCH_RESULTS_MAX_QUERIES:
+            del self.queries[next(iter(self.queries))]
+        referenced = {option_key for entry in self.queries.values() for option_key in entry["ids"]}
+        for option_key in [option_key for option_key in self.options if option_key not in referenced]:
+            del self.options[option_key]
+
+    def _save(self):
+        if self.state is not None:
+            self.state[SEARCH_RESULTS_STATE_KEY] = {"queries": self.queries, "options": self.options}
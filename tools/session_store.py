@@ -0,0 +1,656 @@
+# tools/session_store.py
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Any
+
+from google.adk.events.event import Event
+from google.adk.sessions import InMemorySessionService, Session, State
+from google.adk.sessions.base_session_service import BaseSessionService, GetSessionConfig, ListSessionsResponse
+
+from tools.io_pool import session_io
+
+logger = logging.getLogger(__name__)
+
+# --- Session Store Selection ---
+# "sqlite" - an append-only event log per session in a local SQLite file (WAL mode).
+# "redis"  - the same layout in a Redis-compatible server, shared by several nodes
+#            (needs the optional `redis` package).
+# "memory" - ADK's InMemorySessionService; nothing survives a restart.
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE", "sqlite").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite3")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_REDIS_PREFIX = os.getenv("SESSION_REDIS_PREFIX", "odyssey:sessions")
+# Sessions not updated for this long are garbage-collected.
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+# Every this many appended events the session-scoped state is snapshotted with the log
+# position it covers, so a load replays state deltas from at most this many events.
+SESSION_SNAPSHOT_EVERY = int(os.getenv("SESSION_SNAPSHOT_EVERY", "50"))
+# Events a load returns when the caller does not limit them (0: the whole history).
+# Older events stay in the log; a load never reads more than these plus the
+# events since the snapshot.
+SESSION_LOAD_RECENT_EVENTS = int(os.getenv("SESSION_LOAD_RECENT_EVENTS", "100"))
+SESSION_GC_INTERVAL_SECONDS = float(os.getenv("SESSION_GC_INTERVAL_SECONDS", "600"))
+
+# State with these prefixes is not session-scoped: app/user state is stored once per
+# app/user and merged in on load, temp state is never persisted.
+_SCOPED_PREFIXES = (State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX)
+
+
+def _session_state(state: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in state.items() if not key.startswith(_SCOPED_PREFIXES)}
+
+
+def _snapshot(session: Session, offset: int) -> str:
+    """The session without its events, with its session-scoped state as of log position `offset`."""
+    snapshot = session.model_copy(update={"state": _session_state(session.state), "events": []})
+    return json.dumps({"offset": offset, "session": snapshot.model_dump(mode="json", exclude_none=True)})
+
+
+def _snapshot_offset(snapshot: str) -> int:
+    # Snapshots written before they carried an offset hold the events; their log is all newer.
+    return json.loads(snapshot).get("offset", 0)
+
+
+def _scoped_deltas(delta: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
+    app_delta = {key.removeprefix(State.APP_PREFIX): value for key, value in delta.items() if key.startswith(State.APP_PREFIX)}
+    user_delta = {key.removeprefix(State.USER_PREFIX): value for key, value in delta.items() if key.startswith(State.USER_PREFIX)}
+    return app_delta, user_delta
+
+
+# =========================================================================
+# === STORAGE BACKENDS ===
+# =========================================================================
+# A backend stores, per session, the append-only log of its events (its history),
+# a snapshot (the session without its events, with the log position it covers) and
+# app- and user-scoped state. Keys are (app_name, user_id, session_id). Log
+# positions increase with every append.
+
+class SQLiteSessionStore:
+    """Session snapshots and event logs in a local SQLite file (WAL mode)."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a crash can lose the last commits only on power loss, not on a process crash.
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL,
+                snapshot TEXT NOT NULL, updated_at REAL NOT NULL, expires_at REAL NOT NULL,
+                PRIMARY KEY (app_name, user_id, session_id)
+            );
+            CREATE TABLE IF NOT EXISTS session_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL,
+                event TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS session_events_by_session ON session_events (app_name, user_id, session_id, id);
+            CREATE TABLE IF NOT EXISTS scoped_state (scope TEXT PRIMARY KEY, state TEXT NOT NULL);
+        """)
+
+    async def create(self, key: tuple[str, str, str], snapshot: str, updated_at: float):
+        await session_io.run(self._create, key, snapshot, updated_at)
+
+    async def load(self, key: tuple[str, str, str], recent: int | None = None) -> tuple[str, float, list[tuple[int, str]]] | None:
+        """
+        Returns (snapshot, updated_at, logged events as (position, event)): the events
+        after the snapshot plus the last `recent` ones, or the whole log if `recent` is None.
+        """
+        return await session_io.run(self._load, key, recent)
+
+    async def append(self, key: tuple[str, str, str], event: str, updated_at: float) -> int | None:
+        """Appends one event; returns its log position, or None if the session is gone."""
+        return await session_io.run(self._append, key, event, updated_at)
+
+    async def write_snapshot(self, key: tuple[str, str, str], snapshot: str):
+        """Replaces the snapshot; the log is kept, it is the session's history."""
+        await session_io.run(self._write_snapshot, key, snapshot)
+
+    async def delete(self, key: tuple[str, str, str]):
+        await session_io.run(self._delete, key)
+
+    async def list(self, app_name: str, user_id: str | None) -> list[tuple[str, str, float]]:
+        """Returns (user_id, session_id, updated_at) of live sessions, oldest update first."""
+        return await session_io.run(self._list, app_name, user_id)
+
+    async def get_scoped_state(self, scope: str) -> dict[str, Any]:
+        return await session_io.run(self._get_scoped_state, scope)
+
+    async def update_scoped_state(self, scope: str, delta: dict[str, Any]):
+        await session_io.run(self._update_scoped_state, scope, delta)
+
+    async def purge_expired(self) -> int:
+        return await session_io.run(self._purge_expired)
+
+    async def stats(self) -> dict:
+        return await session_io.run(self._stats)
+
+    def _stats(self):
+        with self._lock:
+            sessions = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            events = self._conn.execute("SELECT COUNT(*) FROM session_events").fetchone()[0]
+        return {"backend": self.name, "path": self.path, "sessions": sessions, "logged_events": events}
+
+    def _create(self, key, snapshot, updated_at):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (app_name, user_id, session_id, snapshot, updated_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, snapshot, updated_at, time.time() + self.ttl_seconds),
+            )
+            self._conn.execute("COMMIT")
+
+    def _load(self, key, recent):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT snapshot, updated_at, expires_at FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            ).fetchone()
+            if row is None or row[2] < time.time():
+                return None
+            if recent is None:
+                events = self._conn.execute(
+                    "SELECT id, event FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY id", key
+                ).fetchall()
+            else:
+                events = self._conn.execute(
+                    "SELECT id, event FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ? AND id > ? "
+                    "UNION SELECT * FROM (SELECT id, event FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ? "
+                    "ORDER BY id DESC LIMIT ?) ORDER BY id",
+                    (*key, _snapshot_offset(row[0]), *key, recent),
+                ).fetchall()
+        return row[0], row[1], [tuple(event) for event in events]
+
+    def _append(self, key, event, updated_at):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            cursor = self._conn.execute(
+                "UPDATE sessions SET updated_at = ?, expires_at = ? WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (updated_at, time.time() + self.ttl_seconds, *key),
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute("ROLLBACK")
+                return None
+            cursor = self._conn.execute(
+                "INSERT INTO session_events (app_name, user_id, session_id, event) VALUES (?, ?, ?, ?)", (*key, event)
+            )
+            self._conn.execute("COMMIT")
+        return cursor.lastrowid
+
+    def _write_snapshot(self, key, snapshot):
+        with self._lock:
+            self._conn.execute("UPDATE sessions SET snapshot = ? WHERE app_name = ? AND user_id = ? AND session_id = ?", (snapshot, *key))
+
+    def _delete(self, key):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+            self._conn.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+            self._conn.execute("COMMIT")
+
+    def _list(self, app_name, user_id):
+        query = "SELECT user_id, session_id, updated_at FROM sessions WHERE app_name = ? AND expires_at >= ?"
+        params = [app_name, time.time()]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY updated_at", params).fetchall()
+        return [tuple(row) for row in rows]
+
+    def _get_scoped_state(self, scope):
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM scoped_state WHERE scope = ?", (scope,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _update_scoped_state(self, scope, delta):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            row = self._conn.execute("SELECT state FROM scoped_state WHERE scope = ?", (scope,)).fetchone()
+            state = json.loads(row[0]) if row else {}
+            state.update(delta)
+            self._conn.execute("INSERT OR REPLACE INTO scoped_state (scope, state) VALUES (?, ?)", (scope, json.dumps(state)))
+            self._conn.execute("COMMIT")
+
+    def _purge_expired(self):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "DELETE FROM session_events WHERE (app_name, user_id, session_id) IN "
+                "(SELECT app_name, user_id, session_id FROM sessions WHERE expires_at < ?)",
+                (now,),
+            )
+            cursor = self._conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+            self._conn.execute("COMMIT")
+        return cursor.rowcount
+
+
+class RedisSessionStore:
+    """
+    The same layout in a Redis-compatible server: a snapshot string, an event list and
+    a meta key per session, all expiring together. TTLs are refreshed on every append,
+    so Redis itself garbage-collects idle sessions.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = SESSION_REDIS_PREFIX, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = int(ttl_seconds)
+
+    def _keys(self, key: tuple[str, str, str]) -> tuple[str, str, str]:
+        base = f"{self.prefix}:{':'.join(key)}"
+        return f"{base}:snapshot", f"{base}:log", f"{base}:meta"
+
+    def _index(self, app_name: str) -> str:
+        return f"{self.prefix}:index:{app_name}"
+
+    @staticmethod
+    def _index_member(user_id: str, session_id: str) -> str:
+        return json.dumps([user_id, session_id])
+
+    async def create(self, key, snapshot: str, updated_at: float):
+        snapshot_key, log_key, meta_key = self._keys(key)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(log_key)
+            pipe.set(snapshot_key, snapshot, ex=self.ttl_seconds)
+            pipe.set(meta_key, str(updated_at), ex=self.ttl_seconds)
+            pipe.sadd(self._index(key[0]), self._index_member(key[1], key[2]))
+            await pipe.execute()
+
+    async def load(self, key, recent: int | None = None):
+        snapshot_key, log_key, meta_key = self._keys(key)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(meta_key)
+            pipe.get(snapshot_key)
+            pipe.llen(log_key)
+            updated_at, snapshot, length = await pipe.execute()
+        if updated_at is None or snapshot is None:
+            return None
+        # A list entry's position is the list length right after it was pushed.
+        start = 0 if recent is None else max(0, min(_snapshot_offset(snapshot), length - recent))
+        events = await self.client.lrange(log_key, start, -1)
+        return snapshot, float(updated_at), list(enumerate(events, start=start + 1))
+
+    async def append(self, key, event: str, updated_at: float) -> int | None:
+        snapshot_key, log_key, meta_key = self._keys(key)
+        if not await self.client.exists(meta_key):
+            return None
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.rpush(log_key, event)
+            pipe.expire(log_key, self.ttl_seconds)
+            pipe.expire(snapshot_key, self.ttl_seconds)
+            pipe.set(meta_key, str(updated_at), ex=self.ttl_seconds)
+            length, *_ = await pipe.execute()
+        return length
+
+    async def write_snapshot(self, key, snapshot: str):
+        await self.client.set(self._keys(key)[0], snapshot, ex=self.ttl_seconds)
+
+    async def delete(self, key):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(*self._keys(key))
+            pipe.srem(self._index(key[0]), self._index_member(key[1], key[2]))
+            await pipe.execute()
+
+    async def list(self, app_name: str, user_id: str | None) -> list[tuple[str, str, float]]:
+        index = self._index(app_name)
+        members = [
+            member for member in await self.client.smembers(index)
+            if user_id is None or json.loads(member)[0] == user_id
+        ]
+        keys = [tuple(json.loads(member)) for member in members]
+        async with self.client.pipeline(transaction=False) as pipe:
+            for member_user_id, session_id in keys:
+                pipe.get(self._keys((app_name, member_user_id, session_id))[2])
+            updated = await pipe.execute()
+        sessions, expired = [], []
+        for member, (member_user_id, session_id), updated_at in zip(members, keys, updated):
+            if updated_at is None:
+                expired.append(member)
+            else:
+                sessions.append((member_user_id, session_id, float(updated_at)))
+        if expired:
+            # Redis expired the session itself; drop the index entries lazily.
+            await self.client.srem(index, *expired)
+        return sorted(sessions, key=lambda session: session[2])
+
+    async def get_scoped_state(self, scope: str) -> dict[str, Any]:
+        values = await self.client.hgetall(f"{self.prefix}:state:{scope}")
+        return {field: json.loads(value) for field, value in values.items()}
+
+    async def update_scoped_state(self, scope: str, delta: dict[str, Any]):
+        await self.client.hset(f"{self.prefix}:state:{scope}", mapping={field: json.dumps(value) for field, value in delta.items()})
+
+    async def purge_expired(self) -> int:
+        return 0  # Keys carry their own TTL.
+
+    async def stats(self) -> dict:
+        return {"backend": self.name, "prefix": self.prefix}
+
+
+class FakeRedis:
+    """
+    In-process stand-in for redis.asyncio (decode_responses=True) covering the commands
+    RedisSessionStore uses, including key expiry. For tests and local runs without Redis.
+    """
+
+    def __init__(self):
+        self._data: dict[str, Any] = {}
+        self._expires: dict[str, float] = {}
+
+    def pipeline(self, transaction: bool = True) -> "FakeRedisPipeline":
+        return FakeRedisPipeline(self)
+
+    def _live(self, name: str):
+        deadline = self._expires.get(name)
+        if deadline is not None and deadline <= time.time():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+        return self._data.get(name)
+
+    async def exists(self, *names: str) -> int:
+        return sum(1 for name in names if self._live(name) is not None)
+
+    async def get(self, name: str):
+        return self._live(name)
+
+    async def set(self, name: str, value, ex: int | None = None):
+        self._data[name] = str(value)
+        self._expires.pop(name, None)
+        if ex is not None:
+            self._expires[name] = time.time() + ex
+        return True
+
+    async def delete(self, *names: str) -> int:
+        deleted = 0
+        for name in names:
+            if self._live(name) is not None:
+                deleted += 1
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+        return deleted
+
+    async def expire(self, name: str, seconds: int) -> bool:
+        if self._live(name) is None:
+            return False
+        self._expires[name] = time.time() + seconds
+        return True
+
+    async def rpush(self, name: str, *values: str) -> int:
+        items = self._live(name)
+        if items is None:
+            items = self._data[name] = []
+        items.extend(values)
+        return len(items)
+
+    async def llen(self, name: str) -> int:
+        return len(self._live(name) or [])
+
+    async def lrange(self, name: str, start: int, end: int) -> list[str]:
+        return _redis_slice(self._live(name) or [], start, end)
+
+    async def sadd(self, name: str, *members: str) -> int:
+        members_set = self._live(name)
+        if members_set is None:
+            members_set = self._data[name] = set()
+        added = len(set(members) - members_set)
+        members_set.update(members)
+        return added
+
+    async def srem(self, name: str, *members: str) -> int:
+        members_set = self._live(name) or set()
+        removed = len(members_set & set(members))
+        members_set.difference_update(members)
+        return removed
+
+    async def smembers(self, name: str) -> "set[str]":  # `set` is shadowed by the method above
+        return set(self._live(name) or set())
+
+    async def hgetall(self, name: str) -> dict[str, str]:
+        return dict(self._live(name) or {})
+
+    async def hset(self, name: str, mapping: dict[str, str]) -> int:
+        fields = self._live(name)
+        if fields is None:
+            fields = self._data[name] = {}
+        added = len(set(mapping) - set(fields))
+        fields.update(mapping)
+        return added
+
+
+class FakeRedisPipeline:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands = []
+
+    def __getattr__(self, command: str):
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        commands, self._commands = self._commands, []
+        return [await getattr(self.client, command)(*args, **kwargs) for command, args, kwargs in commands]
+
+
+def _redis_slice(items: list, start: int, end: int) -> list:
+    """Redis LRANGE/LTRIM semantics: inclusive end, negative indexes count from the tail."""
+    size = len(items)
+    start = max(start + size if start < 0 else start, 0)
+    end = end + size if end < 0 else end
+    return items[start:end + 1]
+
+
+# =========================================================================
+# === SESSION SERVICE ===
+# =========================================================================
+class LogSessionService(BaseSessionService):
+    """
+    ADK session service over a log-structured backend. Each appended event is one
+    small write; every SESSION_SNAPSHOT_EVERY events the session-scoped state is
+    snapshotted with the log position it covers (never the events, so a snapshot
+    costs the size of the state, not of the history). A load reads the snapshot,
+    replays state deltas from the events after it and returns only the recent
+    events, so its cost is bounded however long the conversation gets.
+    """
+
+    def __init__(self, store, snapshot_every: int = SESSION_SNAPSHOT_EVERY, gc_interval_seconds: float = SESSION_GC_INTERVAL_SECONDS,
+                 load_recent_events: int = SESSION_LOAD_RECENT_EVENTS):
+        self.store = store
+        self.snapshot_every = snapshot_every
+        self.gc_interval_seconds = gc_interval_seconds
+        self.load_recent_events = load_recent_events
+        # (events appended since the last snapshot, when last touched), per session used
+        # in this process. Dropped when a snapshot is written and, once idle past the
+        # store's TTL, by garbage collection.
+        self._unsnapshotted: dict[tuple[str, str, str], tuple[int, float]] = {}
+        self._last_gc = time.monotonic()
+        self.snapshots_written = 0
+        self.events_appended = 0
+        self.events_replayed = 0
+        self.purged = 0
+
+    async def create_session(self, *, app_name: str, user_id: str, state: dict[str, Any] | None = None, session_id: str | None = None) -> Session:
+        await self._maybe_purge_expired()
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        state = state or {}
+
+        app_delta, user_delta = _scoped_deltas(state)
+        await self._update_scoped_state(app_name, user_id, app_delta, user_delta)
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=_session_state(state), last_update_time=time.time())
+        await self.store.create(key, _snapshot(session, 0), session.last_update_time)
+        self._unsnapshotted.pop(key, None)
+        return await self._merge_scoped_state(session)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config: GetSessionConfig | None = None) -> Session | None:
+        key = (app_name, user_id, session_id)
+        if config is None:
+            recent = self.load_recent_events or None
+        else:
+            recent = config.num_recent_events or None
+        record = await self.store.load(key, recent)
+        if record is None:
+            return None
+        snapshot, updated_at, log = record
+
+        stored = json.loads(snapshot)
+        if "session" in stored:
+            session, offset = Session.model_validate(stored["session"]), stored["offset"]
+        else:
+            # Written before snapshots dropped their events: the log only holds events after it.
+            session, offset = Session.model_validate(stored), 0
+        # Events the caller will not see and the snapshot already covers are not deserialized.
+        first_wanted = len(log) - recent if recent else 0
+        replayed = 0
+        for index, (position, line) in enumerate(log):
+            if index < first_wanted and position <= offset:
+                continue
+            event = Event.model_validate_json(line)
+            if position > offset:
+                replayed += 1
+                if event.actions and event.actions.state_delta:
+                    session.state.update(_session_state(event.actions.state_delta))
+            session.events.append(event)
+        session.last_update_time = updated_at
+        if replayed:
+            self._unsnapshotted[key] = (replayed, time.monotonic())
+        else:
+            self._unsnapshotted.pop(key, None)
+        self.events_replayed += replayed
+
+        if recent:
+            session.events = session.events[-recent:]
+        if config:
+            if config.after_timestamp:
+                session.events = [event for event in session.events if event.timestamp >= config.after_timestamp]
+        return await self._merge_scoped_state(session)
+
+    async def list_sessions(self, *, app_name: str, user_id: str | None = None) -> ListSessionsResponse:
+        sessions = [
+            Session(app_name=app_name, user_id=session_user_id, id=session_id, last_update_time=updated_at)
+            for session_user_id, session_id, updated_at in await self.store.list(app_name, user_id)
+        ]
+        return ListSessionsResponse(sessions=sessions)
+
+    async def get_user_state(self, *, app_name: str, user_id: str) -> dict[str, Any]:
+        return await self.store.get_scoped_state(f"user:{app_name}:{user_id}")
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._unsnapshotted.pop(key, None)
+        await self.store.delete(key)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # Applies the state delta and appends to the caller's session object.
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        key = (session.app_name, session.user_id, session.id)
+        if event.actions and event.actions.state_delta:
+            app_delta, user_delta = _scoped_deltas(event.actions.state_delta)
+            await self._update_scoped_state(session.app_name, session.user_id, app_delta, user_delta)
+
+        position = await self.store.append(key, event.model_dump_json(exclude_none=True), event.timestamp)
+        if position is None:
+            logger.warning(f"Session {session.id} no longer exists in the store; event {event.id} not persisted.")
+            return event
+        self.events_appended += 1
+
+        unsnapshotted = self._unsnapshotted.get(key, (0, 0.0))[0] + 1
+        if unsnapshotted >= self.snapshot_every:
+            await self.store.write_snapshot(key, _snapshot(session, position))
+            self.snapshots_written += 1
+            self._unsnapshotted.pop(key, None)
+        else:
+            self._unsnapshotted[key] = (unsnapshotted, time.monotonic())
+        return event
+
+    async def purge_expired(self) -> int:
+        """Deletes sessions whose TTL has passed, and forgets their snapshot counters."""
+        idle_since = time.monotonic() - self.store.ttl_seconds
+        for key in [key for key, (_, touched) in self._unsnapshotted.items() if touched < idle_since]:
+            del self._unsnapshotted[key]
+        purged = await self.store.purge_expired()
+        self.purged += purged
+        if purged:
+            logger.info(f"Purged {purged} expired session(s) from the {self.store.name} session store.")
+        return purged
+
+    async def stats(self) -> dict:
+        return {
+            **(await self.store.stats()),
+            "snapshot_every": self.snapshot_every,
+            "tracked_sessions": len(self._unsnapshotted),
+            "events_appended": self.events_appended,
+            "events_replayed": self.events_replayed,
+            "snapshots_written": self.snapshots_written,
+            "purged": self.purged,
+        }
+
+    async def run_gc(self):
+        """The lifespan task: purges expired sessions every gc_interval_seconds."""
+        while True:
+            await asyncio.sleep(self.gc_interval_seconds)
+            await self._maybe_purge_expired()
+
+    async def _maybe_purge_expired(self):
+        if time.monotonic() - self._last_gc < self.gc_interval_seconds:
+            return
+        self._last_gc = time.monotonic()
+        try:
+            await self.purge_expired()
+        except Exception as e:
+            logger.warning(f"Session garbage collection failed: {e}")
+
+    async def _update_scoped_state(self, app_name: str, user_id: str, app_delta: dict, user_delta: dict):
+        if app_delta:
+            await self.store.update_scoped_state(f"app:{app_name}", app_delta)
+        if user_delta:
+            await self.store.update_scoped_state(f"user:{app_name}:{user_id}", user_delta)
+
+    async def _merge_scoped_state(self, session: Session) -> Session:
+        for key, value in (await self.store.get_scoped_state(f"app:{session.app_name}")).items():
+            session.state[State.APP_PREFIX + key] = value
+        for key, value in (await self.store.get_scoped_state(f"user:{session.app_name}:{session.user_id}")).items():
+            session.state[State.USER_PREFIX + key] = value
+        return session
+
+
+def create_session_service() -> BaseSessionService:
+    """Builds the session service selected by SESSION_STORE."""
+    if SESSION_STORE_BACKEND == "memory":
+        return InMemorySessionService()
+    if SESSION_STORE_BACKEND == "sqlite":
+        return LogSessionService(SQLiteSessionStore(SESSION_DB_PATH))
+    if SESSION_STORE_BACKEND == "redis":
+        # Optional dependency, only needed for this backend: pip install redis
+        import redis.asyncio as redis_asyncio
+        return LogSessionService(RedisSessionStore(redis_asyncio.from_url(SESSION_REDIS_URL, decode_responses=True)))
+    if SESSION_STORE_BACKEND == "fakeredis":
+        return LogSessionService(RedisSessionStore(FakeRedis()))
+    raise ValueError(f"Unknown SESSION_STORE '{SESSION_STORE_BACKEND}'; expected sqlite, redis, fakeredis or memory.")
@@ -0,0 +1,93 @@
+# tools/streaming_upload.py
+
+import os
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resumable uploads send the object in chunks of this size, so peak memory per
+# upload is about one chunk. GCS requires a multiple of 256 KiB.
+_CHUNK_ALIGNMENT = 256 * 1024
+UPLOAD_CHUNK_SIZE = max(_CHUNK_ALIGNMENT, int(os.getenv("UPLOAD_CHUNK_SIZE", str(_CHUNK_ALIGNMENT))) // _CHUNK_ALIGNMENT * _CHUNK_ALIGNMENT)
+
+
+class ChunkIteratorReader:
+    """
+    A minimal read-only file object over an iterator of byte chunks. read(n) always
+    returns n bytes unless the iterator is exhausted, which is what resumable
+    uploads rely on to detect the final chunk.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._current = memoryview(b"")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            data = bytes(self._current) + b"".join(self._chunks)
+            self._current = memoryview(b"")
+            self._position += len(data)
+            return data
+
+        # Collect zero-copy slices and join once, so each byte is copied a single time.
+        parts = []
+        remaining = size
+        while remaining > 0:
+            if not self._current:
+                try:
+                    self._current = memoryview(next(self._chunks))
+                except StopIteration:
+                    break
+                continue
+            take = min(remaining, len(self._current))
+            parts.append(self._current[:take])
+            self._current = self._current[take:]
+            remaining -= take
+        data = b"".join(parts)
+        self._position += len(data)
+        return data
+
+
+def iter_memoryview_chunks(data: bytes, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Yields zero-copy slices of an in-memory buffer."""
+    view = memoryview(data)
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
+
+
+def upload_chunks(blob, chunks, content_type: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> int:
+    """
+    Uploads an iterator of byte chunks to a GCS blob without assembling the whole
+    object. Objects smaller than one chunk go up in a single simple request;
+    larger ones use a chunked resumable upload fed straight from the iterator.
+    Blocking - call it through an I/O executor. Returns the number of bytes uploaded.
+    """
+    chunks = iter(chunks)
+    head = []
+    head_size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        head_size += len(chunk)
+        if head_size >= chunk_size:
+            break
+
+    if head_size < chunk_size:
+        data = b"".join(head)
+        blob.upload_from_string(data, content_type=content_type)
+        return len(data)
+
+    reader = ChunkIteratorReader(itertools.chain(head, chunks))
+    blob.chunk_size = chunk_size
+    blob.upload_from_file(reader, content_type=content_type)
+    return reader.tell()
@@ -0,0 +1,57 @@
+# tools/trace_plugin.py
+
+import time
+import logging
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from tools.tracing import tracer, trace_context
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_TOOL_NAME = "transfer_to_agent"
+
+
+class TracingPlugin(BasePlugin):
+    """
+    Adds every tool call (and every transfer_to_agent hop between root_agent and its
+    sub-agents) to the latency trace of the session's current turn. Registered on
+    the Runner, so it covers all agents without per-agent callbacks.
+    """
+
+    def __init__(self):
+        super().__init__(name="latency_tracing")
+        # Keyed by function call id; a tool call starts and ends in the same session.
+        self._started: dict[str, float] = {}
+
+    @staticmethod
+    def _call_key(tool, tool_context) -> str:
+        return getattr(tool_context, "function_call_id", None) or f"{id(tool_context)}:{tool.name}"
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        self._started[self._call_key(tool, tool_context)] = time.perf_counter()
+        if tool.name == TRANSFER_TOOL_NAME:
+            session = trace_context.get()
+            if session is not None:
+                session.mark(f"transfer_to.{tool_args.get('agent_name')}")
+        return None
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        self._finish(tool, tool_context, error=None)
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        self._finish(tool, tool_context, error=type(error).__name__)
+        return None
+
+    def _finish(self, tool, tool_context, error: str | None):
+        started = self._started.pop(self._call_key(tool, tool_context), None)
+        if started is None:
+            return
+        tracer.record_span(
+            f"tool.{tool.name}",
+            started,
+            time.perf_counter(),
+            agent=getattr(tool_context, "agent_name", None),
+            error=error,
+        )
@@ -0,0 +1,240 @@
+# tools/tracing.py
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# --- Per-Turn Latency Tracing ---
+# Each live session records one trace per conversational turn: marks for the first
+# inbound audio, the model's first response, the first outbound audio and the end of
+# the turn, plus spans for agent transfers, tool calls and backend I/O (Maps, GCS,
+# Imagen). Durations feed p50/p95/p99 histograms served at /metrics; finished turns
+# can also be appended as JSON lines to TRACE_EXPORT_PATH for offline analysis.
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+TRACE_EXPORT_FLUSH_SECONDS = float(os.getenv("TRACE_EXPORT_FLUSH_SECONDS", "2"))
+TRACE_HISTOGRAM_SIZE = int(os.getenv("TRACE_HISTOGRAM_SIZE", "2048"))
+MAX_SPANS_PER_TURN = 256
+MAX_PENDING_EXPORTS = 10000
+
+# Turn marks, in the order they normally happen.
+MARK_INBOUND_AUDIO = "first_inbound_audio"
+MARK_INBOUND_TEXT = "inbound_text"
+MARK_MODEL_RESPONSE = "model_first_response"
+MARK_OUTBOUND_AUDIO = "first_outbound_audio"
+MARK_TURN_COMPLETE = "turn_complete"
+MARK_INTERRUPTED = "interrupted"
+
+# The session's trace, set in the context of the session's tasks (like side_channel_context).
+trace_context = ContextVar('session_trace', default=None)
+
+
+class LatencyWindow:
+    """Keeps the most recent latency samples (in ms) and summarizes them."""
+
+    def __init__(self, max_samples: int = 1000):
+        self.samples = deque(maxlen=max_samples)
+
+    def record(self, milliseconds: float):
+        self.samples.append(milliseconds)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": 0}
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+        return {
+            "count": len(ordered),
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": ordered[-1],
+        }
+
+
+class TurnTrace:
+    """Marks and spans of one turn, in ms since the turn started."""
+
+    def __init__(self, session_id: str, index: int):
+        self.session_id = session_id
+        self.index = index
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.marks: dict[str, float] = {}
+        self.spans: list[dict] = []
+        self.dropped_spans = 0
+
+    def elapsed_ms(self, at: float | None = None) -> float:
+        return round(((at if at is not None else time.perf_counter()) - self.started) * 1000, 1)
+
+    def mark(self, name: str) -> float | None:
+        """Records the first occurrence of `name`; returns its offset, or None if already marked."""
+        if name in self.marks:
+            return None
+        self.marks[name] = self.elapsed_ms()
+        return self.marks[name]
+
+    def add_span(self, name: str, started: float, ended: float, **attributes):
+        if len(self.spans) >= MAX_SPANS_PER_TURN:
+            self.dropped_spans += 1
+            return
+        self.spans.append({
+            "name": name,
+            "start_ms": self.elapsed_ms(started),
+            "duration_ms": round((ended - started) * 1000, 1),
+            **{key: value for key, value in attributes.items() if value is not None},
+        })
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "turn": self.index,
+            "started_at": self.started_at,
+            "marks": self.marks,
+            "spans": self.spans,
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+class SessionTrace:
+    """The turn currently in progress for one session."""
+
+    def __init__(self, tracer: "Tracer", session_id: str):
+        self.tracer = tracer
+        self.session_id = session_id
+        self.turn: TurnTrace | None = None
+        self.turns = 0
+
+    def mark(self, name: str):
+        """Marks an event of the current turn, starting a turn if none is open."""
+        if self.turn is None:
+            self.turns += 1
+            self.turn = TurnTrace(self.session_id, self.turns)
+        offset = self.turn.mark(name)
+        if offset is not None and name not in (MARK_INBOUND_AUDIO, MARK_INBOUND_TEXT):
+            self.tracer.record(f"turn.{name}", offset)
+
+    def end_turn(self, name: str = MARK_TURN_COMPLETE):
+        if self.turn is None:
+            return
+        self.mark(name)
+        self.tracer.finish(self.turn)
+        self.turn = None
+
+
+class TraceFileExporter:
+    """Appends finished turns as JSON lines; writes are batched off the event loop."""
+
+    def __init__(self, path: str, flush_seconds: float = TRACE_EXPORT_FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self._pending: deque[str] = deque()
+        self._flusher: asyncio.Task | None = None
+        self.exported = 0
+        self.dropped = 0
+
+    def export(self, turn: TurnTrace):
+        if len(self._pending) >= MAX_PENDING_EXPORTS:
+            self.dropped += 1
+            return
+        self._pending.append(json.dumps(turn.to_dict()))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_seconds)
+        await self.flush()
+
+    async def flush(self):
+        lines = []
+        while self._pending:
+            lines.append(self._pending.popleft())
+        if not lines:
+            return
+        try:
+            await asyncio.to_thread(self._write, lines)
+            self.exported += len(lines)
+        except OSError as e:
+            self.dropped += len(lines)
+            logger.error(f"Failed to export {len(lines)} trace(s) to {self.path}: {e}")
+
+    def _write(self, lines: list[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def stats(self) -> dict:
+        return {"path": self.path, "exported": self.exported, "pending": len(self._pending), "dropped": self.dropped}
+
+
+class Tracer:
+    """Latency histograms by span/mark name, and the exporter for finished turns."""
+
+    def __init__(self, exporter: TraceFileExporter | None = None, histogram_size: int = TRACE_HISTOGRAM_SIZE):
+        self.exporter = exporter
+        self.histogram_size = histogram_size
+        self.histograms: dict[str, LatencyWindow] = {}
+        self.turns_finished = 0
+
+    def session(self, session_id: str) -> SessionTrace:
+        return SessionTrace(self, session_id)
+
+    def record(self, name: str, milliseconds: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyWindow(self.histogram_size)
+        histogram.record(milliseconds)
+
+    def record_span(self, name: str, started: float, ended: float, **attributes):
+        """Records a span in the histograms and, inside a session's task, in its current turn."""
+        self.record(name, (ended - started) * 1000)
+        session = trace_context.get()
+        if session is not None and session.turn is not None:
+            session.turn.add_span(name, started, ended, **attributes)
+
+    def finish(self, turn: TurnTrace):
+        self.turns_finished += 1
+        if self.exporter is not None:
+            self.exporter.export(turn)
+
+    def metrics(self) -> dict:
+        return {
+            "turns": self.turns_finished,
+            "histograms": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            "exporter": self.exporter.stats() if self.exporter is not None else None,
+        }
+
+    def prometheus(self) -> str:
+        """The histograms as Prometheus summaries (quantiles in seconds)."""
+        lines = []
+        for name, histogram in sorted(self.histograms.items()):
+            summary = histogram.summary()
+            metric = "odyssey_" + "".join(c if c.isalnum() else "_" for c in name) + "_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                if key in summary:
+                    lines.append(f'{metric}{{quantile="{quantile}"}} {summary[key] / 1000:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+@asynccontextmanager
+async def trace_span(name: str, **attributes):
+    """Times the enclosed block as a span of the current turn (if any) and in the histograms."""
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        tracer.record_span(name, started, time.perf_counter(), error=error, **attributes)
+
+
+tracer = Tracer(TraceFileExporter(TRACE_EXPORT_PATH) if TRACE_EXPORT_PATH else None)
@@ -0,0 +1,249 @@
+# tools/video_jobs.py
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from types import SimpleNamespace
+
+from tools.creative_backend_tools import (
+    VEO_POLL_INTERVAL_SECONDS,
+    start_video_operation,
+    refresh_video_operation,
+    store_generated_video,
+    public_url_for_storage_uri,
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Job Configuration ---
+VEO_MAX_ACTIVE_JOBS = int(os.getenv("VEO_MAX_ACTIVE_JOBS", "4"))
+VEO_MAX_JOBS_PER_SESSION = int(os.getenv("VEO_MAX_JOBS_PER_SESSION", "2"))
+VIDEO_JOB_RETENTION_SECONDS = float(os.getenv("VIDEO_JOB_RETENTION_SECONDS", "3600"))
+
+# Side-channel message type pushed to the client whenever a job finishes.
+VIDEO_JOB_MIME_TYPE = "video/job"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+_PENDING_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class VideoJobLimitError(RuntimeError):
+    """Raised when a session already has the maximum number of pending video jobs."""
+
+
+# =========================================================================
+# === OPERATION BACKENDS ===
+# =========================================================================
+class GenAIVideoBackend:
+    """Starts and polls real Veo operations through tools.creative_backend_tools."""
+
+    async def start(self, request: dict):
+        return await start_video_operation(**request)
+
+    async def refresh(self, operation):
+        return await refresh_video_operation(operation)
+
+    def is_done(self, operation) -> bool:
+        return bool(operation.done)
+
+    async def finalize(self, operation) -> str:
+        return public_url_for_storage_uri(await store_generated_video(operation))
+
+
+class FakeVideoBackend:
+    """Backend for tests: operations finish after a fixed number of polls."""
+
+    def __init__(self, polls_until_done: int = 2, fail: bool = False, result_url: str = "https://example.invalid/fake-video.mp4"):
+        self.polls_until_done = polls_until_done
+        self.fail = fail
+        self.result_url = result_url
+        self.started = 0
+        self.refreshes = 0
+
+    async def start(self, request: dict):
+        self.started += 1
+        return SimpleNamespace(request=request, polls_left=self.polls_until_done)
+
+    async def refresh(self, operation):
+        self.refreshes += 1
+        operation.polls_left -= 1
+        return operation
+
+    def is_done(self, operation) -> bool:
+        return operation.polls_left <= 0
+
+    async def finalize(self, operation) -> str:
+        if self.fail:
+            raise RuntimeError("Fake video generation failed.")
+        return self.result_url
+
+
+# =========================================================================
+# === JOB MANAGER ===
+# =========================================================================
+class VideoJob:
+    """State for one video generation request."""
+
+    def __init__(self, owner: str, request: dict, queue: asyncio.Queue | None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.request = request
+        self.queue = queue
+        self.status = JOB_QUEUED
+        self.operation = None
+        self.result_url = None
+        self.error = None
+        self.created_at = time.monotonic()
+        self.finished_at = None
+
+    def to_message(self) -> dict:
+        return {
+            "mime_type": VIDEO_JOB_MIME_TYPE,
+            "data": {
+                "job_id": self.job_id,
+                "status": self.status,
+                "url": self.result_url,
+                "error": self.error,
+            },
+        }
+
+
+class VideoJobManager:
+    """
+    Tracks long-running video operations for every session with one shared
+    polling loop, and pushes each finished job to its session's side channel.
+    """
+
+    def __init__(self, backend=None, poll_interval: float = VEO_POLL_INTERVAL_SECONDS, max_active_jobs: int = VEO_MAX_ACTIVE_JOBS, max_jobs_per_owner: int = VEO_MAX_JOBS_PER_SESSION):
+        self.backend = backend or GenAIVideoBackend()
+        self.poll_interval = poll_interval
+        self.max_active_jobs = max_active_jobs
+        self.max_jobs_per_owner = max_jobs_per_owner
+        self.jobs: dict[str, VideoJob] = {}
+        self._queued: deque[VideoJob] = deque()
+        self._poller: asyncio.Task | None = None
+        # Set by submit() so the poller starts a new job without waiting for the next poll.
+        self._wakeup = asyncio.Event()
+
+    def get(self, job_id: str) -> VideoJob | None:
+        return self.jobs.get(job_id)
+
+    def pending_count(self, owner: str | None = None) -> int:
+        return sum(
+            1 for job in self.jobs.values()
+            if job.status in _PENDING_STATUSES and (owner is None or job.owner == owner)
+        )
+
+    async def submit(self, owner: str, request: dict, queue: asyncio.Queue | None = None) -> VideoJob:
+        """Registers a job and returns it immediately; the shared poller starts it and does the rest."""
+        self._prune_finished()
+        if self.pending_count(owner) >= self.max_jobs_per_owner:
+            raise VideoJobLimitError(f"Session already has {self.max_jobs_per_owner} video jobs in progress.")
+
+        job = VideoJob(owner, request, queue)
+        self.jobs[job.job_id] = job
+        self._queued.append(job)
+        logger.info(f"Video job {job.job_id} queued for owner {owner}.")
+
+        self._wakeup.set()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop())
+        return job
+
+    def cancel_owner(self, owner: str) -> int:
+        """Cancels and forgets every job belonging to a disconnected session."""
+        cancelled = 0
+        for job_id, job in list(self.jobs.items()):
+            if job.owner != owner:
+                continue
+            if job.status in _PENDING_STATUSES:
+                job.status = JOB_CANCELLED
+                cancelled += 1
+            job.queue = None
+            del self.jobs[job_id]
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} video job(s) for owner {owner}.")
+        return cancelled
+
+    async def _start_queued(self):
+        while self._queued and self._running_count() < self.max_active_jobs:
+            job = self._queued.popleft()
+            if job.status != JOB_QUEUED:
+                continue
+            # Mark the job running before awaiting so concurrent submits respect the limit.
+            job.status = JOB_RUNNING
+            try:
+                operation = await self.backend.start(job.request)
+            except Exception as e:
+                logger.error(f"Failed to start video job {job.job_id}: {e}")
+                self._finish(job, JOB_FAILED, error=str(e))
+                continue
+            if job.status == JOB_RUNNING:
+                job.operation = operation
+
+    def _running_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == JOB_RUNNING)
+
+    async def _poll_loop(self):
+        loop = asyncio.get_running_loop()
+        next_poll = loop.time() + self.poll_interval
+        while self.pending_count():
+            self._wakeup.clear()
+            await self._start_queued()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_poll - loop.time()))
+                continue  # A job was submitted: start it now, poll when due.
+            except asyncio.TimeoutError:
+                pass
+            next_poll = loop.time() + self.poll_interval
+            running = [job for job in self.jobs.values() if job.status == JOB_RUNNING and job.operation is not None]
+            await asyncio.gather(*(self._poll_job(job) for job in running))
+
+    async def _poll_job(self, job: VideoJob):
+        try:
+            operation = await self.backend.refresh(job.operation)
+            if job.status != JOB_RUNNING:
+                return
+            job.operation = operation
+            if not self.backend.is_done(operation):
+                return
+            result_url = await self.backend.finalize(operation)
+        except Exception as e:
+            logger.error(f"Video job {job.job_id} failed: {e}")
+            self._finish(job, JOB_FAILED, error=str(e))
+            return
+        self._finish(job, JOB_SUCCEEDED, result_url=result_url)
+
+    def _finish(self, job: VideoJob, status: str, result_url: str | None = None, error: str | None = None):
+        if job.status not in _PENDING_STATUSES:
+            return
+        job.status = status
+        job.result_url = result_url
+        job.error = error
+        job.operation = None
+        job.finished_at = time.monotonic()
+        logger.info(f"Video job {job.job_id} finished with status '{status}'.")
+        if job.queue is None:
+            return
+        # Never wait on one session's full side channel: this runs in the poller shared by every session.
+        try:
+            job.queue.put_nowait(job.to_message())
+        except asyncio.QueueFull:
+            logger.warning(f"Side channel full; video job {job.job_id} result not pushed (check_video_job still reports it).")
+
+    def _prune_finished(self):
+        cutoff = time.monotonic() - VIDEO_JOB_RETENTION_SECONDS
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self.jobs[job_id]
+
+
+# Shared by every WebSocket session in this process.
+video_job_manager = VideoJobManager()
@@ -0,0 +1,151 @@
+# tools/voice_gate.py
+
+import os
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Voice Activity Gating of Inbound Audio ---
+# Microphone audio is streamed continuously, but most of it is silence (the user is
+# listening to the agent). The gate forwards speech plus enough padding around it for
+# the model's own activity detection, and drops or thins the rest.
+# "thin" - forward one frame per VOICE_GATE_KEEPALIVE_MS of idle silence (default).
+# "drop" - forward no idle silence at all.
+# "off"  - forward everything.
+VOICE_GATE = os.getenv("VOICE_GATE", "thin").lower()
+# A window is speech when it is louder than this floor and VOICE_GATE_MARGIN_DB above
+# the running noise floor estimate.
+VOICE_GATE_THRESHOLD_DBFS = float(os.getenv("VOICE_GATE_THRESHOLD_DBFS", "-48"))
+VOICE_GATE_MARGIN_DB = float(os.getenv("VOICE_GATE_MARGIN_DB", "9"))
+# Silence kept before speech so the model hears the onset.
+VOICE_GATE_PREROLL_MS = int(os.getenv("VOICE_GATE_PREROLL_MS", "300"))
+VOICE_GATE_KEEPALIVE_MS = int(os.getenv("VOICE_GATE_KEEPALIVE_MS", "1000"))
+# Silence forwarded after speech on top of the model's own end-of-speech silence.
+VOICE_GATE_HANGOVER_MARGIN_MS = int(os.getenv("VOICE_GATE_HANGOVER_MARGIN_MS", "500"))
+
+ANALYSIS_WINDOW_MS = 20
+NOISE_FLOOR_INITIAL_DBFS = -60.0
+# The noise floor follows quiet windows quickly and loud ones slowly (time constant
+# about 2 s), so steady background noise is learned while pauses in speech keep it low.
+NOISE_FLOOR_FALL_RATE = 0.2
+NOISE_FLOOR_RISE_RATE = 0.01
+_FULL_SCALE_POWER = 32768.0 ** 2
+_POWER_EPSILON = 1e-10
+
+
+def window_energies_dbfs(pcm: bytes, sample_rate: int, window_ms: int = ANALYSIS_WINDOW_MS) -> np.ndarray:
+    """Energy in dBFS of each analysis window of 16-bit mono PCM, computed in one pass."""
+    samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2).astype(np.float32)
+    window = max(1, sample_rate * window_ms // 1000)
+    full_windows = len(samples) // window
+    powers = np.square(samples[:full_windows * window]).reshape(full_windows, window).mean(axis=1)
+    tail = samples[full_windows * window:]
+    if len(tail) >= window // 4:
+        powers = np.append(powers, np.square(tail).mean())
+    return 10.0 * np.log10(powers / _FULL_SCALE_POWER + _POWER_EPSILON)
+
+
+class VoiceGate:
+    """
+    Decides, frame by frame, which inbound PCM reaches the live model. After speech the
+    gate stays open long enough to cover the model's own end-of-speech silence
+    (`model_silence_ms`, its silence_duration_ms); otherwise the turn would never end.
+    """
+
+    def __init__(
+        self,
+        model_silence_ms: int,
+        mode: str = VOICE_GATE,
+        threshold_dbfs: float = VOICE_GATE_THRESHOLD_DBFS,
+        margin_db: float = VOICE_GATE_MARGIN_DB,
+        preroll_ms: int = VOICE_GATE_PREROLL_MS,
+        keepalive_ms: int = VOICE_GATE_KEEPALIVE_MS,
+    ):
+        self.mode = mode
+        self.threshold_dbfs = threshold_dbfs
+        self.margin_db = margin_db
+        self.hangover_ms = model_silence_ms + VOICE_GATE_HANGOVER_MARGIN_MS
+        self.preroll_ms = preroll_ms
+        self.keepalive_ms = keepalive_ms
+        self.noise_floor_dbfs = NOISE_FLOOR_INITIAL_DBFS
+        self._preroll: deque[tuple[bytes, float]] = deque()
+        self._preroll_duration_ms = 0.0
+        self._since_speech_ms = float("inf")
+        self._since_forward_ms = 0.0
+        # Whether the last processed frame was speech.
+        self.in_speech = False
+
+        self.frames_in = 0
+        self.frames_forwarded = 0
+        self.speech_frames = 0
+        self.bytes_in = 0
+        self.bytes_forwarded = 0
+        self.audio_ms = 0.0
+        self.speech_ms = 0.0
+
+    def is_speech(self, pcm: bytes, sample_rate: int) -> bool:
+        """Classifies a frame (speech if any window is) and updates the noise floor."""
+        energies = window_energies_dbfs(pcm, sample_rate)
+        if energies.size == 0:
+            return False
+        threshold = max(self.threshold_dbfs, self.noise_floor_dbfs + self.margin_db)
+        speech = bool((energies > threshold).any())
+        for energy in energies.tolist():
+            rate = NOISE_FLOOR_FALL_RATE if energy < self.noise_floor_dbfs else NOISE_FLOOR_RISE_RATE
+            self.noise_floor_dbfs += rate * (energy - self.noise_floor_dbfs)
+        return speech
+
+    def process(self, pcm: bytes, sample_rate: int) -> bytes:
+        """Returns the audio to forward for this frame (possibly with pre-roll), or b"" to drop it."""
+        duration_ms = len(pcm) / 2 / sample_rate * 1000
+        self.frames_in += 1
+        self.bytes_in += len(pcm)
+        self.audio_ms += duration_ms
+        self.in_speech = self.is_speech(pcm, sample_rate)
+        if self.in_speech:
+            self.speech_frames += 1
+            self.speech_ms += duration_ms
+        if self.mode == "off":
+            # Nothing is gated, but speech is still detected: it marks where a turn starts.
+            return self._forward(pcm)
+
+        if self.in_speech:
+            self._since_speech_ms = 0.0
+            # Batch the buffered pre-roll with the frame that opened the gate.
+            forwarded = b"".join([*(frame for frame, _ in self._preroll), pcm])
+            self._preroll.clear()
+            self._preroll_duration_ms = 0.0
+            return self._forward(forwarded)
+
+        self._since_speech_ms += duration_ms
+        if self._since_speech_ms <= self.hangover_ms:
+            return self._forward(pcm)
+
+        self._since_forward_ms += duration_ms
+        if self.mode == "thin" and self._since_forward_ms >= self.keepalive_ms:
+            return self._forward(pcm)
+
+        self._preroll.append((pcm, duration_ms))
+        self._preroll_duration_ms += duration_ms
+        while self._preroll_duration_ms - self._preroll[0][1] >= self.preroll_ms:
+            self._preroll_duration_ms -= self._preroll.popleft()[1]
+        return b""
+
+    def _forward(self, pcm: bytes) -> bytes:
+        self.frames_forwarded += 1
+        self.bytes_forwarded += len(pcm)
+        self._since_forward_ms = 0.0
+        return pcm
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "frames_in": self.frames_in,
+            "frames_forwarded": self.frames_forwarded,
+            "speech_ratio": round(self.speech_ms / self.audio_ms, 3) if self.audio_ms else None,
+            "forwarded_ratio": round(self.bytes_forwarded / self.bytes_in, 3) if self.bytes_in else None,
+            "noise_floor_dbfs": round(self.noise_floor_dbfs, 1),
+        }
@@ -0,0 +1,328 @@
+# tools/worker_router.py
+"""
+Multi-process serving mode. Run with:
+
+    WEB_WORKERS=4 python -m tools.worker_router
+
+With WEB_WORKERS=1 (the default) this simply execs `uvicorn main:app`. Otherwise it
+starts WEB_WORKERS uvicorn processes on local ports and a small front router on
+PORT. The router reads each connection's request line, picks the worker that owns
+the session (crc32 of the id in /ws/{session_id}, so a session always lands on the
+same worker, across reconnects and worker restarts) and then splices raw bytes in
+both directions, without parsing WebSocket frames. Only WebSocket upgrades keep
+their connection: every other request is forwarded with "Connection: close", so a
+keep-alive client reconnects, and is routed again, for its next request. Locally
+stored media (MEDIA_STORE=local) lives in one worker, so its URLs carry
+?worker=<index> and go to that worker. /metrics, /stats/* and /cache/* are asked of every worker and
+answered per worker. Other requests are spread round-robin. Workers are separate
+interpreter processes, so every process-global client (genai, storage, gmaps) is
+created inside its own worker.
+"""
+
+import os
+import sys
+import json
+import zlib
+import signal
+import asyncio
+import logging
+import itertools
+
+logger = logging.getLogger(__name__)
+
+# --- Serving Configuration ---
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("PORT", "8000"))
+WEB_APP = os.getenv("WEB_APP", "main:app")
+# Worker i listens on 127.0.0.1:WORKER_BASE_PORT + i.
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "8100"))
+# How long a connection waits for a (re)starting worker before getting a 503.
+WORKER_CONNECT_TIMEOUT_SECONDS = float(os.getenv("WORKER_CONNECT_TIMEOUT_SECONDS", "30"))
+WORKER_RESTART_DELAY_SECONDS = 1.0
+# Tells each worker its index, e.g. for the local media store's URLs.
+WORKER_INDEX_ENV = "WEB_WORKER_INDEX"
+
+ROUTER_STATS_PATH = "/router/stats"
+MEDIA_PATH_PREFIX = "/media/"
+MEDIA_WORKER_PARAM = "worker"
+# Process-local counters and latency summaries: every worker answers, keyed by worker index.
+PER_WORKER_PATHS = ("/metrics",)
+PER_WORKER_PREFIXES = ("/stats/", "/cache/")
+MAX_REQUEST_HEAD_BYTES = 64 * 1024
+PIPE_CHUNK_SIZE = 64 * 1024
+
+
+def session_id_from_path(path: str) -> str | None:
+    """Returns the session id of a /ws/{session_id} path, or None for other paths."""
+    parts = path.split("/")
+    if len(parts) >= 3 and parts[1] == "ws" and parts[2]:
+        return parts[2]
+    return None
+
+
+def worker_index_from_query(query: str) -> int | None:
+    """The ?worker=<index> of a local media URL, or None."""
+    for pair in query.split("&"):
+        name, _, value = pair.partition("=")
+        if name == MEDIA_WORKER_PARAM and value.isdigit():
+            return int(value)
+    return None
+
+
+def is_websocket_upgrade(head: bytes) -> bool:
+    return any(
+        name.strip().lower() == b"upgrade" and value.strip().lower() == b"websocket"
+        for name, _, value in (line.partition(b":") for line in head.split(b"\r\n")[1:])
+    )
+
+
+def close_after_response(head: bytes) -> bytes:
+    """The request head with its Connection and Keep-Alive headers replaced by "Connection: close"."""
+    lines = [
+        line for line in head.rstrip(b"\r\n").split(b"\r\n")
+        if line.partition(b":")[0].strip().lower() not in (b"connection", b"keep-alive")
+    ]
+    return b"\r\n".join(lines + [b"Connection: close"]) + b"\r\n\r\n"
+
+
+def is_per_worker_path(path: str) -> bool:
+    return path in PER_WORKER_PATHS or path.startswith(PER_WORKER_PREFIXES)
+
+
+def label_prometheus(text: str, worker: int) -> list[str]:
+    """Prometheus sample lines with a worker label added; comment lines are dropped."""
+    lines = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, brace, rest = line.partition("{")
+        if brace:
+            lines.append(f'{name}{{worker="{worker}",{rest}')
+        else:
+            name, _, value = line.partition(" ")
+            lines.append(f'{name}{{worker="{worker}"}} {value}')
+    return lines
+
+
+class Worker:
+    def __init__(self, index: int, port: int):
+        self.index = index
+        self.port = port
+        self.process: asyncio.subprocess.Process | None = None
+        self.restarts = 0
+        self.connections = 0
+        self.active_connections = 0
+
+    def stats(self) -> dict:
+        return {
+            "port": self.port,
+            "pid": self.process.pid if self.process else None,
+            "restarts": self.restarts,
+            "connections": self.connections,
+            "active_connections": self.active_connections,
+        }
+
+
+class WorkerRouter:
+    """Supervises the worker processes and pins each session's connections to one of them."""
+
+    def __init__(self, worker_count: int, app: str = WEB_APP, base_port: int = WORKER_BASE_PORT):
+        self.app = app
+        self.workers = [Worker(index, base_port + index) for index in range(worker_count)]
+        self._round_robin = itertools.cycle(self.workers)
+        self._supervisors: list[asyncio.Task] = []
+        self._stopping = False
+        self.unavailable = 0
+
+    def worker_for(self, path: str, query: str = "") -> Worker:
+        session_id = session_id_from_path(path)
+        if session_id is not None:
+            return self.workers[zlib.crc32(session_id.encode("utf-8")) % len(self.workers)]
+        if path.startswith(MEDIA_PATH_PREFIX):
+            index = worker_index_from_query(query)
+            if index is not None and index < len(self.workers):
+                return self.workers[index]
+        return next(self._round_robin)
+
+    async def start(self):
+        self._supervisors = [asyncio.create_task(self._supervise(worker)) for worker in self.workers]
+
+    async def stop(self, timeout: float = 10.0):
+        self._stopping = True
+        for worker in self.workers:
+            if worker.process and worker.process.returncode is None:
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            try:
+                await asyncio.wait_for(worker.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                worker.process.kill()
+        for task in self._supervisors:
+            task.cancel()
+
+    async def _supervise(self, worker: Worker):
+        while not self._stopping:
+            worker.process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "uvicorn", self.app, "--host", "127.0.0.1", "--port", str(worker.port),
+                env={**os.environ, WORKER_INDEX_ENV: str(worker.index)},
+            )
+            logger.info(f"Worker {worker.index} started (pid {worker.process.pid}, port {worker.port}).")
+            returncode = await worker.process.wait()
+            if self._stopping:
+                return
+            worker.restarts += 1
+            logger.error(f"Worker {worker.index} exited with code {returncode}; restarting.")
+            await asyncio.sleep(WORKER_RESTART_DELAY_SECONDS)
+
+    async def _connect(self, worker: Worker):
+        deadline = asyncio.get_running_loop().time() + WORKER_CONNECT_TIMEOUT_SECONDS
+        while True:
+            try:
+                return await asyncio.open_connection("127.0.0.1", worker.port)
+            except OSError:
+                if asyncio.get_running_loop().time() >= deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        request_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+        target = request_line.split(" ")[1] if request_line.count(" ") >= 2 else "/"
+        path, _, query = target.partition("?")
+        if path == ROUTER_STATS_PATH:
+            await self._respond(writer, 200, self.stats())
+            return
+        if is_per_worker_path(path) and request_line.startswith("GET "):
+            await self._respond_per_worker(writer, target, query)
+            return
+
+        if not is_websocket_upgrade(head):
+            # The worker closes after one response, so the next request on this client is routed on its own.
+            head = close_after_response(head)
+        worker = self.worker_for(path, query)
+        try:
+            upstream_reader, upstream_writer = await self._connect(worker)
+        except OSError:
+            self.unavailable += 1
+            await self._respond(writer, 503, {"error": f"worker {worker.index} unavailable"})
+            return
+
+        worker.connections += 1
+        worker.active_connections += 1
+        try:
+            upstream_writer.write(head)
+            await asyncio.gather(self._pipe(reader, upstream_writer), self._pipe(upstream_reader, writer))
+        finally:
+            worker.active_connections -= 1
+
+    async def _fetch(self, worker: Worker, target: str) -> tuple[int, bytes]:
+        """GETs `target` from one worker: (status, body); (503, b"") if it is down."""
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", worker.port), WORKER_CONNECT_TIMEOUT_SECONDS)
+        except (OSError, asyncio.TimeoutError):
+            return 503, b""
+        try:
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode("latin-1"))
+            response = await reader.read()
+        except ConnectionError:
+            return 503, b""
+        finally:
+            writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        status_line = head.split(b"\r\n", 1)[0].split(b" ")
+        return (int(status_line[1]) if len(status_line) > 1 and status_line[1].isdigit() else 502), body
+
+    async def _respond_per_worker(self, writer: asyncio.StreamWriter, target: str, query: str):
+        """Answers a stats or metrics request with every worker's own numbers, keyed by worker index."""
+        responses = await asyncio.gather(*(self._fetch(worker, target) for worker in self.workers))
+        if "format=prometheus" in query.split("&"):
+            # Summaries from different processes cannot be merged; each sample is labeled with its worker.
+            samples = sorted(line for worker, (status, body) in zip(self.workers, responses) if status == 200
+                             for line in label_prometheus(body.decode("utf-8"), worker.index))
+            families = dict.fromkeys(line.split("{", 1)[0] for line in samples)
+            lines = []
+            for family in families:
+                lines.append(f"# TYPE {family} summary")
+                lines.extend(line for line in samples if line.split("{", 1)[0] == family)
+            await self._respond(writer, 200, "\n".join(lines) + "\n")
+            return
+        workers = {}
+        for worker, (status, body) in zip(self.workers, responses):
+            try:
+                workers[str(worker.index)] = json.loads(body) if status == 200 else {"error": f"HTTP {status}"}
+            except ValueError:
+                workers[str(worker.index)] = {"error": "invalid JSON"}
+        await self._respond(writer, 200, {"per_worker": True, "workers": workers})
+
+    @staticmethod
+    async def _pipe(source: asyncio.StreamReader, destination: asyncio.StreamWriter):
+        try:
+            while True:
+                data = await source.read(PIPE_CHUNK_SIZE)
+                if not data:
+                    break
+                destination.write(data)
+                await destination.drain()
+        except ConnectionError:
+            pass
+        finally:
+            destination.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, body: dict | str):
+        if isinstance(body, str):
+            payload, content_type = body.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            payload, content_type = json.dumps(body).encode("utf-8"), "application/json"
+        reason = {200: "OK", 503: "Service Unavailable"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        return {
+            "workers": [worker.stats() for worker in self.workers],
+            "unavailable": self.unavailable,
+        }
+
+
+async def serve(worker_count: int = WEB_WORKERS, host: str = WEB_HOST, port: int = WEB_PORT):
+    router = WorkerRouter(worker_count)
+    await router.start()
+    server = await asyncio.start_server(router.handle, host, port, limit=MAX_REQUEST_HEAD_BYTES)
+    logger.info(f"Routing {host}:{port} to {worker_count} workers of {router.app}.")
+    if os.getenv("MEDIA_STORE", "gcs").lower() == "local":
+        logger.warning("MEDIA_STORE=local keeps media in the worker that created it: it is lost when that worker restarts.")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    server.close()
+    await router.stop()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if WEB_WORKERS <= 1:
+        os.execvp(sys.executable, [sys.executable, "-m", "uvicorn", WEB_APP, "--host", WEB_HOST, "--port", str(WEB_PORT)])
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
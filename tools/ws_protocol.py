@@ -0,0 +1,99 @@
+# tools/ws_protocol.py
+
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- Wire Protocols for /ws/{session_id} ---
+# "json"   - the original protocol: every message is a JSON text frame and audio
+#            is base64-encoded inside it. Kept as the default for old clients.
+# "binary" - PCM audio travels as binary frames with a small fixed header; control,
+#            transcription and image messages stay JSON text frames.
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+SUPPORTED_PROTOCOLS = (PROTOCOL_JSON, PROTOCOL_BINARY)
+
+# Sent as the first text frame so the client knows which protocol was accepted.
+PROTOCOL_MIME_TYPE = "application/x-odyssey-protocol"
+# Sent when one inbound frame cannot be decoded; the frame is dropped, the connection kept.
+PROTOCOL_ERROR_MIME_TYPE = "application/x-odyssey-protocol-error"
+
+# --- Binary Audio Frame Header ---
+# version (u8) | direction (u8) | flags (u16) | sequence (u32) | sample_rate (u32)
+# All fields are network byte order, followed directly by raw 16-bit PCM, or by one
+# Opus packet when FLAG_OPUS is set (see tools/audio_codec.py).
+FRAME_VERSION = 1
+DIRECTION_CLIENT_TO_AGENT = 0
+DIRECTION_AGENT_TO_CLIENT = 1
+FLAG_OPUS = 0x0001
+_HEADER = struct.Struct("!BBHII")
+HEADER_SIZE = _HEADER.size
+
+_SEQUENCE_MODULO = 2 ** 32
+DEFAULT_INPUT_SAMPLE_RATE = 16000
+DEFAULT_OUTPUT_SAMPLE_RATE = 24000
+
+
+def negotiate_protocol(requested: str | None) -> str:
+    """Returns the protocol to use for a connection, falling back to JSON."""
+    if requested and requested.lower() in SUPPORTED_PROTOCOLS:
+        return requested.lower()
+    return PROTOCOL_JSON
+
+
+def sample_rate_from_mime_type(mime_type: str | None, default: int = DEFAULT_OUTPUT_SAMPLE_RATE) -> int:
+    """Extracts the rate from mime types such as 'audio/pcm;rate=24000'."""
+    if not mime_type:
+        return default
+    for param in mime_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key == "rate" and value.isdigit():
+            return int(value)
+    return default
+
+
+def pack_audio_frame(direction: int, sequence: int, sample_rate: int, pcm: bytes, flags: int = 0) -> bytes:
+    """Prefixes raw PCM (or an encoded packet, per `flags`) with the binary frame header."""
+    return _HEADER.pack(FRAME_VERSION, direction, flags, sequence % _SEQUENCE_MODULO, sample_rate) + pcm
+
+
+def unpack_audio_frame(frame: bytes) -> tuple[int, int, int, int, bytes]:
+    """Splits a binary frame into (direction, flags, sequence, sample_rate, payload)."""
+    if len(frame) < HEADER_SIZE:
+        raise ValueError(f"Binary audio frame too short: {len(frame)} bytes.")
+    version, direction, flags, sequence, sample_rate = _HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported binary audio frame version: {version}.")
+    return direction, flags, sequence, sample_rate, frame[HEADER_SIZE:]
+
+
+class AudioFrameSequencer:
+    """Numbers outgoing frames and notices gaps in incoming ones for one direction."""
+
+    def __init__(self, direction: int):
+        self.direction = direction
+        self.next_sequence = 0
+        self.expected_sequence = None
+        self.gaps = 0
+
+    def pack(self, pcm: bytes, sample_rate: int, flags: int = 0) -> bytes:
+        frame = pack_audio_frame(self.direction, self.next_sequence, sample_rate, pcm, flags)
+        self.next_sequence = (self.next_sequence + 1) % _SEQUENCE_MODULO
+        return frame
+
+    def unpack(self, frame: bytes) -> tuple[int, bytes]:
+        """Returns (sample_rate, pcm) and records any sequence gap."""
+        _flags, sample_rate, pcm = self.unpack_with_flags(frame)
+        return sample_rate, pcm
+
+    def unpack_with_flags(self, frame: bytes) -> tuple[int, int, bytes]:
+        """Returns (flags, sample_rate, payload) and records any sequence gap."""
+        direction, flags, sequence, sample_rate, payload = unpack_audio_frame(frame)
+        if direction != self.direction:
+            raise ValueError(f"Unexpected frame direction {direction}, expected {self.direction}.")
+        if self.expected_sequence is not None and sequence != self.expected_sequence:
+            self.gaps += 1
+            logger.warning(f"Audio frame sequence gap: expected {self.expected_sequence}, got {sequence}.")
+        self.expected_sequence = (sequence + 1) % _SEQUENCE_MODULO
+        return flags, sample_rate, payload